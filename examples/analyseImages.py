@@ -23,6 +23,7 @@ import src.DataReader as DataReader
 import src.DataBase as DataBase
 import src.utilities as utils
 import src.ThresholdMaskingScheme as ThresholdMaskingScheme
+import src.IntervalThresholdMaskingScheme as IntervalThresholdMaskingScheme
 import src.TrainingTesting as TrainingTesting
 
 
@@ -150,7 +151,9 @@ if __name__ == '__main__':
         targets_array=targets_array,
         thresholds_list=thresholds_list)
 
-    dice_scores_means = threshold_masking_scheme.evaluate_masking_scheme_by_threshold_sweeping()
+    # Dice scores of all slices for all thresholds
+    dice_matrix = threshold_masking_scheme.get_dice_matrix(thresholds_list)
+    dice_scores_means = dice_matrix.mean(axis=1)
     utils.show_plot_dice_scores_over_thresholds(
         x=thresholds_list,
         y=dice_scores_means,
@@ -161,19 +164,20 @@ if __name__ == '__main__':
     )
 
     # Generate segmentation for "optimal" (based on Dice) threshold
-    optimal_threshold = thresholds_list[np.argmax(dice_scores_means)]
+    index_optimal_threshold = np.argmax(dice_scores_means)
+    optimal_threshold = thresholds_list[index_optimal_threshold]
     target_array_estimate = threshold_masking_scheme.get_target_array_estimate(
         optimal_threshold)
 
     # Visualize i-contours for both "ground-truth" and estimate
+    targets_array_labels = targets_array.copy()
     targets_array[np.where(targets_array == 1)] = 0
     utils.show_image_data(images_array, targets_array, title="i-contours")
 
     utils.show_image_data(
         images_array, target_array_estimate*2, title="i-contours-estimate")
 
-    dice_scores_per_slice = [utils.dice_score(targets_array[:, :, i].astype(
-        bool), target_array_estimate[:, :, i].astype(bool)) for i in range(0, targets_array.shape[2])]
+    dice_scores_per_slice = dice_matrix[index_optimal_threshold]
 
     utils.show_plot_dice_scores_over_samples(
         y=dice_scores_per_slice,
@@ -184,7 +188,25 @@ if __name__ == '__main__':
     )
 
     utils.print_info("Dice scores for 'optimal' threshold choice: %.3f (%.3f)" %(np.mean(dice_scores_per_slice), np.std(dice_scores_per_slice)))
+    metrics = threshold_masking_scheme.get_metrics(optimal_threshold)
+    metrics.update(threshold_masking_scheme.get_surface_distances(
+        optimal_threshold))
+    for key in ["jaccard", "sensitivity", "volume_error", "hd95", "assd"]:
+        utils.print_info("%s for 'optimal' threshold choice: %.3f (%.3f)" % (
+            key, np.mean(metrics[key]), np.std(metrics[key])))
     i_slice = 20
     utils.show_image(images_array[:, :, i_slice], 
         target_data=target_array_estimate[:, :, i_slice], 
         title="Dice = %.3f" % (dice_scores_per_slice[i_slice]))
+
+    utils.print_title("Estimate optimal intensity interval for entire sample")
+    # Blood pool intensities lie between the ones of heart muscle and
+    # brighter outliers, i.e. use a lower and an upper threshold
+    interval_masking_scheme = IntervalThresholdMaskingScheme.IntervalThresholdMaskingScheme(
+        images_array=images_array,
+        targets_array=targets_array_labels,
+        thresholds_list=range(0, 500, 5) + [np.inf])
+    optimal_interval = interval_masking_scheme.estimate_optimal_parameter()
+    utils.print_info("Optimal interval (%g, %g]: Dice score %.3f" % (
+        optimal_interval[0], optimal_interval[1],
+        interval_masking_scheme.get_mean_dice_score(optimal_interval)))
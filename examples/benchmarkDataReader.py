@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+##
+# \file benchmarkDataReader.py
+# \brief      Benchmark the creation of samples by the DataReader for an
+#             increasing number of worker processes.
+#
+# \details    By executing 'python examples/benchmarkDataReader.py' the
+#             provided test data is read repeatedly using 1 to N worker
+#             processes and the required times are reported. More
+#             information via 'python examples/benchmarkDataReader.py -h'.
+#
+# \author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+# \date       June 2017
+#
+
+# Import libraries
+import os
+import time
+import argparse
+import multiprocessing
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.DataReader as DataReader
+import src.utilities as utils
+
+
+def get_parsed_input_line(verbose, directory_input, csv_file, subdirectory_contours,
+                          subdirectory_dicoms, contours_type, max_workers,
+                          repetitions):
+    """!
+    Gets the parsed input line.
+
+    \param      verbose                boolean for verbose output
+    \param      directory_input        path to root directory of input files
+    \param      subdirectory_contours  subdirectory of contours within root directory
+    \param      subdirectory_dicoms    subdirectory of dicoms within root directory
+    \param      contours_type          string to specify type of contours
+    \param      max_workers            maximum number of worker processes
+    \param      repetitions            number of repetitions per setting
+
+    \return     The parsed input line.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmark the parallel "
+                                     "creation of samples by the DataReader "
+                                     "for 1 to N worker processes.",
+                                     prog="python benchmarkDataReader.py",
+                                     epilog="Author: Michael Ebner"
+                                     "(michael.ebner.14@ucl.ac.uk)",
+                                     )
+
+    parser.add_argument('--directory-input', required=False, type=str,
+                        help="Specify input directory for all files/folders. [default: %s]" % (
+                            directory_input),
+                        default=directory_input)
+    parser.add_argument('--csv-file', required=False, type=str,
+                        help="CSV-file with two columns 'patient-id' and 'original-id' to link up the appropriate DICOM and contour files [default: %s]" % (
+                            csv_file),
+                        default=csv_file)
+    parser.add_argument('--subdirectory-dicoms', required=False, type=str,
+                        help="Subdirectory within input directory pointing to DICOM images [default: %s]" % (
+                            subdirectory_dicoms),
+                        default=subdirectory_dicoms)
+    parser.add_argument('--subdirectory-contours', required=False, type=str,
+                        help="Subdirectory within input directory pointing to contour files [default: %s]" % (
+                            subdirectory_contours),
+                        default=subdirectory_contours)
+    parser.add_argument('--contours-type', required=False, type=str,
+                        help="Chosen type of contour files. Several contours can be read by using white spaces for separation. Thus, valid inputs are, e.g., 'i-contours', 'o-contours', 'i-contours o-contours' etc. [default: %s]" % (
+                            contours_type),
+                        default=contours_type)
+    parser.add_argument('--max-workers', required=False, type=int,
+                        help="Maximum number of worker processes to benchmark [default: %s]" % (
+                            max_workers),
+                        default=max_workers)
+    parser.add_argument('--repetitions', required=False, type=int,
+                        help="Number of repetitions for each number of worker processes [default: %s]" % (
+                            repetitions),
+                        default=repetitions)
+    parser.add_argument('--verbose', type=bool, required=False,
+                        help="Turn on/off verbose output. [default: %s]" % (
+                            verbose),
+                        default=verbose)
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        print("Given Input")
+        for arg in sorted(vars(args)):
+            utils.print_info("%s: " % (arg), newline=False)
+            print(getattr(args, arg))
+
+    return args
+
+if __name__ == '__main__':
+
+    args = get_parsed_input_line(
+        verbose=True,
+        directory_input=dir_test_data_final_data,
+        csv_file=os.path.join(dir_test_data_final_data, "link.csv"),
+        subdirectory_contours="contourfiles",
+        subdirectory_dicoms="dicoms",
+        contours_type="i-contours o-contours",
+        max_workers=multiprocessing.cpu_count(),
+        repetitions=5,
+    )
+
+    directory_dicoms = os.path.join(
+        args.directory_input, args.subdirectory_dicoms)
+    directory_contourfiles = os.path.join(
+        args.directory_input, args.subdirectory_contours)
+
+    utils.print_title("Benchmark DataReader.read_data [median (min) in s]")
+
+    time_reference = None
+    for workers in range(1, args.max_workers + 1):
+        data_reader = DataReader.DataReader(
+            directory_dicoms=directory_dicoms,
+            directory_contours=directory_contourfiles,
+            csv_file=args.csv_file,
+            contours_type=args.contours_type,
+            workers=workers)
+
+        times = []
+        for i in range(0, args.repetitions):
+            time_start = time.time()
+            data_reader.read_data()
+            times.append(time.time() - time_start)
+
+        time_median = np.median(times)
+        if time_reference is None:
+            time_reference = time_median
+
+        print("Workers %2d: %.4f (%.4f), speed-up %.2f" % (
+            workers, time_median, np.min(times), time_reference / time_median))
@@ -113,24 +113,20 @@ if __name__ == '__main__':
     database = DataBase.DataBase(data_reader.get_samples(), batch_size=8, seed=None)
     database.build_training_database()
     
-    # Show images with associated mask of each sample sequentially
-    count = 1
-    while (count < 5):        
-        
-        # Variant A: Get next batch of length batch_size
-        images_array, targets_array = database.get_next_batch()
-        
-        # Variant B: Get random batch of length batch_size
+    # Show images with associated mask of each sample sequentially. The
+    # next batches are read in the background while a batch is shown.
+    for count, (images_array, targets_array) in enumerate(
+            database.iter_batches(prefetch=2), 1):
+
+        # Alternatively, get random batch of length batch_size
         # images_array, targets_array = database.get_random_batch()
-        
-        if images_array is None:
+
+        if count == 5:
             break
-        
+
         utils.print_title("Batch %d" %(count))
 
         ## Show 3D images and targets as masks via ITK-SNAP
         utils.show_image_data(images_array, targets_array)
-        
-        utils.pause()
-        count += 1
 
+        utils.pause()
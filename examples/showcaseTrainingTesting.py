@@ -129,30 +129,30 @@ if __name__ == '__main__':
         database=database,
         fraction_training=args.fraction_training)
 
-    #
-    results = np.zeros((args.N_repetitions, 3))
+    # Run all training-testing cycles based on Dice scores computed once
+    parameters, dice_scores = training_testing.run_repeated_splits(
+        args.N_repetitions)
 
     for i in range(0, args.N_repetitions):
         utils.print_title("Training-Testing-Cycle %d/%d" %
                           (i+1, args.N_repetitions))
 
-        training_testing.randomly_split_into_training_and_testing_data()
-
         print("Result Training:")
-        (estimated_parameter, dice_scores_mean_training) = training_testing.run_training()
-        utils.print_info("Optimal Threshold = %d" % (estimated_parameter))
-        utils.print_info("Dice Score = %.3f" % (dice_scores_mean_training))
+        utils.print_info("Optimal Threshold = %d" % (parameters[i]))
+        utils.print_info("Dice Score = %.3f" % (dice_scores[i, 0]))
 
         print("Result Testing (using 'optimal threshold'):")
-        _, dice_scores_mean_testing = training_testing.run_testing(
-            estimated_parameter)
-        utils.print_info("Dice Score = %.3f" % (dice_scores_mean_testing))
-
-        results[i, 0] = estimated_parameter
-        results[i, 1] = dice_scores_mean_training
-        results[i, 2] = dice_scores_mean_testing
+        utils.print_info("Dice Score = %.3f" % (dice_scores[i, 1]))
 
     utils.print_title("Summary:")
-    utils.print_info("Optimal Threshold: %.3f (%.3f)" %(results[:,0].mean(), results[:,0].std()))
-    utils.print_info("Training Dice score: %.3f (%.3f)" %(results[:,1].mean(), results[:,1].std()))
-    utils.print_info("Testing Dice score: %.3f (%.3f)" %(results[:,2].mean(), results[:,2].std()))
+    utils.print_info("Optimal Threshold: %.3f (%.3f)" %(np.mean(parameters), np.std(parameters)))
+    utils.print_info("Training Dice score: %.3f (%.3f)" %(dice_scores[:,0].mean(), dice_scores[:,0].std()))
+    utils.print_info("Testing Dice score: %.3f (%.3f)" %(dice_scores[:,1].mean(), dice_scores[:,1].std()))
+
+    utils.print_title("Testing metrics of single Training-Testing-Cycle:")
+    training_testing.randomly_split_into_training_and_testing_data()
+    estimated_parameter, _ = training_testing.run_training()
+    metrics = training_testing.run_testing_metrics(estimated_parameter)
+    for key in sorted(metrics.keys()):
+        utils.print_info("%s: %.3f (%.3f)" % (
+            key, np.nanmean(metrics[key]), np.nanstd(metrics[key])))
@@ -0,0 +1,140 @@
+"""
+\file ContourStore.py
+\brief      Class to store the coordinates of many contour files in one
+            compact binary file.
+
+\details    The coordinates of all contours are concatenated into one
+            (K_total, 2) array. Offsets link each contour file with its
+            coordinates. Size and modification time of each contour file are
+            stored as well so that entries of modified contour files are
+            ignored. The entire store is loaded with a single read.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import os
+import tempfile
+import numpy as np
+
+import src.parsing as parsing
+import src.utilities as utils
+
+
+class ContourStore(object):
+    """!
+    Binary store of contour coordinates of many contour files
+    """
+
+    def __init__(self, filename):
+        """!
+        Store path to the binary contour store
+
+        \param      filename  path to npz-file of contour store
+        """
+        self._filename = os.path.abspath(filename)
+
+        self._coordinates = None
+        self._entries = None
+
+    def __getstate__(self):
+        """!
+        Do not pickle loaded coordinates, e.g. when passing samples between
+        processes. They are loaded again when required.
+        """
+        return {"_filename": self._filename,
+                "_coordinates": None,
+                "_entries": None}
+
+    def get_filename(self):
+        """!
+        \return     filename string
+        """
+        return self._filename
+
+    def build(self, filenames):
+        """!
+        Parse all given contour files and write their coordinates into the
+        contour store.
+
+        \param      filenames  list of paths to contour files
+        """
+        filenames = [os.path.abspath(f) for f in filenames]
+
+        coordinates_list = [
+            parsing.parse_contour_file_array(f) for f in filenames]
+        stats = [os.stat(f) for f in filenames]
+
+        offsets = np.zeros(len(filenames) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([c.shape[0] for c in coordinates_list])
+
+        if len(coordinates_list) > 0:
+            coordinates = np.concatenate(coordinates_list)
+        else:
+            coordinates = np.zeros((0, 2))
+
+        directory = os.path.dirname(self._filename)
+        if not utils.directory_exists(directory):
+            os.makedirs(directory)
+
+        # Write to temporary file first to never expose incomplete stores
+        file_descriptor, filename_tmp = tempfile.mkstemp(
+            dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as f:
+                np.savez(f,
+                         coordinates=coordinates,
+                         offsets=offsets,
+                         filenames=np.array(filenames),
+                         sizes=np.array([s.st_size for s in stats]),
+                         mtimes=np.array([s.st_mtime for s in stats]))
+            os.rename(filename_tmp, self._filename)
+        except:
+            os.remove(filename_tmp)
+            raise
+
+        self._coordinates = None
+        self._entries = None
+
+    def get_coordinates(self, filename):
+        """!
+        Gets the coordinates of the given contour file.
+
+        \param      filename  path to contour file
+
+        \return     numpy array of shape (K, 2) holding x, y coordinates or
+                    None if the contour file is not stored or has been
+                    modified since the store was built.
+        """
+        if self._entries is None:
+            self._load()
+
+        entry = self._entries.get(os.path.abspath(filename))
+        if entry is None:
+            return None
+
+        size, mtime, i_0, i_1 = entry
+        stat = os.stat(filename)
+        if stat.st_size != size or stat.st_mtime != mtime:
+            return None
+
+        return self._coordinates[i_0:i_1]
+
+    def _load(self):
+        """!
+        Load the entire contour store into memory.
+        """
+        if not utils.file_exists(self._filename):
+            self._coordinates = np.zeros((0, 2))
+            self._entries = {}
+            return
+
+        with np.load(self._filename) as data:
+            offsets = data["offsets"]
+            sizes = data["sizes"]
+            mtimes = data["mtimes"]
+
+            self._coordinates = data["coordinates"]
+            self._entries = {
+                f: (sizes[i], mtimes[i], offsets[i], offsets[i + 1])
+                for i, f in enumerate(data["filenames"].tolist())}
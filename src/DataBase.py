@@ -7,9 +7,17 @@
 """
 
 import random
+import collections
 import numpy as np
+from multiprocessing.pool import ThreadPool
 import SimpleITK as sitk
 import src.TrainingSample as TrainingSample
+import src.TargetSingleClass as TargetSingleClass
+import src.Target as Target
+import src.Image as Image
+import src.LruCache as LruCache
+import src.packing as packing
+import src.Exceptions as Exceptions
 
 
 class DataBase(object):
@@ -17,29 +25,78 @@ class DataBase(object):
     Interface to data used for training
     """
 
-    def __init__(self, samples, batch_size=8, seed=None):
+    def __init__(self, samples, batch_size=8, seed=None, cache_bytes=None,
+                 layout="HWN", pack_targets=False):
         """!
         Store all samples and default values for batch size and seed for
         training sample retrieval
 
-        \param      samples     list of Sample objects
-        \param      batch_size  integer value to define batch size
-        \param      seed        integer value to reproduce randomness
+        \param      samples      list of Sample objects
+        \param      batch_size   integer value to define batch size
+        \param      seed         integer value to reproduce randomness
+        \param      cache_bytes  optional byte budget to keep decoded image
+                                 and target data arrays in memory. If None,
+                                 data arrays are read whenever required.
+        \param      layout       string "HWN" or "NHW" to define whether
+                                 the slices of a batch are stacked along
+                                 the last (default) or the first axis. With
+                                 "NHW" each slice is one contiguous block
+                                 of the batch arrays.
+        \param      pack_targets  boolean to keep targets bit-packed in the
+                                 in-memory cache, i.e. with one bit per
+                                 label bit and pixel instead of one byte per
+                                 pixel. Requires cache_bytes.
         """
+        if layout not in ["HWN", "NHW"]:
+            raise ValueError("Layout '%s' not supported. Use 'HWN' or 'NHW'"
+                             % (layout))
+
+        # Without cache, targets would be packed and unpacked on each access
+        if pack_targets and cache_bytes is None:
+            raise ValueError("Packing targets requires cache_bytes")
 
         self._samples = samples
         self._batch_size = batch_size
 
-        self._training_samples = None
+        # Index of training samples as parallel arrays, i.e. without one
+        # object per training sample. Filenames, shapes and data types are
+        # interned, i.e. stored once and referred to by their ids.
+        self._sample_indices = None
+        self._slice_positions = None
+        self._slice_ids = None
+        self._shape_ids = None
+        self._shapes = None
+        self._data_type_ids = None
+        self._data_types = None
+        self._filename_buffer = None
+        self._filename_offsets = None
+        self._image_filename_ids = None
+        self._target_filename_ids = None
+        self._target_filename_offsets = None
         self._N_samples = None
 
+        # Cache, contour store and target encoding of each sample to create
+        # its images and targets on demand, or the sample itself if it
+        # cannot be described by a manifest
+        self._sample_parameters = None
+        self._samples_kept = None
+
         self._cursor = 0  # used for cycling over dataset to load batches
 
-        image_data = self._samples[0].get_images()[0].get_data()
-        self._shape = image_data.shape
-        self._image_data_type = image_data.dtype
-        self._target_data_type = self._samples[
-            0].get_images()[1].get_data().dtype
+        self._layout = layout
+        self._pack_targets = pack_targets
+
+        if cache_bytes is not None:
+            self._cache = LruCache.LruCache(cache_bytes)
+        else:
+            self._cache = None
+
+        # Read array information from headers only, i.e. without decoding
+        image = self._samples[0].get_images()[0]
+        target = self._samples[0].get_targets()[0]
+        self._shape = image.get_shape()
+        self._image_data_type = image.get_data_type()
+        self._target_data_type = target.get_data_type()
 
         # Set seed for reproducible random results
         np.random.seed(seed)
@@ -52,14 +109,136 @@ class DataBase(object):
         """
         self._batch_size = batch_size
 
+    def get_batch_size(self):
+        """!
+        Gets the batch size
+
+        \return     integer value of batch size
+        """
+        return self._batch_size
+
     def build_training_database(self):
         """!
         Builds a training database from the given samples.
+
+        \details    Each training sample, i.e. pair of image and target, is
+                    described by the index of its sample, its position within
+                    the sample, its slice id and the ids of its shape and
+                    data type, stored in parallel numpy arrays. The DICOM
+                    and contour filenames of the manifests of the samples
+                    are interned into one array of filenames. Hence, the
+                    samples are released afterwards and Image, Target and
+                    TrainingSample objects are created on demand only.
+                    Samples without manifest, e.g. VolumeSample, are kept
+                    together with their objects.
         """
-        self._training_samples = [TrainingSample.TrainingSample(i, t) for s in range(0, len(
-            self._samples)) for (i, t) in zip(self._samples[s].get_images(), self._samples[s].get_targets())]
 
-        self._N_samples = len(self._training_samples)
+        # Index built already and samples released
+        if self._samples is None:
+            if self._cache is not None:
+                self._cache.clear()
+            return
+
+        filename_ids = {}
+        shape_ids = {}
+        data_type_ids = {}
+        sample_indices = []
+        slice_positions = []
+        slice_ids = []
+        shape_ids_slices = []
+        data_type_ids_slices = []
+        image_filename_ids = []
+        target_filename_ids = []
+        target_filename_counts = []
+
+        self._sample_parameters = []
+        self._samples_kept = {}
+
+        for i, sample in enumerate(self._samples):
+            manifest = sample.get_manifest()
+
+            # Samples without manifest, e.g. read from volume stores, are
+            # kept and their images and targets used as they are
+            if manifest is None:
+                manifest = [{
+                    "slice_id": image.get_id(),
+                    "dicom": None,
+                    "contours": [],
+                    "shape": image.get_shape(),
+                    "data_type": image.get_data_type().str,
+                } for image in sample.get_images()]
+                self._sample_parameters.append(None)
+                self._samples_kept[i] = sample
+            else:
+                self._sample_parameters.append(
+                    (sample.get_cache(), sample.get_contour_store(),
+                     sample.get_targets()[0].get_encoding()))
+
+            for position, entry in enumerate(manifest):
+                sample_indices.append(i)
+                slice_positions.append(position)
+                slice_ids.append(entry["slice_id"])
+                shape_ids_slices.append(shape_ids.setdefault(
+                    tuple(entry["shape"]), len(shape_ids)))
+                data_type_ids_slices.append(data_type_ids.setdefault(
+                    entry["data_type"], len(data_type_ids)))
+
+                if entry["dicom"] is None:
+                    image_filename_ids.append(-1)
+                else:
+                    image_filename_ids.append(filename_ids.setdefault(
+                        entry["dicom"], len(filename_ids)))
+                target_filename_ids.extend([
+                    filename_ids.setdefault(f, len(filename_ids))
+                    for f in entry["contours"]])
+                target_filename_counts.append(len(entry["contours"]))
+
+        self._N_samples = len(slice_ids)
+        self._sample_indices = np.array(sample_indices, dtype=np.int32)
+        self._slice_positions = np.array(slice_positions, dtype=np.int32)
+        self._slice_ids = np.array(slice_ids, dtype=np.int64)
+
+        self._shapes = [None] * len(shape_ids)
+        for shape, shape_id in shape_ids.items():
+            self._shapes[shape_id] = shape
+        self._shape_ids = np.array(shape_ids_slices, dtype=np.int32)
+
+        self._data_types = [None] * len(data_type_ids)
+        for data_type, data_type_id in data_type_ids.items():
+            self._data_types[data_type_id] = np.dtype(data_type)
+        self._data_type_ids = np.array(data_type_ids_slices, dtype=np.int32)
+
+        # Filenames are concatenated into one UTF-8 buffer since a fixed-width
+        # string array pads each filename to the longest one
+        filenames = [None] * len(filename_ids)
+        for filename, filename_id in filename_ids.items():
+            filenames[filename_id] = filename.encode("utf-8")
+        self._filename_buffer = b"".join(filenames)
+        self._filename_offsets = np.concatenate(
+            [[0], np.cumsum([len(f) for f in filenames])]).astype(np.int64)
+        self._image_filename_ids = np.array(
+            image_filename_ids, dtype=np.int32)
+        self._target_filename_ids = np.array(
+            target_filename_ids, dtype=np.int32)
+        self._target_filename_offsets = np.concatenate(
+            [[0], np.cumsum(target_filename_counts)]).astype(np.int64)
+
+        self._samples = None
+
+        if self._cache is not None:
+            self._cache.clear()
+
+    def get_cache_statistics(self):
+        """!
+        Gets the statistics of the in-memory cache.
+
+        \return     dictionary with number of hits, misses, evictions,
+                    cached entries and bytes as well as the byte budget. None
+                    if no cache is used.
+        """
+        if self._cache is None:
+            return None
+        return self._cache.get_statistics()
 
     def get_number_of_all_training_samples(self):
         """!
@@ -76,14 +255,75 @@ class DataBase(object):
         """!
         Gets all stored training samples.
 
+        \details    The TrainingSample objects, together with their Image
+                    and Target objects, are created anew whenever this
+                    function is called and are not kept by the database.
+                    Prefer \p get_training_sample or the index arrays for
+                    large databases.
+
         \return     list of all training samples as objects of TrainingSample.
         """
-        if self._training_samples is None:
-            raise Exceptions.ObjectNotCreated(
-                "create_training_sample_database")
-        return self._training_samples
+        return [self.get_training_sample(i)
+                for i in range(0, self.get_number_of_all_training_samples())]
+
+    def get_training_sample(self, index):
+        """!
+        Gets a training sample.
+
+        \param      index  index of training sample
+
+        \return     TrainingSample object, created on demand
+        """
+        return TrainingSample.TrainingSample(
+            self._get_image(index), self._get_target(index))
+
+    def get_sample_indices(self):
+        """!
+        Gets the index of the sample of each training sample.
+
+        \return     numpy integer array of shape (N_samples,) referring to the
+                    list of samples the database was created from
+        """
+        self._check_training_database()
+        return self._sample_indices
+
+    def get_slice_ids(self):
+        """!
+        Gets the slice id of each training sample.
 
-    def get_next_batch(self):
+        \return     numpy integer array of shape (N_samples,)
+        """
+        self._check_training_database()
+        return self._slice_ids
+
+    def get_shape_ids(self):
+        """!
+        Gets the id of the shape of each training sample.
+
+        \return     numpy integer array of shape (N_samples,) referring to
+                    the list returned by \p get_shapes
+        """
+        self._check_training_database()
+        return self._shape_ids
+
+    def get_shapes(self):
+        """!
+        Gets the distinct shapes of the training samples.
+
+        \return     list of tuples describing the shapes of image data arrays
+        """
+        self._check_training_database()
+        return self._shapes
+
+    def get_layout(self):
+        """!
+        Gets the layout of the batch arrays.
+
+        \return     string "HWN" or "NHW"
+        """
+        return self._layout
+
+    def get_next_batch(self, images_array=None, targets_array=None):
         """!
         Gets the next batch of size batch_size.
 
@@ -92,10 +332,16 @@ class DataBase(object):
                     of respective arrays together. For each numpy array holds
                     array.shape[2] = batch_size (or smaller if end of data is
                     about to be reached). In case all data has been 
-                    None, None is returned.
+                    None, None is returned. Optionally, the arrays are
+                    written into preallocated arrays.
 
         \post       cursor is increased by batch size
 
+        \param      images_array   optional preallocated array to hold the
+                                   images of a batch of size batch_size
+        \param      targets_array  optional preallocated array to hold the
+                                   targets of a batch of size batch_size
+
         \return     Pair images_numpy_array, targets_numpy_array of next batch
                     with.
         """
@@ -104,7 +350,99 @@ class DataBase(object):
 
         self._cursor += self._batch_size
 
-        return self._get_numpy_arrays_of_batch(np.arange(i_0, i_max))
+        return self._get_numpy_arrays_of_batch(
+            np.arange(i_0, i_max), images_array, targets_array)
+
+    def iter_batches(self, prefetch=2, workers=1, reuse_arrays=False,
+                     indices=None):
+        """!
+        Iterate over all training samples batch by batch while the next
+        batches are read in the background.
+
+        \details    Batches of size batch_size (the last one possibly
+                    smaller) are yielded in the same order as by repeatedly
+                    calling \p get_next_batch starting from the first
+                    sample. Reading and decoding of the next \p prefetch
+                    batches is performed by a pool of \p workers threads
+                    while the current batch is being consumed. The cursor is
+                    not affected. If \p reuse_arrays is set, batches are
+                    written into a ring of prefetch+1 preallocated arrays
+                    instead of newly allocated ones. A yielded batch is then
+                    only valid until the next batch is requested. If
+                    \p indices are given, only the selected training samples
+                    are iterated over in the given order.
+
+        \param      prefetch      number of batches read ahead
+        \param      workers       number of threads used for reading
+                                  batches
+        \param      reuse_arrays  boolean to reuse preallocated arrays
+        \param      indices       optional list of indices to indicate
+                                  training samples to iterate over
+
+        \return     generator of pairs images_numpy_array,
+                    targets_numpy_array
+        """
+        self._check_training_database()
+
+        if indices is None:
+            indices = np.arange(0, self._N_samples)
+
+        indices_list = [indices[i:i + self._batch_size]
+                        for i in range(0, len(indices), self._batch_size)]
+
+        # Ring of preallocated arrays. The array written next is the one of
+        # the batch yielded before which has been consumed already.
+        if reuse_arrays:
+            arrays_ring = [self._get_batch_arrays(self._batch_size)
+                           for i in range(0, prefetch + 1)]
+        else:
+            arrays_ring = [(None, None)]
+
+        pool = ThreadPool(workers)
+        try:
+            batches = collections.deque()
+            for i, indices in enumerate(indices_list):
+                batches.append(pool.apply_async(
+                    self._get_numpy_arrays_of_batch,
+                    (indices,) + arrays_ring[i % len(arrays_ring)]))
+                if len(batches) > prefetch:
+                    yield batches.popleft().get()
+
+            while len(batches) > 0:
+                yield batches.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def get_packed_target_masks(self, indices, label=None):
+        """!
+        Gets the bit-packed target masks of the training samples specified by
+        the indices.
+
+        \details    Overlaps with other packed masks can be counted directly
+                    on the packed bytes, e.g. via
+                    metrics.get_packed_overlap_counts.
+
+        \param      indices  list of indices to indicate training samples to
+                             pick from
+        \param      label    optional label of targets defining the mask. If
+                             None, all non-zero pixels are foreground.
+
+        \return     numpy uint8 array of shape (len(indices),
+                    ceil(H * W / 8)) as returned by packing.pack_masks
+        """
+        self._check_training_database()
+
+        packed_masks = np.zeros(
+            (len(indices), (self._shape[0] * self._shape[1] + 7) // 8),
+            dtype=np.uint8)
+        for i in range(0, len(indices)):
+            target_data = self._get_target_data(indices[i])
+            if label is not None:
+                target_data = target_data == label
+            packed_masks[i] = packing.pack_masks(target_data)
+
+        return packed_masks
 
     def get_batch_for_all_samples(self):
         """!
@@ -121,17 +459,23 @@ class DataBase(object):
         """
         self._cursor = 0
 
-    def get_random_batch(self):
+    def get_random_batch(self, images_array=None, targets_array=None):
         """!
         Gets random batch of size batch_size
 
+        \param      images_array   optional preallocated array to hold the
+                                   images of a batch of size batch_size
+        \param      targets_array  optional preallocated array to hold the
+                                   targets of a batch of size batch_size
+
         \return     Pair images_numpy_array, targets_numpy_array of random
                     batch
         """
 
         indices = self._get_random_indices_for_sample_selection()        
 
-        return self._get_numpy_arrays_of_batch(indices)
+        return self._get_numpy_arrays_of_batch(
+            indices, images_array, targets_array)
 
     def get_random_batch_and_batch_complement(self):
         """!
@@ -150,11 +494,29 @@ class DataBase(object):
         \return     The random batch and complement as pairs of numpy arrays
         """
 
+        indices, indices_complement = \
+            self.get_random_indices_and_indices_complement()
+
+        return self._get_numpy_arrays_of_batch(indices), self._get_numpy_arrays_of_batch(indices_complement)
+
+    def get_random_indices_and_indices_complement(self):
+        """!
+        Gets random indices of batch size and the complement of those
+        indices.
+
+        \details    Same selection as by
+                    \p get_random_batch_and_batch_complement but without
+                    reading any data. The batches can be read afterwards,
+                    e.g. via \p iter_batches.
+
+        \return     Pair of lists of random indices and complement indices
+        """
+
         indices = self._get_random_indices_for_sample_selection()   
 
         indices_complement = list(set(np.arange(0, self._N_samples)) - set(indices))
 
-        return self._get_numpy_arrays_of_batch(indices), self._get_numpy_arrays_of_batch(indices_complement)
+        return list(indices), indices_complement
 
     def _get_random_indices_for_sample_selection(self):
         """!
@@ -168,16 +530,22 @@ class DataBase(object):
         
         return indices
 
-    def _get_numpy_arrays_of_batch(self, indices):
+    def _get_numpy_arrays_of_batch(self, indices, images_array=None,
+                                   targets_array=None):
         """!
         Returns a pair of 3D numpy arrays from the training samples specified
         by the indices.
 
         \details    Return one for image arrays and one for target arrays with
-                    numpy_array.shape[2] = len(indices).
+                    numpy_array.shape[2] = len(indices) (or
+                    numpy_array.shape[0] = len(indices) for layout "NHW").
+                    If preallocated arrays are given, the data is written
+                    into (views of) them.
 
-        \param      indices  list of indices to indicate training samples to
-                             pick from
+        \param      indices        list of indices to indicate training
+                                   samples to pick from
+        \param      images_array   optional preallocated images array
+        \param      targets_array  optional preallocated targets array
 
         \return     Pair images_numpy_array, targets_numpy_array
         """
@@ -186,17 +554,179 @@ class DataBase(object):
         if N_indices == 0:
             return None, None
 
-        # Allocate memory
-        images_array = np.zeros(
-            (self._shape[0], self._shape[1], N_indices), dtype=self._image_data_type)
-        targets_array = np.zeros(
-            (self._shape[0], self._shape[1], N_indices), dtype=self._target_data_type)
+        images_array, targets_array = self._get_batch_arrays(
+            N_indices, images_array, targets_array)
 
         # Fill numpy arrays
-        for i in range(0, N_indices):
-            images_array[:, :, i] = self._training_samples[
-                indices[i]].get_image_data()
-            targets_array[:, :, i] = self._training_samples[
-                indices[i]].get_target_data()
+        if self._layout == "NHW":
+            for i in range(0, N_indices):
+                images_array[i] = self._get_image_data(indices[i])
+                targets_array[i] = self._get_target_data(indices[i])
+        else:
+            for i in range(0, N_indices):
+                images_array[:, :, i] = self._get_image_data(indices[i])
+                targets_array[:, :, i] = self._get_target_data(indices[i])
 
         return images_array, targets_array
+
+    def _get_batch_arrays(self, N_indices, images_array=None,
+                          targets_array=None):
+        """!
+        Gets the arrays to hold the images and targets of a batch.
+
+        \details    Arrays are allocated unless given. Given arrays need to
+                    provide at least N_indices slices and are cut to that
+                    number. No initialization is needed as all slices are
+                    overwritten.
+
+        \param      N_indices      number of slices of batch
+        \param      images_array   optional preallocated images array
+        \param      targets_array  optional preallocated targets array
+
+        \return     Pair images_numpy_array, targets_numpy_array
+        """
+        if self._layout == "NHW":
+            shape = (N_indices, self._shape[0], self._shape[1])
+        else:
+            shape = (self._shape[0], self._shape[1], N_indices)
+
+        arrays = []
+        for array, data_type in [(images_array, self._image_data_type),
+                                 (targets_array, self._target_data_type)]:
+            if array is None:
+                arrays.append(np.empty(shape, dtype=data_type))
+                continue
+
+            if self._layout == "NHW":
+                array = array[0:N_indices]
+            else:
+                array = array[:, :, 0:N_indices]
+            if array.shape != shape:
+                raise Exceptions.ShapeMismatch()
+            arrays.append(array)
+
+        return tuple(arrays)
+
+    def _get_image_data(self, index):
+        """!
+        Gets the image data array of a training sample, from the in-memory
+        cache if available.
+
+        \param      index  index of training sample
+
+        \return     numpy array of image data
+        """
+        return self._get_data(index, "image", self._get_image(index).get_data)
+
+    def _get_target_data(self, index):
+        """!
+        Gets the target data array of a training sample, from the in-memory
+        cache if available.
+
+        \param      index  index of training sample
+
+        \return     numpy array of target data
+        """
+        if not self._pack_targets:
+            return self._get_data(
+                index, "target", self._get_target(index).get_data)
+
+        packed_data = self._get_data(
+            index, "packed-target",
+            lambda: packing.pack_label_map(self._get_target(index).get_data()))
+
+        return packing.unpack_label_map(
+            packed_data, self._shape, self._target_data_type)
+
+    def _get_image(self, index):
+        """!
+        Gets the image of a training sample.
+
+        \param      index  index of training sample
+
+        \return     Image object, created on demand unless its sample is
+                    kept
+        """
+        self._check_training_database()
+
+        sample_index = self._sample_indices[index]
+        if sample_index in self._samples_kept:
+            return self._samples_kept[sample_index].get_images()[
+                self._slice_positions[index]]
+
+        return Image.Image(
+            slice_id=int(self._slice_ids[index]),
+            filename=self._get_filename(self._image_filename_ids[index]),
+            cache=self._sample_parameters[sample_index][0],
+            shape=self._shapes[self._shape_ids[index]],
+            data_type=self._data_types[self._data_type_ids[index]],
+            check_existence=False)
+
+    def _get_target(self, index):
+        """!
+        Gets the target of a training sample.
+
+        \param      index  index of training sample
+
+        \return     Target object, created on demand unless its sample is
+                    kept
+        """
+        self._check_training_database()
+
+        sample_index = self._sample_indices[index]
+        if sample_index in self._samples_kept:
+            return self._samples_kept[sample_index].get_targets()[
+                self._slice_positions[index]]
+
+        cache, contour_store, encoding = self._sample_parameters[sample_index]
+        first, end = self._target_filename_offsets[index:index + 2]
+
+        return Target.Target([
+            TargetSingleClass.TargetSingleClass(
+                slice_id=int(self._slice_ids[index]),
+                filename=self._get_filename(i),
+                shape=self._shapes[self._shape_ids[index]],
+                cache=cache,
+                contour_store=contour_store,
+                check_existence=False)
+            for i in self._target_filename_ids[first:end]],
+            encoding=encoding)
+
+    def _get_filename(self, filename_id):
+        """!
+        Gets an interned filename.
+
+        \param      filename_id  id of the filename
+
+        \return     filename as string
+        """
+        first, end = self._filename_offsets[filename_id:filename_id + 2]
+        return self._filename_buffer[first:end].decode("utf-8")
+
+    def _check_training_database(self):
+        """!
+        Raise an error if the training database was not built yet.
+        """
+        if self._sample_indices is None:
+            raise Exceptions.ObjectNotCreated("build_training_database")
+
+    def _get_data(self, index, kind, get_data):
+        """!
+        Gets a data array from the in-memory cache or reads and caches it.
+
+        \param      index     index of training sample
+        \param      kind      string "image", "target" or "packed-target"
+        \param      get_data  function reading the data array
+
+        \return     numpy data array
+        """
+        if self._cache is None:
+            return get_data()
+
+        key = (kind, index)
+        data_array = self._cache.get(key)
+        if data_array is None:
+            data_array = get_data()
+            self._cache.put(key, data_array)
+
+        return data_array
@@ -36,11 +36,17 @@
 """
 
 import os
+import json
 import pandas
+import multiprocessing
 import numpy as np
 
 import src.utilities as utils
 import src.Sample as Sample
+import src.VolumeSample as VolumeSample
+import src.ManifestSample as ManifestSample
+import src.DiskCache as DiskCache
+import src.ContourStore as ContourStore
 import src.Exceptions as Exceptions
 
 
@@ -56,7 +62,11 @@ class DataReader(object):
                  csv_file,
                  contours_type,
                  header_dicoms="patient_id",
-                 header_contours="original_id"):
+                 header_contours="original_id",
+                 workers=1,
+                 directory_cache=None,
+                 contour_store_file=None,
+                 encoding=None):
         """!
         Store paths and filenames required to create samples comprising
         images and targets
@@ -75,6 +85,20 @@ class DataReader(object):
                                         the DICOM folders in CSV-file
         \param      header_contours     string of column header referring to
                                         the contour folders in CSV-file
+        \param      workers             number of processes used to create
+                                        the samples in parallel
+        \param      directory_cache     optional path to cache directory to
+                                        persistently store decoded images and
+                                        rasterized masks across runs
+        \param      contour_store_file  optional path to binary contour store
+                                        written by \p write_contour_store to
+                                        read contour coordinates from
+        \param      encoding            optional string "additive" or
+                                        "class_ids" to define how the
+                                        contours are combined into the target
+                                        data array, see Target. If None,
+                                        "additive" is used or, when reading a
+                                        manifest, the one of the manifest.
         """
 
         self._directory_dicoms = directory_dicoms
@@ -83,8 +107,13 @@ class DataReader(object):
         self._contours_type = contours_type
         self._header_dicoms = header_dicoms
         self._header_contours = header_contours
+        self._workers = workers
+        self._directory_cache = directory_cache
+        self._contour_store_file = contour_store_file
+        self._encoding = encoding
 
         self._samples = None
+        self._sample_ids = None
 
     def read_data(self):
         """!
@@ -97,6 +126,193 @@ class DataReader(object):
         # Check whether given input files and directories exist
         self._check_input_files()
 
+        # Read IDs pointing to DICOM and contour filenames from CSV-file
+        dicom_ids, contourfile_ids = self._read_csv_file()
+
+        # Get list of given input contours
+        contours_type_list = self._get_contours_type_list()
+        
+        # Create cache and contour store shared by all samples
+        cache, contour_store = self._get_cache_and_contour_store()
+
+        if self._encoding is None:
+            self._encoding = "additive"
+
+        # Collect directories of each sample, i.e. the DICOM directory and
+        # list of directories for contour file images
+        directories_list = [(
+            os.path.join(self._directory_dicoms, dicom_ids[i]),
+            [os.path.join(self._directory_contours, contourfile_ids[i], c)
+             for c in contours_type_list],
+            cache,
+            contour_store,
+            self._encoding)
+            for i in range(0, len(dicom_ids))]
+
+        # Create samples containing an image and target. Order of samples
+        # follows the order in CSV-file also for parallel processing
+        if self._workers > 1:
+            pool = multiprocessing.Pool(self._workers)
+            try:
+                self._samples = pool.map(
+                    _create_sample, directories_list, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            self._samples = [_create_sample(d) for d in directories_list]
+
+        self._sample_ids = dicom_ids
+
+    def export_volumes(self, directory):
+        """!
+        Export each created sample into a memory-mappable volume store.
+
+        \details    The volume stores are named by the DICOM ids given in the
+                    CSV-file and can be read via \p read_volumes.
+
+        \param      directory  path to output directory
+        """
+        if self._samples is None:
+            raise Exceptions.ObjectNotCreated("read_data")
+
+        for sample_id, sample in zip(self._sample_ids, self._samples):
+            sample.export_volume(directory, sample_id)
+
+    def write_contour_store(self, filename):
+        """!
+        Write the coordinates of all contour files of the created samples
+        into one binary contour store.
+
+        \details    The contour store can be used in subsequent runs by
+                    specifying \p contour_store_file.
+
+        \param      filename  path to npz-file of contour store
+        """
+        if self._samples is None:
+            raise Exceptions.ObjectNotCreated("read_data")
+
+        filenames = [t.get_filename()
+                     for sample in self._samples
+                     for target in sample.get_targets()
+                     for t in target.get_single_class_targets()]
+
+        ContourStore.ContourStore(filename).build(filenames)
+
+    def write_manifest(self, filename):
+        """!
+        Write the resolved files and array information of all created samples
+        into a JSON manifest.
+
+        \details    For each sample, identified by its DICOM id, the manifest
+                    links the slice ids with the DICOM filename, the contour
+                    filenames and shape and data type of the image data
+                    array. Contours type and target encoding are stored
+                    along. The manifest can be read via \p read_manifest.
+
+        \param      filename  path to JSON manifest
+        """
+        if self._samples is None:
+            raise Exceptions.ObjectNotCreated("read_data")
+
+        manifests = [sample.get_manifest() for sample in self._samples]
+        if None in manifests:
+            raise ValueError("Samples read from volume stores do not provide "
+                             "a manifest")
+
+        manifest = {
+            "contours_type": self._contours_type,
+            "encoding": self._encoding,
+            "samples": [{"id": sample_id, "slices": m}
+                        for sample_id, m in zip(self._sample_ids, manifests)],
+        }
+
+        with open(filename, "w") as f:
+            json.dump(manifest, f, indent=1)
+
+    def read_manifest(self, filename):
+        """!
+        Reads all samples from a manifest previously written by
+        \p write_manifest.
+
+        \details    Neither the CSV-file is read nor are the directories
+                    listed or the DICOM headers read, i.e. files are only
+                    accessed once their data is required. If \p contours_type
+                    or \p encoding were given, they must match the ones of
+                    the manifest. Otherwise, they are taken from the
+                    manifest.
+
+        \param      filename  path to JSON manifest
+
+        \post       created samples can be obtained via \p get_samples
+        """
+        if not utils.file_exists(filename):
+            raise Exceptions.FileNotExistent(filename)
+
+        with open(filename, "r") as f:
+            manifest = json.load(f)
+
+        self._check_manifest(manifest)
+
+        cache, contour_store = self._get_cache_and_contour_store()
+
+        self._samples = []
+        for entry in manifest["samples"]:
+            sample = ManifestSample.ManifestSample(
+                entry["slices"], cache=cache, contour_store=contour_store,
+                encoding=self._encoding)
+            sample.create_sample()
+            self._samples.append(sample)
+
+        self._sample_ids = [entry["id"] for entry in manifest["samples"]]
+
+    def read_volumes(self, directory):
+        """!
+        Reads all samples specified by the CSV-file from volume stores
+        previously written by \p export_volumes.
+
+        \details    Images and targets are zero-copy views on memory-mapped
+                    volumes, i.e. neither DICOM nor contour files are read.
+
+        \param      directory  path to directory of volume stores
+
+        \post       created samples can be obtained via \p get_samples
+        """
+        if not utils.directory_exists(directory):
+            raise Exceptions.FolderNotExistent(directory)
+
+        if not utils.file_exists(self._csv_file):
+            raise Exceptions.FileNotExistent(self._csv_file)
+
+        dicom_ids, _ = self._read_csv_file()
+
+        self._samples = []
+        for dicom_id in dicom_ids:
+            sample = VolumeSample.VolumeSample(
+                os.path.join(directory, "%s.json" % (dicom_id)))
+            sample.create_sample()
+            self._samples.append(sample)
+
+        self._sample_ids = dicom_ids
+
+    def get_samples(self):
+        """!
+        Gets the all created samples.
+
+        \return     list of samples which each sample holding all 2D images and
+                    targets associated to the same acquisition/folder.
+        """
+        if self._samples is None:
+            raise Exceptions.ObjectNotCreated("read_data")
+        return self._samples
+
+    def _read_csv_file(self):
+        """!
+        Read IDs linking DICOM and contour folders from CSV-file
+
+        \return     tuple of lists of DICOM ids and contour file ids
+        """
+
         # Read CSV information
         data_frame = pandas.read_csv(self._csv_file)
 
@@ -120,39 +336,62 @@ class DataReader(object):
             raise Exceptions.CsvFileFlawed(
                 "Different length of input columns.")
 
-        # Get list of given input contours
-        contours_type_list = self._get_contours_type_list()
-        
-        # Create samples containing an image and target
-        self._samples = []
-        for i in range(0, len(dicom_ids)):
+        return dicom_ids, contourfile_ids
 
-            # Get directory for DICOM images
-            directory_dicoms = os.path.join(
-                self._directory_dicoms, dicom_ids[i])
+    def _get_cache_and_contour_store(self):
+        """!
+        Create cache and contour store to be shared by all samples, if
+        specified.
 
-            # Create list of directories for contour file images
-            directory_contourfile_list = [os.path.join(
-                self._directory_contours, contourfile_ids[i], c)
-                for c in contours_type_list]
+        \return     tuple of DiskCache and ContourStore objects (or None)
+        """
+        if self._directory_cache is not None:
+            cache = DiskCache.DiskCache(self._directory_cache)
+        else:
+            cache = None
 
-            # Create sample based on valid image slices
-            sample = Sample.Sample(
-                directory_dicoms, directory_contourfile_list)
-            sample.create_sample()
+        if self._contour_store_file is not None:
+            contour_store = ContourStore.ContourStore(self._contour_store_file)
+        else:
+            contour_store = None
 
-            self._samples.append(sample)
+        return cache, contour_store
 
-    def get_samples(self):
+    def _check_manifest(self, manifest):
         """!
-        Gets the all created samples.
+        Check whether contours type and target encoding of the manifest
+        match the given ones and whether each slice lists one contour file
+        per contour type. Raise an error if not.
 
-        \return     list of samples which each sample holding all 2D images and
-                    targets associated to the same acquisition/folder.
+        \details    Manifests without encoding use "additive".
+
+        \param      manifest  dictionary as written by \p write_manifest
         """
-        if self._samples is None:
-            raise Exceptions.ObjectNotCreated("read_data")
-        return self._samples
+        if self._contours_type is None:
+            self._contours_type = manifest["contours_type"]
+
+        elif self._contours_type != manifest["contours_type"]:
+            raise Exceptions.ManifestFlawed(
+                "Contours type '%s' differs from given '%s'." % (
+                    manifest["contours_type"], self._contours_type))
+
+        encoding = manifest.get("encoding", "additive")
+        if self._encoding is None:
+            self._encoding = encoding
+
+        elif self._encoding != encoding:
+            raise Exceptions.ManifestFlawed(
+                "Encoding '%s' differs from given '%s'." % (
+                    encoding, self._encoding))
+
+        N_contours = len(self._get_contours_type_list())
+        for entry in manifest["samples"]:
+            for entry_slice in entry["slices"]:
+                if len(entry_slice["contours"]) != N_contours:
+                    raise Exceptions.ManifestFlawed(
+                        "Slice %d of sample '%s' does not provide %d contour "
+                        "file(s)." % (entry_slice["slice_id"], entry["id"],
+                                      N_contours))
 
     def _get_contours_type_list(self):
         """!
@@ -179,3 +418,27 @@ class DataReader(object):
 
         if not utils.file_exists(self._csv_file):
             raise Exceptions.FileNotExistent(self._csv_file)
+
+
+def _create_sample(directories):
+    """!
+    Create sample based on valid image slices.
+
+    \remark     Defined on module level so that it can be used by a
+                multiprocessing pool.
+
+    \param      directories  tuple of DICOM directory, list of contour
+                             directories, cache, contour store and target
+                             encoding
+
+    \return     created Sample object
+    """
+    directory_dicoms, directory_contourfile_list, cache, contour_store, \
+        encoding = directories
+
+    sample = Sample.Sample(
+        directory_dicoms, directory_contourfile_list, cache=cache,
+        contour_store=contour_store, encoding=encoding)
+    sample.create_sample()
+
+    return sample
@@ -0,0 +1,159 @@
+"""
+\file DiskCache.py
+\brief      Class to store preprocessed data arrays, i.e. decoded images and
+            rasterized masks, persistently on disk.
+
+\details    Each data array is associated to its source file. The entries are
+            keyed on the absolute path, size and modification time of the
+            source file so that a modified source file automatically
+            invalidates the associated entry. Invalidated entries are removed
+            as soon as they are looked up.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import os
+import glob
+import hashlib
+import tempfile
+import numpy as np
+
+import src.utilities as utils
+
+
+class DiskCache(object):
+    """!
+    Persistent on-disk cache of preprocessed data arrays stored as npy-files
+    """
+
+    def __init__(self, directory):
+        """!
+        Store the cache directory and create it if it does not exist yet
+
+        \param      directory  path to cache directory
+        """
+        self._directory = os.path.abspath(directory)
+
+        if not utils.directory_exists(self._directory):
+            try:
+                os.makedirs(self._directory)
+            except OSError:
+                # Directory might have been created by another process
+                if not utils.directory_exists(self._directory):
+                    raise
+
+    def get_directory(self):
+        """!
+        \return     path to cache directory
+        """
+        return self._directory
+
+    def load(self, filename, kind, mmap_mode=None):
+        """!
+        Load the data array associated to a source file.
+
+        \param      filename   path to source file
+        \param      kind       string to describe the kind of data, e.g.
+                               "image"
+        \param      mmap_mode  memory-map mode as used by numpy.load, e.g. "r"
+                               to read the array header only
+
+        \return     numpy data array or None if no valid entry exists
+        """
+        path = self._get_path(filename, kind)
+
+        if not utils.file_exists(path):
+            self._remove_stale_entries(filename, kind)
+            return None
+
+        return np.load(path, mmap_mode=mmap_mode)
+
+    def save(self, filename, kind, data_array):
+        """!
+        Save the data array associated to a source file.
+
+        \details    The array is written to a temporary file first which is
+                    renamed afterwards. Hence, processes sharing the cache
+                    never read incompletely written entries.
+
+        \param      filename    path to source file
+        \param      kind        string to describe the kind of data, e.g.
+                                "image"
+        \param      data_array  numpy data array to store
+        """
+        path = self._get_path(filename, kind)
+
+        file_descriptor, path_tmp = tempfile.mkstemp(
+            dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as f:
+                np.save(f, data_array)
+            os.rename(path_tmp, path)
+        except:
+            os.remove(path_tmp)
+            raise
+
+        self._remove_stale_entries(filename, kind)
+
+    def clear(self):
+        """!
+        Remove all entries, including invalidated ones, from the cache
+        directory.
+        """
+        for f in os.listdir(self._directory):
+            if f.endswith(".npy") or f.endswith(".tmp"):
+                os.remove(os.path.join(self._directory, f))
+
+    def _get_path(self, filename, kind):
+        """!
+        Gets the path to the cache entry.
+
+        \details    The filename of the entry consists of the hash of absolute
+                    path of the source file and kind of data followed by the
+                    hash of size and modification time of the source file.
+                    Hence, all entries of a source file and kind share a
+                    common prefix.
+
+        \param      filename  path to source file
+        \param      kind      string to describe the kind of data
+
+        \return     path to npy-file of cache entry
+        """
+        stat = os.stat(filename)
+        version = "%d|%r" % (stat.st_size, stat.st_mtime)
+
+        return "%s-%s.npy" % (self._get_path_prefix(filename, kind),
+                              hashlib.sha1(version).hexdigest())
+
+    def _get_path_prefix(self, filename, kind):
+        """!
+        Gets the path prefix shared by all entries of a source file and kind.
+
+        \param      filename  path to source file
+        \param      kind      string to describe the kind of data
+
+        \return     path prefix
+        """
+        key = "%s|%s" % (os.path.abspath(filename), kind)
+
+        return os.path.join(self._directory, hashlib.sha1(key).hexdigest())
+
+    def _remove_stale_entries(self, filename, kind):
+        """!
+        Remove the entries of a source file and kind which were invalidated
+        by modifying the source file.
+
+        \param      filename  path to source file
+        \param      kind      string to describe the kind of data
+        """
+        path = self._get_path(filename, kind)
+
+        for path_stale in glob.glob(
+                self._get_path_prefix(filename, kind) + "-*.npy"):
+            if path_stale != path:
+                try:
+                    os.remove(path_stale)
+                except OSError:
+                    # Entry might have been removed by another process
+                    pass
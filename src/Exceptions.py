@@ -45,6 +45,24 @@ class CsvFileFlawed(Exception):
         return error
 
 
+class ManifestFlawed(Exception):
+    """!
+    Error handling in case given manifest is flawed in whatever way
+    """
+
+    def __init__(self, message):
+        """!
+        Store error message
+
+        \param      message  message to be stated in case of error
+        """
+        self.message = message
+
+    def __str__(self):
+        error = "Given manifest is flawed. %s" % (self.message)
+        return error
+
+
 class FolderNotExistent(Exception):
     """!
     Error handling in case specified folder does not exist
@@ -6,6 +6,8 @@
 \date       June 2017
 """
 
+import numpy as np
+
 import src.parsing as parsing
 from src.Slice import Slice
 
@@ -16,23 +18,96 @@ class Image(Slice):
     \date       2017-06-02 19:24:19+0100
     """
 
-    def __init__(self, slice_id, filename):
+    __slots__ = ("_cache", "_header")
+
+    def __init__(self, slice_id, filename, cache=None, shape=None,
+                 data_type=None, check_existence=True):
         """!
         Store the slice_id and absolute filename provided in the parameters
         
-        \param      slice_id  integer value referring to the image number
-        \param      filename  absolute path to filename
+        \param      slice_id         integer value referring to the image
+                                     number
+        \param      filename         absolute path to filename
+        \param      cache            optional DiskCache object to store
+                                     decoded image data persistently
+        \param      shape            optional shape of the image data array.
+                                     If given together with data_type, the
+                                     DICOM header is not read.
+        \param      data_type        optional numpy data type of the image
+                                     data array
+        \param      check_existence  boolean to check whether the file exists
         """
-        Slice.__init__(self, slice_id=slice_id, filename=filename)
+        Slice.__init__(self, slice_id=slice_id, filename=filename,
+                       check_existence=check_existence)
+
+        self._cache = cache
+
+        if shape is not None and data_type is not None:
+            self._header = {'shape': tuple(shape),
+                            'data_type': np.dtype(data_type)}
+        else:
+            self._header = None
 
     def get_data(self):
         """!
         Gets the slice image data.
 
-        \details    Read data array whenever required to keep memory usage low
+        \details    Read data array whenever required to keep memory usage low.
+                    If a cache is given, the decoded data array is read from
+                    and stored to it.
 
         \return     numpy array of image data.
         """
-        
+
+        if self._cache is not None:
+            data = self._cache.load(self._filename, "image")
+            if data is not None:
+                return data
+
         image = parsing.parse_dicom_file(self._filename)
-        return image['pixel_data']
+        data = image['pixel_data']
+
+        if self._cache is not None:
+            self._cache.save(self._filename, "image", data)
+
+        return data
+
+    def get_shape(self):
+        """!
+        Gets the shape of the image data array.
+
+        \details    Only the DICOM header is read, i.e. no pixel data is
+                    decoded.
+
+        \return     tuple describing the shape of the image data array.
+        """
+        return self._get_header()['shape']
+
+    def get_data_type(self):
+        """!
+        Gets the data type of the image data array.
+
+        \details    Only the DICOM header is read, i.e. no pixel data is
+                    decoded.
+
+        \return     numpy data type of the image data array.
+        """
+        return self._get_header()['data_type']
+
+    def _get_header(self):
+        """!
+        Gets the DICOM header information. It is read only once.
+
+        \details    If the decoded data array is cached already, shape and
+                    data type are taken from the header of the cache entry.
+
+        \return     dictionary holding shape and data type of image data
+        """
+        if self._header is None and self._cache is not None:
+            data = self._cache.load(self._filename, "image", mmap_mode="r")
+            if data is not None:
+                self._header = {'shape': data.shape, 'data_type': data.dtype}
+
+        if self._header is None:
+            self._header = parsing.parse_dicom_header(self._filename)
+        return self._header
@@ -0,0 +1,189 @@
+"""
+\file IntervalThresholdMaskingScheme.py
+\brief      Class to generate and evaluate masks obtained by thresholding
+            with a lower and an upper threshold
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import numpy as np
+
+from src.ThresholdMaskingScheme import ThresholdMaskingScheme
+
+
+class IntervalThresholdMaskingScheme(ThresholdMaskingScheme):
+    """
+    Estimate the blood pool mask by keeping the values within an intensity
+    interval given a target and image array according to the format defined
+    by the class DataBase.
+
+    \details    A pixel within the o-contours is estimated to belong to the
+                blood pool if its intensity v satisfies t_low < v <= t_high.
+                As for ThresholdMaskingScheme, pixels outside the o-contours
+                are considered to have intensity 0. Thus, the interval
+                (t_low, inf) yields the same mask as the threshold t_low.
+                Parameters are pairs (t_low, t_high).
+    """
+
+    def __init__(self, images_array=None, targets_array=None,
+                 label_ground_truth_target=2, thresholds_list=[0, 250],
+                 sweep="thresholds", n_jobs=1, distance_maps_bytes=2 ** 28):
+        """
+        Store information on given image and target data array where the target
+        array includes labelling information.
+
+        \param      images_array               Images data as numpy array
+        \param      targets_array              Targets data as numpy array
+        \param      label_ground_truth_target  index referring to the label in
+                                               targets_array being considered
+                                               as "ground-truth"
+        \param      thresholds_list            list of thresholds. All pairs
+                                               t_low < t_high are considered
+                                               as intervals for automatic
+                                               sweeping.
+        \param      sweep                      string "thresholds" to sweep
+                                               through all pairs of the
+                                               thresholds_list. Sweeping
+                                               through all pairs of distinct
+                                               intensities is not supported
+                                               as their number grows
+                                               quadratically.
+        \param      n_jobs                     number of threads to evaluate
+                                               intervals on chunks of slices
+                                               in parallel
+        \param      distance_maps_bytes        byte budget to keep distance
+                                               maps of ground-truth slices in
+                                               memory for surface distances
+        """
+        if sweep != "thresholds":
+            raise ValueError("Sweep '%s' not supported for intervals. Use "
+                             "'thresholds'" % (sweep))
+
+        ThresholdMaskingScheme.__init__(
+            self,
+            images_array=images_array,
+            targets_array=targets_array,
+            label_ground_truth_target=label_ground_truth_target,
+            thresholds_list=thresholds_list,
+            n_jobs=n_jobs,
+            distance_maps_bytes=distance_maps_bytes)
+
+    def get_candidate_parameters(self):
+        """!
+        Gets the intervals considered for estimating the optimal one.
+
+        \return     list of pairs (t_low, t_high) with t_low < t_high of the
+                    thresholds_list
+        """
+        thresholds = np.unique(self._thresholds_list)
+
+        return [(thresholds[i], thresholds[j])
+                for i in range(0, len(thresholds))
+                for j in range(i + 1, len(thresholds))]
+
+    def estimate_optimal_parameter(self):
+        """!
+        Estimate optimal interval with respect to Dice score by sweeping
+        through all pairs of the provided thresholds.
+
+        \return     Optimal interval (t_low, t_high) corresponding to highest
+                    dice score
+        """
+        dice_scores_mean = self.evaluate_masking_scheme_by_threshold_sweeping()
+
+        return self.get_candidate_parameters()[np.argmax(dice_scores_mean)]
+
+    def evaluate_masking_scheme_by_threshold_sweeping(self):
+        """!
+        Sweep through all intervals given by pairs of the specified thresholds
+        and return the mean dice scores.
+
+        \return     Mean dice scores as list of length equal to the number of
+                    intervals returned by \p get_candidate_parameters
+        """
+        dice_scores = self.get_dice_matrix(self.get_candidate_parameters())
+
+        return list(dice_scores.mean(axis=1))
+
+    def evaluate_masking_scheme_by_intensity_sweeping(self):
+        """!
+        Sweeping through all pairs of distinct intensities is not supported
+        for intervals, see \p sweep. Hence, a ValueError is raised as for
+        the sweep "intensities" instead of returning the results of single
+        thresholds.
+        """
+        raise ValueError("Sweep 'intensities' not supported for intervals. "
+                         "Use 'thresholds'")
+
+    def get_target_array_estimate(self, interval):
+        """!
+        Gets the target array estimate, i.e. mask of blood pool, by keeping
+        the values within the interval.
+
+        \param      interval  pair (t_low, t_high)
+
+        \return     The target array estimate as numpy array
+        """
+
+        self._check_input()
+
+        threshold_low, threshold_high = interval
+        intensities = self._get_compact_arrays()[0]
+
+        target_array_estimate = np.zeros(self._images_array.shape, dtype=bool)
+        if threshold_low < 0 <= threshold_high:
+            target_array_estimate[...] = True
+            target_array_estimate.flat[self._indices_ocontours] = False
+        target_array_estimate.flat[self._indices_ocontours[
+            (intensities > threshold_low) &
+            (intensities <= threshold_high)]] = True
+
+        return target_array_estimate
+
+    def get_dice_matrix(self, intervals=None):
+        """!
+        Compute the dice scores of all slices for all given intervals.
+
+        \details    The number of pixels within an interval (t_low, t_high]
+                    equals the number of pixels greater than t_low minus the
+                    number of pixels greater than t_high. The latter are the
+                    cumulative sums over the per-slice histograms computed
+                    for the threshold sweep. Hence, all intervals are
+                    evaluated in O(pixels + N_slices x N_intervals) instead of
+                    thresholding the pixels for each interval.
+
+        \param      intervals  list of pairs (t_low, t_high). If None, the
+                               intervals of \p get_candidate_parameters are
+                               used.
+
+        \return     numpy array of shape (len(intervals), N_slices)
+        """
+        self._check_input()
+
+        if intervals is None:
+            intervals = self.get_candidate_parameters()
+
+        outside_counts, outside_ground_truth_counts = \
+            self._get_compact_arrays()[3:5]
+
+        intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+        thresholds_unique = np.unique(intervals)
+
+        estimate_counts, true_positives, ground_truth_counts = \
+            self._get_counts_of_all_slices(thresholds_unique)
+
+        lower = np.searchsorted(thresholds_unique, intervals[:, 0])
+        upper = np.searchsorted(thresholds_unique, intervals[:, 1])
+        estimate_counts, true_positives = [
+            np.maximum(c[:, lower] - c[:, upper], 0)
+            for c in [estimate_counts, true_positives]]
+
+        # Pixels outside the o-contours have intensity 0
+        outside = (intervals[:, 0] < 0) & (0 <= intervals[:, 1])
+        estimate_counts += outside_counts[:, np.newaxis] * outside
+        true_positives += outside_ground_truth_counts[:, np.newaxis] * outside
+
+        ground_truth_counts += outside_ground_truth_counts
+
+        return self._get_dice_scores(
+            estimate_counts, true_positives, ground_truth_counts).transpose()
@@ -0,0 +1,105 @@
+"""
+\file LruCache.py
+\brief      Class to keep data arrays in memory up to a given byte budget
+            using a least recently used (LRU) eviction strategy
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import threading
+import collections
+
+
+class LruCache(object):
+    """!
+    In-memory cache of numpy data arrays with a byte budget. If the budget
+    is exceeded, the least recently used arrays are evicted.
+    """
+
+    def __init__(self, max_bytes):
+        """!
+        Store byte budget and initialize counters
+
+        \param      max_bytes  maximum number of bytes of all cached arrays
+        """
+        self._max_bytes = int(max_bytes)
+
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        # Cache can be shared by several threads, e.g. for prefetching
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """!
+        Gets the cached data array and marks it as most recently used.
+
+        \param      key   hashable key of data array
+
+        \return     numpy data array or None in case it is not cached
+        """
+        with self._lock:
+            data_array = self._entries.pop(key, None)
+            if data_array is None:
+                self._misses += 1
+                return None
+
+            self._entries[key] = data_array
+            self._hits += 1
+            return data_array
+
+    def put(self, key, data_array):
+        """!
+        Cache data array and evict least recently used arrays if the byte
+        budget is exceeded.
+
+        \details    Arrays larger than the byte budget are not cached.
+
+        \param      key         hashable key of data array
+        \param      data_array  numpy data array
+        """
+        if data_array.nbytes > self._max_bytes:
+            return
+
+        with self._lock:
+            data_array_old = self._entries.pop(key, None)
+            if data_array_old is not None:
+                self._bytes -= data_array_old.nbytes
+
+            self._entries[key] = data_array
+            self._bytes += data_array.nbytes
+
+            while self._bytes > self._max_bytes:
+                _, data_array_old = self._entries.popitem(last=False)
+                self._bytes -= data_array_old.nbytes
+                self._evictions += 1
+
+    def clear(self):
+        """!
+        Remove all cached arrays. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_statistics(self):
+        """!
+        Gets the cache statistics.
+
+        \return     dictionary with number of hits, misses, evictions,
+                    cached entries and bytes as well as the byte budget
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+            }
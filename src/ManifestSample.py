@@ -0,0 +1,88 @@
+"""
+\file ManifestSample.py
+\brief      Sample whose images and targets are created from the entries of
+            a dataset manifest written by DataReader.write_manifest.
+
+\details    The manifest holds the resolved DICOM and contour filenames of
+            each slice together with shape and data type of the image data
+            array. Hence, neither directories are listed, nor filenames
+            matched against regular expressions, nor files checked for
+            existence or DICOM headers read when the sample is created.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import src.TargetSingleClass as TargetSingleClass
+import src.Target as Target
+import src.Image as Image
+import src.Exceptions as Exceptions
+from src.Sample import Sample
+
+
+class ManifestSample(Sample):
+    """!
+    Sample created from the manifest entries of its slices
+    """
+
+    def __init__(self, manifest, cache=None, contour_store=None,
+                 encoding="additive"):
+        """!
+        Store the manifest entries of the sample
+
+        \param      manifest       list of dictionaries, one per slice, as
+                                   returned by Sample.get_manifest
+        \param      cache          optional DiskCache object to store decoded
+                                   images and rasterized masks persistently
+        \param      contour_store  optional ContourStore object to read
+                                   contour coordinates from
+        \param      encoding       string "additive" or "class_ids" to
+                                   define how the contours are combined into
+                                   the target data array, see Target
+        """
+        self._manifest = manifest
+        self._cache = cache
+        self._contour_store = contour_store
+        self._encoding = encoding
+
+        self._images = None
+        self._targets = None
+
+    def create_sample(self):
+        """!
+        Create a sample containing all images and targets listed in the
+        manifest.
+
+        \post       list of images and targets is created
+        """
+
+        # Ensure that at least one valid image with mask is provided
+        if len(self._manifest) == 0:
+            raise Exceptions.SampleNotValid()
+
+        self._images = [None] * len(self._manifest)
+        self._targets = [None] * len(self._manifest)
+
+        for i, entry in enumerate(self._manifest):
+
+            self._images[i] = Image.Image(
+                slice_id=entry["slice_id"],
+                filename=entry["dicom"],
+                cache=self._cache,
+                shape=entry["shape"],
+                data_type=entry["data_type"],
+                check_existence=False)
+
+            targets_single_class_list = [
+                TargetSingleClass.TargetSingleClass(
+                    slice_id=entry["slice_id"],
+                    filename=filename,
+                    shape=self._images[i].get_shape(),
+                    cache=self._cache,
+                    contour_store=self._contour_store,
+                    check_existence=False)
+                for filename in entry["contours"]
+            ]
+
+            self._targets[i] = Target.Target(
+                targets_single_class_list, encoding=self._encoding)
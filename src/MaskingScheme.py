@@ -13,16 +13,35 @@ from abc import ABCMeta, abstractmethod
 class MaskingScheme(object):
     __metaclass__ = ABCMeta
 
-    def __init__(self, images_array=None, targets_array=None):
+    def __init__(self, images_array=None, targets_array=None, n_jobs=1):
         """!
         Store information on given image and target data array where the target
         array includes labelling information.
 
         \param      images_array   Images data as numpy array
         \param      targets_array  Targets data as numpy array
+        \param      n_jobs         number of jobs to evaluate the masking
+                                   scheme in parallel
         """
         self._images_array = images_array
         self._targets_array = targets_array
+        self._n_jobs = n_jobs
+
+    def get_n_jobs(self):
+        """!
+        Gets the number of jobs to evaluate the masking scheme in parallel.
+
+        \return     number of jobs
+        """
+        return self._n_jobs
+
+    def set_n_jobs(self, n_jobs):
+        """!
+        Sets the number of jobs to evaluate the masking scheme in parallel.
+
+        \param      n_jobs  number of jobs
+        """
+        self._n_jobs = n_jobs
 
     def set_images_array(self, images_array):
         """!
@@ -47,3 +66,39 @@ class MaskingScheme(object):
     @abstractmethod
     def get_mean_dice_score(self, parameter):
         pass
+
+    @abstractmethod
+    def get_metrics(self, parameter):
+        """!
+        Compute overlap and volume metrics of all slices for a parameter.
+
+        \param      parameter  parameter of masking scheme
+
+        \return     dictionary of numpy arrays of shape (N_slices,) as
+                    returned by metrics.get_metrics
+        """
+        pass
+
+    @abstractmethod
+    def get_candidate_parameters(self):
+        """!
+        Gets the parameters considered for estimating the optimal one.
+
+        \return     list of parameters
+        """
+        pass
+
+    @abstractmethod
+    def get_dice_matrix(self, parameters):
+        """!
+        Compute the dice scores of all slices for all given parameters.
+
+        \details    As the dice scores of different slices are independent,
+                    they can be computed batch by batch, e.g. to train on
+                    data which does not fit into memory.
+
+        \param      parameters  list of parameters
+
+        \return     numpy array of shape (len(parameters), N_slices)
+        """
+        pass
@@ -0,0 +1,181 @@
+"""
+\file RunLengthMask.py
+\brief      Class to represent a binary mask by its runs of foreground pixels
+
+\details    A run is given by the start and end (exclusive) flat indices of
+            consecutive foreground pixels of the mask in row-major order.
+            Contour masks cover a small fraction of a slice only. Hence, their
+            runs need far less memory than the dense mask and overlaps can be
+            evaluated on the runs directly.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import numpy as np
+
+import src.Exceptions as Exceptions
+
+
+class RunLengthMask(object):
+    """!
+    Binary mask represented by sorted, disjoint and non-adjacent runs of
+    foreground pixels
+    """
+
+    def __init__(self, starts, ends, shape):
+        """!
+        Store the runs of the mask
+
+        \param      starts  start flat indices of runs, sorted
+        \param      ends    end (exclusive) flat indices of runs, sorted.
+                            Runs must be disjoint and non-adjacent, e.g. as
+                            returned by parsing.polygons_to_runs
+        \param      shape   shape of the dense mask, e.g. (H, W) or (N, H, W)
+                            for stacked slices
+        """
+        self._shape = tuple(shape)
+
+        # 32 bit flat indices unless the mask is too large, e.g. a large stack
+        data_type = np.int32 if np.prod(self._shape) < 2 ** 31 else np.int64
+        self._starts = np.asarray(starts, dtype=data_type)
+        self._ends = np.asarray(ends, dtype=data_type)
+
+    def get_starts(self):
+        """!
+        Gets the start flat indices of the runs.
+
+        \return     numpy integer array of shape (N_runs,)
+        """
+        return self._starts
+
+    def get_ends(self):
+        """!
+        Gets the end (exclusive) flat indices of the runs.
+
+        \return     numpy integer array of shape (N_runs,)
+        """
+        return self._ends
+
+    def get_shape(self):
+        """!
+        Gets the shape of the dense mask.
+
+        \return     tuple describing the shape of the dense mask
+        """
+        return self._shape
+
+    def get_area(self):
+        """!
+        Gets the number of foreground pixels.
+
+        \return     integer number of foreground pixels
+        """
+        return int(np.sum(self._ends - self._starts, dtype=np.int64))
+
+    def union(self, other):
+        """!
+        Gets the union of this and another mask.
+
+        \param      other  RunLengthMask object of same shape
+
+        \return     RunLengthMask object
+        """
+        return self._combine(other, np.logical_or)
+
+    def intersection(self, other):
+        """!
+        Gets the intersection of this and another mask.
+
+        \param      other  RunLengthMask object of same shape
+
+        \return     RunLengthMask object
+        """
+        return self._combine(other, np.logical_and)
+
+    def get_dice_score(self, other):
+        """!
+        Compute the Dice score of this and another mask.
+
+        \param      other  RunLengthMask object of same shape
+
+        \return     Dice score as float, nan if both masks are empty
+        """
+        denominator = self.get_area() + other.get_area()
+        if denominator == 0:
+            return np.nan
+
+        return 2 * self.intersection(other).get_area() / float(denominator)
+
+    def to_dense(self, out=None):
+        """!
+        Gets the dense mask.
+
+        \param      out   optional preallocated boolean array of shape of the
+                          mask to write the mask into, e.g. a view on a
+                          slice of a batch array
+
+        \return     numpy boolean array of shape of the mask
+        """
+        if out is None:
+            out = np.zeros(self._shape, dtype=bool)
+        else:
+            if out.shape != self._shape:
+                raise Exceptions.ShapeMismatch()
+
+            # Flat indices address C-contiguous arrays only
+            if not out.flags.c_contiguous:
+                out[...] = self.to_dense()
+                return out
+
+            out[...] = False
+
+        lengths = (self._ends - self._starts).astype(np.int64)
+        offsets = np.cumsum(lengths) - lengths
+        pixels = np.repeat(self._starts - offsets, lengths) + \
+            np.arange(lengths.sum())
+        out.reshape(-1)[pixels] = True
+
+        return out
+
+    def _combine(self, other, operation):
+        """!
+        Combine this and another mask pixel-wise.
+
+        \details    The run boundaries of both masks split the flat indices
+                    into intervals on which both masks are constant. Hence,
+                    the operation is only evaluated once per interval.
+
+        \param      other      RunLengthMask object of same shape
+        \param      operation  function mapping two boolean arrays to one,
+                               e.g. np.logical_and
+
+        \return     RunLengthMask object
+        """
+        if self._shape != other.get_shape():
+            raise Exceptions.ShapeMismatch()
+
+        positions = np.unique(np.concatenate([
+            self._starts, self._ends, other.get_starts(), other.get_ends()]))
+
+        # Combined value on each interval [positions[i], positions[i+1]).
+        # The interval after the last position is always background.
+        is_foreground = operation(
+            self._is_foreground(positions), other._is_foreground(positions))
+        is_first = is_foreground & ~np.append(False, is_foreground[:-1])
+        is_last = is_foreground & ~np.append(is_foreground[1:], False)
+
+        return RunLengthMask(positions[is_first],
+                             positions[np.flatnonzero(is_last) + 1],
+                             self._shape)
+
+    def _is_foreground(self, positions):
+        """!
+        Check whether pixels at given flat indices belong to the mask.
+
+        \param      positions  numpy array of flat indices
+
+        \return     numpy boolean array of same shape as positions
+        """
+        return np.searchsorted(self._starts, positions, side="right") > \
+            np.searchsorted(self._ends, positions, side="right")
@@ -39,7 +39,9 @@
 
 import os
 import re
+import json
 import pylab
+import numpy as np
 
 import src.TargetSingleClass as TargetSingleClass
 import src.Target as Target
@@ -58,7 +60,10 @@ class Sample(object):
                  directory_dicoms,
                  directory_contours_list,
                  regular_expression_dicoms='([0-9]+)[.]dcm',
-                 regular_expression_contours='IM[-][0-9]+[-]([0-9]+)[-].*[.]txt'):
+                 regular_expression_contours='IM[-][0-9]+[-]([0-9]+)[-].*[.]txt',
+                 cache=None,
+                 contour_store=None,
+                 encoding="additive"):
         """!
         Store paths and filenames required to create a sample
         
@@ -73,12 +78,24 @@ class Sample(object):
         \param      regular_expression_dicoms  define regular expression
                                                pattern for valid contour
                                                filenames
+        \param      cache                      optional DiskCache object to
+                                               store decoded images and
+                                               rasterized masks persistently
+        \param      contour_store              optional ContourStore object to
+                                               read contour coordinates from
+        \param      encoding                   string "additive" or
+                                               "class_ids" to define how the
+                                               contours are combined into the
+                                               target data array, see Target
         """
 
         self._directory_dicoms = directory_dicoms
         self._directory_contours_list = directory_contours_list
         self._regular_expression_dicoms = regular_expression_dicoms
         self._regular_expression_contours = regular_expression_contours
+        self._cache = cache
+        self._contour_store = contour_store
+        self._encoding = encoding
 
         self._images = None
         self._targets = None
@@ -126,7 +143,8 @@ class Sample(object):
             self._images[i] = Image.Image(
                 slice_id=image_id,
                 filename=os.path.abspath(os.path.join(
-                    self._directory_dicoms, dictionary_dicoms[image_id])))
+                    self._directory_dicoms, dictionary_dicoms[image_id])),
+                cache=self._cache)
 
             # Create list of targets using image id and absolute filename for contours
             targets_single_class_list = [
@@ -135,12 +153,15 @@ class Sample(object):
                     filename=os.path.abspath(os.path.join(
                         self._directory_contours_list[j],
                         dictionary_contours_list[j][image_id])),
-                    shape=self._images[i].get_data().shape)
+                    shape=self._images[i].get_shape(),
+                    cache=self._cache,
+                    contour_store=self._contour_store)
                 for j in range(0, len(self._directory_contours_list))
             ]
 
             # Create a target holding all specified contours.
-            self._targets[i] = Target.Target(targets_single_class_list)
+            self._targets[i] = Target.Target(
+                targets_single_class_list, encoding=self._encoding)
 
 
     def get_images(self):
@@ -165,6 +186,106 @@ class Sample(object):
 
         return self._targets
 
+    def get_cache(self):
+        """!
+        Gets the cache storing decoded images and rasterized masks.
+
+        \return     DiskCache object or None
+        """
+        return self._cache
+
+    def get_contour_store(self):
+        """!
+        Gets the contour store to read contour coordinates from.
+
+        \return     ContourStore object or None
+        """
+        return self._contour_store
+
+    def export_volume(self, directory, name):
+        """!
+        Export all images and targets into one memory-mappable volume store.
+
+        \details    Images and targets are written as npy-files of shape
+                    (N_slices, height, width) with each slice being one
+                    contiguous block. A JSON sidecar index links the slice ids
+                    with the positions of the slices within the npy-files.
+                    The volume store can be opened via VolumeSample.
+
+        \param      directory  path to output directory
+        \param      name       name of volume store, e.g. the patient id
+
+        \return     path to JSON sidecar index
+        """
+        if self._images is None:
+            raise Exceptions.ObjectNotCreated("create_sample")
+
+        # The shape and data types of the volumes are taken from the slices
+        if len(self._images) == 0:
+            raise Exceptions.SampleNotValid()
+
+        if not utils.directory_exists(directory):
+            os.makedirs(directory)
+
+        N_images = len(self._images)
+        shape = self._images[0].get_shape()
+
+        index = {
+            "slice_ids": [image.get_id() for image in self._images],
+            "shape": list(shape),
+        }
+
+        for key, slices in [("images", self._images),
+                            ("targets", self._targets)]:
+            filename = "%s_%s.npy" % (name, key)
+            data_type = slices[0].get_data_type()
+
+            volume = np.lib.format.open_memmap(
+                os.path.join(directory, filename),
+                mode="w+",
+                dtype=data_type,
+                shape=(N_images,) + tuple(shape))
+            for i in range(0, N_images):
+                volume[i] = slices[i].get_data()
+            volume.flush()
+
+            index[key] = {
+                "filename": filename,
+                "data_type": data_type.str,
+            }
+            del volume
+
+        filename_index = os.path.join(directory, "%s.json" % (name))
+        with open(filename_index, "w") as f:
+            json.dump(index, f, indent=1)
+
+        return filename_index
+
+    def get_manifest(self):
+        """!
+        Gets the resolved files and array information of all slices.
+
+        \details    The returned list can be stored, e.g. as JSON, and used to
+                    recreate the sample via ManifestSample without listing
+                    directories, matching filenames or reading DICOM headers.
+
+        \return     list of dictionaries, one per slice, holding the slice
+                    id, the DICOM filename, the list of contour filenames and
+                    shape and data type of the image data array. None if the
+                    sample cannot be described by a manifest.
+        """
+        if self._images is None:
+            raise Exceptions.ObjectNotCreated("create_sample")
+
+        return [{
+            "slice_id": image.get_id(),
+            "dicom": image.get_filename(),
+            "contours": [t.get_filename()
+                         for t in target.get_single_class_targets()],
+            "shape": list(image.get_shape()),
+            "data_type": image.get_data_type().str,
+        } for image, target in zip(self._images, self._targets)]
+
     def show(self, mask=False, alpha=0.4):
         """!
         Show all image slices and masks (optional) of sample sequentially
@@ -22,17 +22,24 @@ class Slice(object):
     """
     __metaclass__ = ABCMeta
 
-    def __init__(self, slice_id, filename):
+    # No dictionary per object since one object exists per slice
+    __slots__ = ("_slice_id", "_filename")
+
+    def __init__(self, slice_id, filename, check_existence=True):
         """!
         Store the slice_id and absolute filename provided in the parameters
         
-        \param      slice_id  integer value referring to the image number
-        \param      filename  absolute path to filename
+        \param      slice_id         integer value referring to the image
+                                     number
+        \param      filename         absolute path to filename
+        \param      check_existence  boolean to check whether the file exists.
+                                     Can be skipped if the filename was
+                                     resolved beforehand, e.g. by a manifest.
         """
         self._slice_id = slice_id
         self._filename = filename
 
-        if not utils.file_exists(self._filename):
+        if check_existence and not utils.file_exists(self._filename):
             raise Exceptions.FileNotExistent(self._filename)
 
     @abstractmethod
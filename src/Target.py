@@ -4,7 +4,8 @@
 
 Multiple classes/contours can be described by combining the information of
 several single class targets. The data array specified by multiple contours is
-given by the array obtained by adding all single contour masks.
+given by the array obtained by adding all single contour masks or, optionally,
+by labelling each contour by its class ID.
 
 \author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
 \date       June 2017
@@ -13,6 +14,7 @@ given by the array obtained by adding all single contour masks.
 import numpy as np
 import pylab
 import src.parsing as parsing
+import src.Exceptions as Exceptions
 from src.Slice import Slice
 
 
@@ -23,37 +25,117 @@ class Target(object):
     single class targets.
     """
 
-    def __init__(self, single_targets_list):
+    # No dictionary per object since one object exists per slice
+    __slots__ = ("_single_targets_list", "_slice_id", "_encoding")
+
+    def __init__(self, single_targets_list, encoding="additive"):
         """!
         Class to define a target (mask) for a training sample
 
         \param      single_targets_list  List of TargetSingleClass objects
+        \param      encoding             string "additive" to add all single
+                                         class masks or "class_ids" to label
+                                         the pixels of the i-th single class
+                                         target by i+1. For class IDs, the
+                                         label of the target coming first in
+                                         the list is kept in overlapping
+                                         regions.
         """
+        if encoding not in ["additive", "class_ids"]:
+            raise ValueError("Encoding '%s' not supported. Use 'additive' or "
+                             "'class_ids'" % (encoding))
+
         self._single_targets_list = single_targets_list
         self._slice_id = single_targets_list[0].get_id()
+        self._encoding = encoding
 
-    def get_data(self):
+    def get_data(self, out=None):
         """!
         Gets the target image data as integer numpy array to accommodate
         different classes.
 
         The data array specified by multiple contours is given by the array
-        obtained by adding all single contour masks.
+        obtained by adding all single contour masks or by the class IDs of
+        the contours.
+
+        \details    Read data array whenever required to keep memory usage low.
+                    The contours of all classes are drawn one after another
+                    and written directly into one label array. If the single
+                    class targets use a cache, their cached masks are written
+                    into the label array instead.
 
-        \details    Read data array whenever required to keep memory usage low
+        \param      out   optional preallocated numpy uint8 array of the shape
+                          of the target data array to write the target data
+                          into, e.g. a slice of a batch array
 
         \return     numpy integer array of target (mask) data.
         """
 
-        # Read data/mask specified by first contour
-        data_array = self._single_targets_list[0].get_data().astype(np.uint8)
+        # Same shape as the mask returned by parsing.poly_to_mask
+        width, height = self.get_shape()
+
+        if out is None:
+            out = np.zeros((height, width), dtype=np.uint8)
+        elif out.shape != (height, width):
+            raise Exceptions.ShapeMismatch()
+
+        N_classes = len(self._single_targets_list)
+        if self._encoding == "additive":
+            labels = np.ones(N_classes, dtype=np.uint8)
+        else:
+            labels = np.arange(1, N_classes + 1, dtype=np.uint8)
+
+        if any(t.get_cache() is not None for t in self._single_targets_list):
+            out[...] = 0
+            for (target, label) in zip(self._single_targets_list, labels):
+                mask = target.get_data()
+                if self._encoding == "additive":
+                    out[mask] += label
+                else:
+                    out[mask & (out == 0)] = label
+            return out
+
+        polygons = [t.get_coordinates() for t in self._single_targets_list]
+        if self._encoding == "additive":
+            return parsing.polygons_to_label_map(
+                polygons, width, height, labels, out=out, additive=True)
+
+        # Later polygons overwrite earlier ones. Hence, reverse the order to
+        # keep the label of the target coming first.
+        return parsing.polygons_to_label_map(
+            polygons[::-1], width, height, labels[::-1], out=out)
+
+    def get_encoding(self):
+        """!
+        Gets the encoding of the classes in the target data array.
+
+        \return     string "additive" or "class_ids"
+        """
+        return self._encoding
+
+    def get_single_class_targets(self):
+        """!
+        Gets the single class targets.
+
+        \return     list of TargetSingleClass objects
+        """
+        return self._single_targets_list
 
-        # Add data/masks specified by subsequent contours
-        for i in range(1, len(self._single_targets_list)):
-            data_array += self._single_targets_list[
-                i].get_data().astype(np.uint8)
+    def get_shape(self):
+        """!
+        Gets the shape of the target data array.
 
-        return data_array
+        \return     tuple describing the shape of the target data array.
+        """
+        return self._single_targets_list[0].get_shape()
+
+    def get_data_type(self):
+        """!
+        Gets the data type of the target data array.
+
+        \return     numpy data type of the target data array.
+        """
+        return np.dtype(np.uint8)
 
     def show(self):
         """!
@@ -6,7 +6,11 @@
 \date       June 2017
 """
 
+import numpy as np
+
 import src.parsing as parsing
+import src.packing as packing
+import src.RunLengthMask as RunLengthMask
 from src.Slice import Slice
 
 
@@ -16,22 +20,124 @@ class TargetSingleClass(Slice):
     single class can be described.
     """
 
-    def __init__(self, slice_id, filename, shape):
+    __slots__ = ("_shape", "_cache", "_contour_store")
+
+    def __init__(self, slice_id, filename, shape, cache=None,
+                 contour_store=None, check_existence=True):
         """!
         Class to define a target (mask) for a training sample
+
+        \param      slice_id  integer value referring to the image number
+        \param      filename  absolute path to contour file
+        \param      shape     shape of the associated image data array
+        \param      cache          optional DiskCache object to store
+                                   rasterized masks persistently
+        \param      contour_store  optional ContourStore object to read the
+                                   contour coordinates from
+        \param      check_existence  boolean to check whether the contour
+                                     file exists
         """
 
-        Slice.__init__(self, slice_id=slice_id, filename=filename)
+        Slice.__init__(self, slice_id=slice_id, filename=filename,
+                       check_existence=check_existence)
         self._shape = shape
+        self._cache = cache
+        self._contour_store = contour_store
 
     def get_data(self):
         """!
         Gets the target image data.
 
-        \details    Read data array whenever required to keep memory usage low
+        \details    Read data array whenever required to keep memory usage low.
+                    If a cache is given, the bit-packed mask is read from and
+                    stored to it. If a contour store is given, the contour
+                    coordinates are read from it instead of the contour file.
 
         \return     numpy boolean array of target (mask) data.
         """
-        
-        coordinates = parsing.parse_contour_file(self._filename)
-        return parsing.poly_to_mask(coordinates, *self._shape)
+
+        if self._cache is None:
+            return parsing.poly_to_mask(self.get_coordinates(), *self._shape)
+
+        # Same shape as the mask returned by parsing.poly_to_mask
+        return packing.unpack_masks(
+            self.get_packed_data(), (self._shape[1], self._shape[0]))
+
+    def get_packed_data(self):
+        """!
+        Gets the target image data bit-packed, i.e. one bit per pixel.
+
+        \details    If a cache is given, the packed mask is read from and
+                    stored to it.
+
+        \return     numpy uint8 array as returned by packing.pack_masks
+        """
+
+        kind = "packed-mask-%s" % ("x".join(map(str, self._shape)))
+
+        if self._cache is not None:
+            data = self._cache.load(self._filename, kind)
+            if data is not None:
+                return data
+
+        data = packing.pack_masks(
+            parsing.poly_to_mask(self.get_coordinates(), *self._shape))
+
+        if self._cache is not None:
+            self._cache.save(self._filename, kind, data)
+
+        return data
+
+    def get_run_length_data(self):
+        """!
+        Gets the target image data as runs of foreground pixels.
+
+        \details    Only the rows covered by the contour are rasterized, i.e.
+                    the dense mask is not kept.
+
+        \return     RunLengthMask object of same shape as the array of
+                    \p get_data
+        """
+        starts, ends = parsing.polygons_to_runs(
+            [self.get_coordinates()], *self._shape)[0]
+
+        # Same shape as the mask returned by parsing.poly_to_mask
+        return RunLengthMask.RunLengthMask(
+            starts, ends, (self._shape[1], self._shape[0]))
+
+    def get_coordinates(self):
+        """!
+        Gets the contour coordinates.
+
+        \return     numpy array of shape (K, 2) holding x, y coordinates
+        """
+        if self._contour_store is not None:
+            coordinates = self._contour_store.get_coordinates(self._filename)
+            if coordinates is not None:
+                return coordinates
+
+        return parsing.parse_contour_file_array(self._filename)
+
+    def get_cache(self):
+        """!
+        Gets the cache storing the rasterized mask.
+
+        \return     DiskCache object or None
+        """
+        return self._cache
+
+    def get_shape(self):
+        """!
+        Gets the shape of the target data array.
+
+        \return     tuple describing the shape of the target data array.
+        """
+        return self._shape
+
+    def get_data_type(self):
+        """!
+        Gets the data type of the target data array.
+
+        \return     numpy data type of the target data array.
+        """
+        return np.dtype(bool)
@@ -5,8 +5,12 @@
 \date       June 2017
 """
 
+import hashlib
 import numpy as np
-import src.utilities as utils
+from multiprocessing.pool import ThreadPool
+
+import src.LruCache as LruCache
+import src.metrics as metrics
 import src.Exceptions as Exceptions
 from src.MaskingScheme import MaskingScheme
 
@@ -31,7 +35,8 @@ class ThresholdMaskingScheme(MaskingScheme):
     """
 
     def __init__(self, images_array=None, targets_array=None,
-                 label_ground_truth_target=2, thresholds_list=[0, 250]):
+                 label_ground_truth_target=2, thresholds_list=[0, 250],
+                 sweep="thresholds", n_jobs=1, distance_maps_bytes=2 ** 28):
         """
         Store information on given image and target data array where the target
         array includes labelling information.
@@ -43,11 +48,93 @@ class ThresholdMaskingScheme(MaskingScheme):
                                                as "ground-truth"
         \param      thresholds_list            list of thresholds for automatic
                                                sweeping
+        \param      sweep                      string "thresholds" to sweep
+                                               through the thresholds_list or
+                                               "intensities" to sweep through
+                                               all distinct intensities within
+                                               the o-contours
+        \param      n_jobs                     number of threads to evaluate
+                                               thresholds on chunks of slices
+                                               in parallel
+        \param      distance_maps_bytes        byte budget to keep distance
+                                               maps of ground-truth slices in
+                                               memory for surface distances
         """
-        MaskingScheme.__init__(self, images_array=images_array, targets_array=targets_array)
+        MaskingScheme.__init__(self, images_array=images_array, targets_array=targets_array, n_jobs=n_jobs)
         
+        if sweep not in ["thresholds", "intensities"]:
+            raise ValueError("Sweep '%s' not supported. Use 'thresholds' or "
+                             "'intensities'" % (sweep))
+
         self._label_ground_truth_target = label_ground_truth_target
         self._thresholds_list = thresholds_list
+        self._sweep = sweep
+
+        # Pixel information derived from the arrays, see _get_compact_arrays
+        self._compact_arrays = None
+        self._indices_ocontours = None
+
+        # Distance maps of ground-truth slices. They are kept across
+        # targets arrays, see _get_distance_maps.
+        self._distance_maps = LruCache.LruCache(distance_maps_bytes)
+
+        # Thread pool reused across evaluations, see _get_pool
+        self._pool = None
+        self._N_threads_pool = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        # No pool exists if the constructor failed
+        if hasattr(self, "_pool"):
+            self.close()
+
+    def close(self):
+        """!
+        Close the thread pool used to evaluate chunks of slices in parallel.
+
+        \details    A new pool is created once required again. The masking
+                    scheme can also be used as context manager to close the
+                    pool on exit.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._N_threads_pool = 0
+
+    def set_n_jobs(self, n_jobs):
+        """!
+        Sets the number of jobs to evaluate the masking scheme in parallel.
+
+        \details    The current thread pool is closed.
+
+        \param      n_jobs  number of jobs
+        """
+        MaskingScheme.set_n_jobs(self, n_jobs)
+        self.close()
+
+    def set_images_array(self, images_array):
+        """!
+        Sets the images array.
+
+        \param      images_array  Images data as numpy array
+        """
+        MaskingScheme.set_images_array(self, images_array)
+        self._compact_arrays = None
+
+    def set_targets_array(self, targets_array):
+        """!
+        Sets the targets array.
+
+        \param      targets_array  Target data as numpy array
+        """
+        MaskingScheme.set_targets_array(self, targets_array)
+        self._compact_arrays = None
 
     def set_thresholds(self, thresholds_list):
         """!
@@ -57,14 +144,41 @@ class ThresholdMaskingScheme(MaskingScheme):
         """
         self._thresholds_list = thresholds_list
 
+    def get_candidate_parameters(self):
+        """!
+        Gets the thresholds considered for estimating the optimal one.
+
+        \details    The thresholds of the sweep through all intensities depend
+                    on the images and targets arrays. Hence, they cannot be
+                    provided beforehand, e.g. to evaluate them batch by batch,
+                    and a ValueError is raised.
+
+        \return     list of thresholds
+        """
+        if self._sweep == "intensities":
+            raise ValueError("Candidate thresholds are not known before "
+                             "sweeping through the intensities. Use sweep "
+                             "'thresholds' instead.")
+
+        return self._thresholds_list
+
     def estimate_optimal_parameter(self):
         """!
         Estimate optimal threshold with respect to Dice score by sweeping 
         through all provided thresholds.
 
+        \details    If the sweep is set to "intensities", all distinct
+                    intensities within the o-contours are considered as
+                    thresholds instead, i.e. the global optimum is found.
+
         \return     Optimal threshold corresponding to highest dice score
         """
 
+        if self._sweep == "intensities":
+            thresholds, dice_scores_mean = \
+                self.evaluate_masking_scheme_by_intensity_sweeping()
+            return thresholds[np.argmax(dice_scores_mean)]
+
         dice_scores_mean = self.evaluate_masking_scheme_by_threshold_sweeping()
 
         optimal_threshold = self._thresholds_list[np.argmax(dice_scores_mean)]
@@ -83,10 +197,100 @@ class ThresholdMaskingScheme(MaskingScheme):
         \return     Mean dice scores as list of length equal to the number of
                     specified thresholds to sweep through
         """
-        dice_scores_mean = [self.get_mean_dice_score(self._thresholds_list[i]).mean()
-                            for i in range(0, len(self._thresholds_list))]
+        dice_scores = self.get_dice_matrix(self._thresholds_list)
+
+        return list(dice_scores.mean(axis=1))
+
+    def evaluate_masking_scheme_by_intensity_sweeping(self):
+        """!
+        Sweep through all distinct intensities as thresholds and return the
+        mean dice scores.
+
+        \details    Thresholding changes the estimate only at intensities
+                    present in the images. Hence, sweeping through all
+                    distinct intensities within the o-contours (and 0 for
+                    the pixels outside) covers all possible estimates. The
+                    intensities are sorted once. While lowering the
+                    threshold from the highest intensity, each pixel joins
+                    the estimate of its slice and the mean dice score is
+                    updated incrementally by the change of the dice score of
+                    that slice. A threshold below the smallest intensity
+                    is added to cover the estimate selecting all pixels.
+
+        \return     Pair of numpy arrays holding the sorted thresholds, i.e.
+                    the smallest intensity minus one followed by the
+                    distinct intensities, and the associated mean dice scores
+        """
+        self._check_input()
 
-        return dice_scores_mean
+        intensities, slice_indices, ground_truth, \
+            outside_counts, outside_ground_truth_counts = \
+            self._get_compact_arrays()
+        N_slices = len(outside_counts)
+
+        # Each pixel within the o-contours is one event. Pixels outside the
+        # o-contours are one event per slice with intensity 0.
+        outside = np.flatnonzero(outside_counts > 0)
+        intensities = np.concatenate(
+            [intensities, np.zeros(len(outside))])
+        slice_indices = np.concatenate([slice_indices, outside])
+        counts = np.concatenate(
+            [np.ones(len(ground_truth), dtype=np.int64),
+             outside_counts[outside]])
+        ground_truth_counts = np.concatenate(
+            [ground_truth.astype(np.int64),
+             outside_ground_truth_counts[outside]])
+
+        ground_truth_counts_slices = np.bincount(
+            slice_indices[0:len(ground_truth)][ground_truth],
+            minlength=N_slices) + outside_ground_truth_counts
+
+        # Sort events of each slice by decreasing intensity to get the
+        # numbers of (correctly) estimated pixels of the slice after each
+        # event
+        order = np.lexsort((-intensities, slice_indices))
+        intensities = intensities[order]
+        slice_indices = slice_indices[order]
+        counts = counts[order]
+        ground_truth_counts = ground_truth_counts[order]
+
+        estimate_counts = np.cumsum(counts)
+        true_positives = np.cumsum(ground_truth_counts)
+        first = np.searchsorted(slice_indices, slice_indices, side="left")
+        estimate_counts -= estimate_counts[first] - counts[first]
+        true_positives -= true_positives[first] - ground_truth_counts[first]
+
+        # Change of the dice score of the slice by each event. Slices
+        # without ground-truth have a dice score of nan until the first
+        # pixel is estimated.
+        denominators = ground_truth_counts_slices[slice_indices] + \
+            estimate_counts
+        denominators_before = denominators - counts
+        is_nan_before = denominators_before == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dice_scores_change = \
+                2 * true_positives / denominators.astype(np.float64) - \
+                np.where(is_nan_before, 0, 2 * (
+                    true_positives - ground_truth_counts) /
+                    denominators_before.astype(np.float64))
+
+        # Process events of all slices by decreasing intensity
+        order = np.argsort(-intensities, kind="mergesort")
+        intensities = intensities[order]
+        dice_scores_sum = np.concatenate(
+            [[0], np.cumsum(dice_scores_change[order])])
+        N_nan = np.sum(ground_truth_counts_slices == 0) - np.concatenate(
+            [[0], np.cumsum(is_nan_before[order])])
+
+        # Estimate of a threshold comprises all events of greater intensity.
+        # A threshold below the smallest intensity selects all pixels.
+        first = np.flatnonzero(np.concatenate(
+            [[True], intensities[1:] != intensities[:-1], [True]]))
+        thresholds = np.append(intensities, intensities[-1] - 1)[first]
+        dice_scores_mean = np.where(
+            N_nan[first] > 0, np.nan, dice_scores_sum[first] / N_slices)
+
+        return thresholds[::-1], dice_scores_mean[::-1]
 
     def get_mean_dice_score(self, threshold):
         """!
@@ -96,19 +300,53 @@ class ThresholdMaskingScheme(MaskingScheme):
 
         \return     The mean dice score.
         """
+        return self.get_dice_matrix([threshold])[0].mean()
+
+    def get_metrics(self, threshold):
+        """!
+        Compute Dice score, Jaccard index, sensitivity and volume error of
+        all slices given a specified threshold
+
+        \param      threshold  threshold as integer value
+
+        \return     dictionary of numpy arrays of shape (N_slices,) as
+                    returned by metrics.get_metrics
+        """
+        return metrics.get_metrics(
+            self.get_target_array_estimate(threshold),
+            self._targets_array == self._label_ground_truth_target,
+            slice_axis=2)
+
+    def get_surface_distances(self, threshold, spacing=None):
+        """!
+        Compute the 95th percentile Hausdorff distance and the average
+        symmetric surface distance of all slices given a specified threshold
+
+        \details    The distance maps of the ground-truth slices are cached
+                    and reused across thresholds and targets arrays, see
+                    \p _get_distance_maps.
 
-        # Estimate targets/masks given the set threshold
-        targets_array_estimate = self.get_target_array_estimate(threshold)
+        \param      threshold  threshold as integer value
+        \param      spacing    optional pixel spacing as pair (rows,
+                               columns). If None, distances are given in
+                               pixels.
 
-        # Get ground-truth targets/masks of blood pool
-        targets_array_ground_truth = self._get_ground_truth_targets_array()
+        \return     dictionary of numpy arrays of shape (N_slices,) with keys
+                    "hd95" and "assd" as returned by
+                    metrics.get_surface_distances
+        """
+        self._check_input()
 
-        # Get Dice scores for each single slice
-        dice_scores = [utils.dice_score(targets_array_ground_truth[:, :, j],
-                                        targets_array_estimate[:, :, j]) for j in range(0, targets_array_estimate.shape[2])]
+        targets_array_ground_truth = \
+            self._targets_array == self._label_ground_truth_target
 
-        # Return mean dices score of all slices
-        return np.mean(dice_scores)
+        return metrics.get_surface_distances(
+            self.get_target_array_estimate(threshold),
+            targets_array_ground_truth,
+            slice_axis=2,
+            spacing=spacing,
+            target_distance_maps=self._get_distance_maps(
+                targets_array_ground_truth, spacing))
 
     def get_target_array_estimate(self, threshold):
         """!
@@ -116,7 +354,10 @@ class ThresholdMaskingScheme(MaskingScheme):
         a simple thresholding.
 
         \details    A target mask is being generated by finding the values
-                    within the o-contours region greater than the threshold
+                    within the o-contours region greater than the threshold.
+                    Only the pixels within the o-contours are compared with
+                    the threshold. Pixels outside are considered to have
+                    intensity 0.
 
         \param      threshold  The threshold
 
@@ -125,15 +366,15 @@ class ThresholdMaskingScheme(MaskingScheme):
 
         self._check_input()
 
-        # Recover o-contours given the labels in targets array
-        mask_ocontours = np.zeros(self._images_array.shape, dtype=bool)
-        mask_ocontours[np.where(self._targets_array > 0)] = True
+        intensities = self._get_compact_arrays()[0]
 
         # Within the contours apply a thresholding to estimate masks
-        target_array_estimate = np.zeros_like(mask_ocontours)
-        images_array_masked = self._images_array * mask_ocontours
-        target_array_estimate[
-            np.where(images_array_masked > threshold)] = True
+        target_array_estimate = np.zeros(self._images_array.shape, dtype=bool)
+        if 0 > threshold:
+            target_array_estimate[...] = True
+            target_array_estimate.flat[self._indices_ocontours] = False
+        target_array_estimate.flat[
+            self._indices_ocontours[intensities > threshold]] = True
 
         # utils.show_image_data(
         #     self._images_array,
@@ -142,13 +383,244 @@ class ThresholdMaskingScheme(MaskingScheme):
 
         return target_array_estimate
 
-    def _get_ground_truth_targets_array(self):
+    def get_dice_matrix(self, thresholds=None):
+        """!
+        Compute the dice scores of all slices for all given thresholds.
+
+        \details    Instead of thresholding the entire images array for each
+                    threshold, the intensities within the o-contours are
+                    binned once into per-slice histograms whose bin edges are
+                    the thresholds. The numbers of estimated and correctly
+                    estimated pixels for each threshold then follow from
+                    cumulative sums over the bins. Pixels outside the
+                    o-contours have intensity 0 for thresholding and are
+                    accounted for analytically. Dice scores equal the ones
+                    computed by utils.dice_score on the thresholded arrays,
+                    i.e. nan for slices without ground-truth and estimated
+                    pixels.
+
+        \param      thresholds  list of thresholds. If None, the
+                                thresholds_list is used.
+
+        \return     numpy array of shape (len(thresholds), N_slices)
+        """
+        self._check_input()
+
+        if thresholds is None:
+            thresholds = self._thresholds_list
+
+        outside_counts, outside_ground_truth_counts = \
+            self._get_compact_arrays()[3:5]
+        N_slices = len(outside_counts)
+
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        thresholds_unique = np.unique(thresholds)
+
+        estimate_counts, true_positives, ground_truth_counts = \
+            self._get_counts_of_all_slices(thresholds_unique)
+
+        # Pixels outside the o-contours have intensity 0
+        outside = thresholds_unique < 0
+        estimate_counts += outside_counts[:, np.newaxis] * outside
+        true_positives += outside_ground_truth_counts[:, np.newaxis] * outside
+
+        ground_truth_counts += outside_ground_truth_counts
+
+        dice_scores = self._get_dice_scores(
+            estimate_counts, true_positives, ground_truth_counts)
+
+        return dice_scores[:, np.searchsorted(
+            thresholds_unique, thresholds)].transpose()
+
+    def _get_dice_scores(self, estimate_counts, true_positives,
+                         ground_truth_counts):
+        """!
+        Compute dice scores from pixel counts.
+
+        \param      estimate_counts      numpy array of shape (N_slices, T)
+                                         of estimated pixels
+        \param      true_positives       numpy array of shape (N_slices, T)
+                                         of correctly estimated pixels
+        \param      ground_truth_counts  numpy array of shape (N_slices,) of
+                                         ground-truth pixels
+
+        \return     numpy array of shape (N_slices, T) of dice scores, nan if
+                    neither ground-truth nor estimated pixels exist
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 2 * true_positives / (
+                ground_truth_counts[:, np.newaxis] + estimate_counts).astype(
+                np.float64)
+
+    def _get_counts_of_all_slices(self, thresholds_unique):
+        """!
+        Count the pixels within the o-contours of all slices which are
+        estimated for each threshold.
+
+        \details    Chunks of slices are evaluated in parallel by n_jobs
+                    threads and their counts are concatenated. The thread
+                    pool of the masking scheme is reused across calls.
+
+        \param      thresholds_unique  numpy array of sorted, distinct
+                                       thresholds
+
+        \return     tuple of counts as returned by \p _get_counts for all
+                    slices
+        """
+        N_slices = self._targets_array.shape[2]
+
+        N_chunks = min(self._n_jobs, N_slices)
+        if N_chunks <= 1:
+            return self._get_counts(thresholds_unique, 0, N_slices)
+
+        boundaries = np.linspace(0, N_slices, N_chunks + 1).astype(int)
+        counts = self._get_pool(N_chunks).map(
+            lambda b: self._get_counts(thresholds_unique, *b),
+            zip(boundaries[:-1], boundaries[1:]))
+
+        return tuple(np.concatenate(c) for c in zip(*counts))
+
+    def _get_counts(self, thresholds_unique, slice_first, slice_end):
+        """!
+        Count the pixels within the o-contours of the given range of slices
+        which are estimated for each threshold.
+
+        \details    The intensities are binned into per-slice histograms
+                    whose bin edges are the thresholds. The counts follow
+                    from cumulative sums over the bins.
+
+        \param      thresholds_unique  numpy array of sorted, distinct
+                                       thresholds
+        \param      slice_first        index of first slice
+        \param      slice_end          index after last slice
+
+        \return     tuple of numpy arrays of shape (N, len(thresholds_unique))
+                    holding the numbers of estimated and correctly estimated
+                    pixels as well as numpy array of shape (N,) holding the
+                    number of ground-truth pixels for the N slices
+        """
+        intensities, slice_indices, ground_truth = \
+            self._get_compact_arrays()[0:3]
+        N_slices = slice_end - slice_first
+        N_bins = len(thresholds_unique) + 1
+
+        # Pixels are ordered by slice
+        first, end = np.searchsorted(slice_indices, [slice_first, slice_end])
+
+        # Bin b holds intensities v which are greater than exactly the b
+        # smallest thresholds, i.e. v > t holds for those thresholds only
+        bins = (slice_indices[first:end] - slice_first) * N_bins + \
+            np.searchsorted(
+                thresholds_unique, intensities[first:end], side="left")
+
+        histograms = [
+            np.bincount(b, minlength=N_slices * N_bins).reshape(N_slices, N_bins)
+            for b in [bins, bins[ground_truth[first:end]]]]
+
+        # Number of (correctly) estimated pixels for each threshold by
+        # summing over all bins of intensities greater than the threshold
+        estimate_counts, true_positives = [
+            h[:, ::-1].cumsum(axis=1)[:, -2::-1] for h in histograms]
+
+        return estimate_counts, true_positives, histograms[1].sum(axis=1)
+
+    def _get_compact_arrays(self):
+        """!
+        Gets the pixel information required to evaluate thresholds.
+
+        \details    The information is computed only once after images and
+                    targets array have been set. Thus, the arrays must not be
+                    modified in place afterwards.
+
+        \return     tuple of intensities within the o-contours, their slice
+                    indices and ground-truth flags, all ordered by slice, as
+                    well as the numbers of pixels and ground-truth pixels
+                    outside the o-contours for each slice
+        """
+        if self._compact_arrays is not None:
+            return self._compact_arrays
+
+        mask_ocontours = self._targets_array > 0
+        height, width, N_slices = self._targets_array.shape
+        N_pixels = height * width
+
+        # Order pixels by slice to allow processing chunks of slices
+        slice_indices, rows, columns = np.nonzero(
+            mask_ocontours.transpose(2, 0, 1))
+        self._indices_ocontours = \
+            (rows * width + columns) * N_slices + slice_indices
+        intensities = self._images_array[
+            rows, columns, slice_indices].astype(np.float64)
+        ground_truth = self._targets_array[rows, columns, slice_indices] == \
+            self._label_ground_truth_target
+
+        outside_counts = N_pixels - np.bincount(
+            slice_indices, minlength=N_slices)
+        outside_ground_truth_counts = \
+            (self._targets_array == self._label_ground_truth_target).sum(
+                axis=(0, 1)) - \
+            np.bincount(slice_indices[ground_truth], minlength=N_slices)
+
+        self._compact_arrays = (intensities, slice_indices, ground_truth,
+                                outside_counts, outside_ground_truth_counts)
+
+        return self._compact_arrays
+
+    def _get_distance_maps(self, targets_array_ground_truth, spacing):
+        """!
+        Gets the distance maps of the ground-truth of all slices.
+
+        \details    The distance maps are cached per ground-truth slice
+                    identified by its content and the pixel spacing. Hence,
+                    they are computed only once for slices occurring in
+                    several targets arrays, e.g. in the testing data of
+                    repeated random splits.
 
-        targets_array_ground_truth = np.zeros_like(self._targets_array)
-        targets_array_ground_truth[
-            np.where(self._targets_array == self._label_ground_truth_target)] = True
+        \param      targets_array_ground_truth  boolean ground-truth array
+                                                with slices on axis 2
+        \param      spacing                     optional pixel spacing as
+                                                pair (rows, columns)
 
-        return targets_array_ground_truth
+        \return     numpy array of shape (N_slices, H, W) as returned by
+                    metrics.get_distance_maps
+        """
+        masks = np.rollaxis(targets_array_ground_truth, 2)
+        spacing_key = None if spacing is None else tuple(spacing)
+        keys = [(mask.shape, spacing_key,
+                 hashlib.sha1(np.packbits(mask).tobytes()).hexdigest())
+                for mask in masks]
+
+        distance_maps = np.empty(masks.shape)
+        missing = []
+        for i, key in enumerate(keys):
+            distance_map = self._distance_maps.get(key)
+            if distance_map is None:
+                missing.append(i)
+            else:
+                distance_maps[i] = distance_map
+
+        if len(missing) > 0:
+            distance_maps[missing] = metrics.get_distance_maps(
+                masks[missing], slice_axis=0, spacing=spacing)
+            for i in missing:
+                self._distance_maps.put(keys[i], distance_maps[i].copy())
+
+        return distance_maps
+
+    def _get_pool(self, N_threads):
+        """!
+        Gets the thread pool of the masking scheme. It is only created anew
+        if it has fewer threads than required.
+
+        \param      N_threads  number of threads
+
+        \return     ThreadPool object
+        """
+        if self._N_threads_pool < N_threads:
+            self.close()
+            self._pool = ThreadPool(N_threads)
+            self._N_threads_pool = N_threads
+        return self._pool
 
     def _check_input(self):
         """!
@@ -163,3 +635,4 @@ class ThresholdMaskingScheme(MaskingScheme):
 
         if type(self._thresholds_list) is not list:
             raise Exceptions.ObjectIsNotList()
+
@@ -10,6 +10,9 @@ class TrainingSample(object):
     """!
     Training sample contains exactly one pair of 2D image and target.
     """
+
+    # No dictionary per object since views are created per access
+    __slots__ = ("_image", "_target")
     
     def __init__(self, image, target):
         """!
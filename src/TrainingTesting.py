@@ -6,7 +6,10 @@
 \date       June 2017
 """
 
+import numpy as np
+
 import src.utilities as utils
+import src.metrics as metrics
 import src.Exceptions as Exceptions
 
 
@@ -15,41 +18,82 @@ class TrainingTesting(object):
     Class used to train masking scheme and also to report its performance
     """
 
-    def __init__(self, masking_scheme, database, fraction_training=0.7):
+    def __init__(self, masking_scheme, database, fraction_training=0.7,
+                 batch_size_streaming=None, n_jobs=None):
         """!
         Store training scheme, database and other information required to
         perform training and to assess the performance of the learned parameter
 
         \param      masking_scheme     masking scheme of type MaskingScheme
-        \param      database           database as DataBase object
+        \param      database           database as DataBase object with
+                                       layout "HWN"
         \param      fraction_training  fraction of training, remainder for
                                        testing
+        \param      batch_size_streaming  optional batch size. If given,
+                                          training and testing data are not
+                                          held in memory but streamed from
+                                          the database in batches of this
+                                          size.
+        \param      n_jobs             optional number of jobs used by the
+                                       masking scheme to evaluate parameters
+                                       and number of threads to read batches
+                                       in streaming mode. If None, the
+                                       number of jobs of the masking scheme
+                                       is kept and batches are read by one
+                                       thread.
         """
 
+        # Masking schemes and metrics expect the slices on the last axis
+        if database.get_layout() != "HWN":
+            raise ValueError("Layout '%s' not supported. Use 'HWN'"
+                             % (database.get_layout()))
+
         self._masking_scheme = masking_scheme
         self._database = database
         self._fraction_training = fraction_training
+        self._batch_size_streaming = batch_size_streaming
+        self._n_jobs = n_jobs
+
+        if n_jobs is not None:
+            self._masking_scheme.set_n_jobs(n_jobs)
 
         self._training_images_array, self._training_targets_array = None, None
         self._testing_images_array, self._testing_targets_array = None, None
 
+        self._training_indices, self._testing_indices = None, None
+
     def randomly_split_into_training_and_testing_data(self):
         """!
         Randomly split data in database into training and testing data in
         proportions specified by fraction_training.
+
+        \details    The batch size of the database is restored afterwards.
         
         \post       run_training/run_testing can be executed
         """
 
         N_samples = self._database.get_number_of_all_training_samples()
 
-        batch_size = int(N_samples * self._fraction_training)
-        self._database.set_batch_size(batch_size)
+        batch_size_database = self._database.get_batch_size()
+        self._database.set_batch_size(int(N_samples * self._fraction_training))
+
+        try:
+            # Only keep the indices of the samples for streaming
+            if self._batch_size_streaming is not None:
+                self._training_indices, self._testing_indices = \
+                    self._database.get_random_indices_and_indices_complement()
+                return
 
-        [training_data_arrays,
-            test_data_arrays] = self._database.get_random_batch_and_batch_complement()
+            [training_data_arrays,
+                test_data_arrays] = self._database.get_random_batch_and_batch_complement()
+        finally:
+            self._database.set_batch_size(batch_size_database)
 
         self._training_images_array, self._training_targets_array = training_data_arrays
+
+        # Keep empty testing arrays if all samples are used for training
+        if test_data_arrays[0] is None:
+            test_data_arrays = [a[:, :, 0:0] for a in training_data_arrays]
         self._testing_images_array, self._testing_targets_array = test_data_arrays
 
         # utils.print_info("Number of total samples: %d" %(N_samples))
@@ -61,9 +105,24 @@ class TrainingTesting(object):
         Perform training to obtain estimated optimal parameter for masking
         scheme
 
+        \details    In streaming mode, the dice scores of all candidate
+                    parameters are accumulated batch by batch and the
+                    optimal parameter is chosen from their means.
+
         \return     tuple (estimated_parameter, mean_dice_score) after training
         """
 
+        if self._batch_size_streaming is not None:
+            if self._training_indices is None:
+                raise Exceptions.ObjectNotCreated("randomly_split_into_training_and_testing_data")
+
+            parameters = self._masking_scheme.get_candidate_parameters()
+            dice_scores_mean = self._get_streamed_dice_scores_mean(
+                self._training_indices, parameters)
+            index = np.argmax(dice_scores_mean)
+
+            return (parameters[index], dice_scores_mean[index])
+
         if self._training_images_array is None:
             raise Exceptions.ObjectNotCreated("randomly_split_into_training_and_testing_data")
 
@@ -89,6 +148,15 @@ class TrainingTesting(object):
         \return     tuple (parameter, mean_dice_score) after testing
         """
 
+        if self._batch_size_streaming is not None:
+            if self._testing_indices is None:
+                raise Exceptions.ObjectNotCreated("randomly_split_into_training_and_testing_data")
+
+            dice_scores_mean = self._get_streamed_dice_scores_mean(
+                self._testing_indices, [parameter])
+
+            return (parameter, dice_scores_mean[0])
+
         if self._testing_images_array is None:
             raise Exceptions.ObjectNotCreated("randomly_split_into_training_and_testing_data")
 
@@ -100,3 +168,219 @@ class TrainingTesting(object):
         dice_scores_mean = self._masking_scheme.get_mean_dice_score(parameter)
 
         return (parameter, dice_scores_mean)
+
+    def run_testing_metrics(self, parameter, surface_distances=False,
+                            spacing=None):
+        """!
+        Compute overlap and volume metrics of all testing slices with given
+        parameter
+
+        \details    Surface distances require a masking scheme providing
+                    get_surface_distances, e.g. ThresholdMaskingScheme. It
+                    caches the distance maps of the ground-truth slices,
+                    i.e. they are reused for repeated random splits.
+
+        \param      parameter          Parameter for masking scheme
+        \param      surface_distances  boolean to add the surface distances
+                                       "hd95" and "assd" of each testing
+                                       slice
+        \param      spacing            optional pixel spacing as pair (rows,
+                                       columns) for the surface distances
+
+        \return     dictionary of numpy arrays of shape (N_testing_slices,)
+                    holding Dice score, Jaccard index, sensitivity and volume
+                    error of each testing slice. Arrays are empty if there
+                    are no testing slices.
+        """
+        if self._batch_size_streaming is not None:
+            if self._testing_indices is None:
+                raise Exceptions.ObjectNotCreated("randomly_split_into_training_and_testing_data")
+
+            metrics_list = []
+            for images_array, targets_array in self._iter_batches(
+                    self._testing_indices):
+                self._masking_scheme.set_images_array(images_array)
+                self._masking_scheme.set_targets_array(targets_array)
+                metrics_list.append(self._get_metrics(
+                    parameter, surface_distances, spacing))
+
+            if len(metrics_list) == 0:
+                empty_array = np.zeros((1, 1, 0), dtype=bool)
+                metrics_empty = metrics.get_metrics(
+                    empty_array, empty_array, slice_axis=2)
+                if surface_distances:
+                    metrics_empty.update(metrics.get_surface_distances(
+                        empty_array, empty_array, slice_axis=2))
+                return metrics_empty
+
+            return {key: np.concatenate([m[key] for m in metrics_list])
+                    for key in metrics_list[0].keys()}
+
+        if self._testing_images_array is None:
+            raise Exceptions.ObjectNotCreated("randomly_split_into_training_and_testing_data")
+
+        self._masking_scheme.set_images_array(self._testing_images_array)
+        self._masking_scheme.set_targets_array(self._testing_targets_array)
+
+        return self._get_metrics(parameter, surface_distances, spacing)
+
+    def run_repeated_splits(self, N_repetitions, bootstrap=False):
+        """!
+        Repeatedly split the data into training and testing data, estimate
+        the optimal parameter on the training data and test it on the
+        testing data.
+
+        \details    The dice scores of all slices for all candidate
+                    parameters are computed only once. Each repetition then
+                    only averages the dice scores of the selected slices,
+                    i.e. no data is read or copied again. Random splits
+                    follow \p randomly_split_into_training_and_testing_data.
+                    For bootstrapping, as many training samples as available
+                    are drawn with replacement and the samples not drawn are
+                    used for testing. If no sample is left for testing, the
+                    mean dice score after testing is nan. The batch size of
+                    the database is restored afterwards.
+
+        \param      N_repetitions  number of repetitions
+        \param      bootstrap      boolean to draw bootstrap samples for
+                                   training instead of random splits
+
+        \return     tuple (estimated_parameters, dice_scores_mean) holding
+                    the list of estimated parameters and a numpy array of
+                    shape (N_repetitions, 2) with the mean dice scores after
+                    training and after testing of each repetition
+        """
+        N_samples = self._database.get_number_of_all_training_samples()
+
+        parameters = self._masking_scheme.get_candidate_parameters()
+        dice_matrix = self._get_dice_matrix(parameters)
+
+        batch_size_database = self._database.get_batch_size()
+        self._database.set_batch_size(int(N_samples * self._fraction_training))
+
+        estimated_parameters = []
+        dice_scores_mean = np.zeros((N_repetitions, 2))
+        try:
+            for i in range(0, N_repetitions):
+                if bootstrap:
+                    training_indices = np.random.choice(
+                        N_samples, N_samples, replace=True)
+                    testing_indices = np.setdiff1d(
+                        np.arange(0, N_samples), training_indices)
+                else:
+                    training_indices, testing_indices = \
+                        self._database.get_random_indices_and_indices_complement()
+
+                dice_scores_training = \
+                    dice_matrix[:, training_indices].mean(axis=1)
+                index = np.argmax(dice_scores_training)
+
+                estimated_parameters.append(parameters[index])
+                dice_scores_mean[i, 0] = dice_scores_training[index]
+                if len(testing_indices) > 0:
+                    dice_scores_mean[i, 1] = \
+                        dice_matrix[index, testing_indices].mean()
+                else:
+                    dice_scores_mean[i, 1] = np.nan
+        finally:
+            self._database.set_batch_size(batch_size_database)
+
+        return estimated_parameters, dice_scores_mean
+
+    def _get_metrics(self, parameter, surface_distances, spacing):
+        """!
+        Compute the metrics of the images and targets arrays of the masking
+        scheme.
+
+        \param      parameter          Parameter for masking scheme
+        \param      surface_distances  boolean to add the surface distances
+        \param      spacing            optional pixel spacing
+
+        \return     dictionary of numpy arrays of shape (N_slices,)
+        """
+        metrics_dict = self._masking_scheme.get_metrics(parameter)
+        if surface_distances:
+            metrics_dict.update(self._masking_scheme.get_surface_distances(
+                parameter, spacing=spacing))
+
+        return metrics_dict
+
+    def _get_dice_matrix(self, parameters):
+        """!
+        Compute the dice scores of all samples in the database for all given
+        parameters.
+
+        \details    In streaming mode, the samples are read batch by batch.
+
+        \param      parameters  list of parameters for masking scheme
+
+        \return     numpy array of shape (len(parameters), N_samples)
+        """
+        dice_matrices = []
+        for images_array, targets_array in self._iter_batches():
+            self._masking_scheme.set_images_array(images_array)
+            self._masking_scheme.set_targets_array(targets_array)
+            dice_matrices.append(
+                self._masking_scheme.get_dice_matrix(parameters))
+
+        return np.concatenate(dice_matrices, axis=1)
+
+    def _get_streamed_dice_scores_mean(self, indices, parameters):
+        """!
+        Compute the mean dice scores for all given parameters by streaming
+        the selected samples batch by batch from the database.
+
+        \details    Only the sums of the dice scores over the slices are kept
+                    across batches, i.e. at most a few batches are held in
+                    memory at once.
+
+        \param      indices     list of indices of samples in database
+        \param      parameters  list of parameters for masking scheme
+
+        \return     numpy array of mean dice scores for each parameter
+        """
+        dice_scores_sum = np.zeros(len(parameters))
+        N_slices = 0
+
+        for images_array, targets_array in self._iter_batches(indices):
+            self._masking_scheme.set_images_array(images_array)
+            self._masking_scheme.set_targets_array(targets_array)
+
+            dice_matrix = self._masking_scheme.get_dice_matrix(parameters)
+            dice_scores_sum += dice_matrix.sum(axis=1)
+            N_slices += dice_matrix.shape[1]
+
+        return dice_scores_sum / N_slices
+
+    def _iter_batches(self, indices=None):
+        """!
+        Iterate over the selected samples of the database batch by batch.
+
+        \details    Batches are of the streaming batch size and written into
+                    reused arrays or comprise all samples in one newly
+                    allocated batch if not streaming. The batch size of the
+                    database is restored afterwards.
+
+        \param      indices  optional list of indices of samples in database
+
+        \return     generator of pairs images_numpy_array,
+                    targets_numpy_array
+        """
+        # Arrays are only reused for streaming. Otherwise, the single batch
+        # is read into newly allocated arrays.
+        if self._batch_size_streaming is not None:
+            batch_size = self._batch_size_streaming
+            kwargs = {"reuse_arrays": True}
+        else:
+            batch_size = self._database.get_number_of_all_training_samples()
+            kwargs = {}
+
+        batch_size_database = self._database.get_batch_size()
+        self._database.set_batch_size(batch_size)
+        try:
+            for arrays in self._database.iter_batches(
+                    workers=1 if self._n_jobs is None else self._n_jobs,
+                    indices=indices, **kwargs):
+                yield arrays
+        finally:
+            self._database.set_batch_size(batch_size_database)
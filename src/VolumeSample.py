@@ -0,0 +1,93 @@
+"""
+\file VolumeSample.py
+\brief      Sample whose images and targets are read from a memory-mapped
+            volume store written by Sample.export_volume.
+
+\details    The volume store of a sample consists of one npy-file holding all
+            images and one npy-file holding all targets, each of shape
+            (N_slices, height, width), and a small JSON sidecar index linking
+            the slice ids with their positions within the npy-files.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import os
+import json
+
+import src.VolumeSlice as VolumeSlice
+import src.Exceptions as Exceptions
+import src.utilities as utils
+from src.Sample import Sample
+
+
+class VolumeSample(Sample):
+    """!
+    Sample whose images and targets are zero-copy views on memory-mapped
+    volumes.
+    """
+
+    def __init__(self, filename_index):
+        """!
+        Store path to sidecar index of volume store
+
+        \param      filename_index  path to JSON sidecar index written by
+                                    Sample.export_volume
+        """
+        Sample.__init__(self, directory_dicoms=None,
+                        directory_contours_list=[])
+
+        self._filename_index = filename_index
+
+    def create_sample(self):
+        """!
+        Create a sample containing all images and targets stored in the
+        volume store.
+
+        \post       list of images and targets is created
+        """
+
+        # Check whether given input files exist
+        self._check_input_files()
+
+        with open(self._filename_index, "r") as f:
+            index = json.load(f)
+
+        directory = os.path.dirname(os.path.abspath(self._filename_index))
+        shape = tuple(index["shape"])
+        slice_ids = index["slice_ids"]
+
+        # (Re)open the volumes once, i.e. not on every access of slice data
+        if len(slice_ids) > 0:
+            for key in ["images", "targets"]:
+                VolumeSlice.open_volume(
+                    os.path.join(directory, index[key]["filename"]))
+
+        self._images, self._targets = [
+            [VolumeSlice.VolumeSlice(
+                slice_id=slice_ids[i],
+                filename=os.path.join(directory, index[key]["filename"]),
+                index=i,
+                shape=shape,
+                data_type=index[key]["data_type"])
+             for i in range(0, len(slice_ids))]
+            for key in ["images", "targets"]]
+
+    def get_manifest(self):
+        """!
+        Gets the resolved files and array information of all slices.
+
+        \details    A volume store does not keep the DICOM and contour
+                    filenames the volumes were exported from. Hence, no
+                    manifest can be provided.
+
+        \return     None
+        """
+        return None
+
+    def _check_input_files(self):
+        """!
+        Check whether the sidecar index exists and raise an error if not
+        """
+        if not utils.file_exists(self._filename_index):
+            raise Exceptions.FileNotExistent(self._filename_index)
@@ -0,0 +1,106 @@
+"""
+\file VolumeSlice.py
+\brief      Class to define a 2D image, i.e. a slice, stored within a
+            memory-mapped volume of consecutive slices.
+
+\details    All slices of a volume share one memory map per process. Hence,
+            the data array of a slice is a zero-copy view on the volume and
+            several processes reading the same volume share the same physical
+            pages.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import os
+import numpy as np
+
+from src.Slice import Slice
+
+# Memory-mapped volumes opened by the current process
+_volumes = {}
+
+
+class VolumeSlice(Slice):
+    """!
+    Class to define a slice stored within a memory-mapped volume
+    """
+
+    __slots__ = ("_index", "_shape", "_data_type")
+
+    def __init__(self, slice_id, filename, index, shape, data_type):
+        """!
+        Store the slice_id, volume filename and position within the volume
+
+        \param      slice_id   integer value referring to the image number
+        \param      filename   absolute path to npy-file of volume
+        \param      index      position of slice within the volume
+        \param      shape      shape of the slice data array
+        \param      data_type  numpy data type of the slice data array
+        """
+        Slice.__init__(self, slice_id=slice_id, filename=filename)
+
+        self._index = index
+        self._shape = shape
+        self._data_type = np.dtype(data_type)
+
+    def get_data(self):
+        """!
+        Gets the slice data.
+
+        \details    No data is read from file, i.e. the returned data array is
+                    a read-only view on the memory-mapped volume.
+
+        \return     numpy array of slice data.
+        """
+        return np.asarray(_get_volume(self._filename)[self._index])
+
+    def get_shape(self):
+        """!
+        Gets the shape of the slice data array.
+
+        \return     tuple describing the shape of the slice data array.
+        """
+        return self._shape
+
+    def get_data_type(self):
+        """!
+        Gets the data type of the slice data array.
+
+        \return     numpy data type of the slice data array.
+        """
+        return self._data_type
+
+
+def open_volume(filename):
+    """!
+    Opens the memory-mapped volume unless it is open already.
+
+    \details    The volume is reopened if size or modification time of the
+                npy-file changed, e.g. since the volume store was exported
+                again. This is checked only here, i.e. when a volume store is
+                read, and not on every access of slice data.
+
+    \param      filename  absolute path to npy-file of volume
+
+    \return     read-only memory-mapped numpy array
+    """
+    stat = os.stat(filename)
+    version = (stat.st_size, stat.st_mtime)
+
+    if filename not in _volumes or _volumes[filename][0] != version:
+        _volumes[filename] = (version, np.load(filename, mmap_mode="r"))
+    return _volumes[filename][1]
+
+
+def _get_volume(filename):
+    """!
+    Gets the memory-mapped volume. It is opened only once per process.
+
+    \param      filename  absolute path to npy-file of volume
+
+    \return     read-only memory-mapped numpy array
+    """
+    if filename not in _volumes:
+        return open_volume(filename)
+    return _volumes[filename][1]
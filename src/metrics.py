@@ -0,0 +1,665 @@
+"""
+\file metrics.py
+\brief      Collection of functions to evaluate segmentations of stacked
+            slices
+
+\details    All overlap metrics are computed from integer pixel counts which
+            are obtained in one pass over the stacked prediction and target
+            arrays. Either binary masks, i.e. all non-zero pixels are
+            foreground, or label maps can be evaluated. Boundary metrics are
+            computed from Euclidean distance transforms of the slices.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import numpy as np
+from scipy import ndimage
+
+import src.parsing as parsing
+import src.packing as packing
+import src.RunLengthMask as RunLengthMask
+import src.Exceptions as Exceptions
+
+
+def get_overlap_counts(predictions, targets, labels=None, slice_axis=0):
+    """!
+    Count predicted, target and overlapping pixels for each slice.
+
+    \details    For label maps, the counts of all labels are obtained from
+                one joint histogram of predicted and target labels per
+                slice.
+
+    \param      predictions  stacked predictions as numpy array, e.g. of
+                             shape (N, H, W)
+    \param      targets      stacked targets as numpy array of same shape
+    \param      labels       optional list of non-negative integer labels to
+                             evaluate predictions and targets as label maps.
+                             If None, non-zero pixels are foreground.
+    \param      slice_axis   axis along which the slices are stacked
+
+    \return     tuple of numpy arrays of overlapping, predicted and target
+                pixel counts of shape (N,), or (N, len(labels)) for label
+                maps
+    """
+    if predictions.shape != targets.shape:
+        raise Exceptions.ShapeMismatch()
+
+    predictions = np.moveaxis(predictions, slice_axis, 0)
+    targets = np.moveaxis(targets, slice_axis, 0)
+
+    # Explicit number of pixels to support empty stacks
+    shape = (predictions.shape[0], int(np.prod(predictions.shape[1:])))
+    N_slices = shape[0]
+
+    if labels is None:
+        predictions = predictions != 0
+        targets = targets != 0
+        true_positives = np.count_nonzero(
+            np.logical_and(predictions, targets).reshape(shape), axis=1)
+        predicted_counts = np.count_nonzero(
+            predictions.reshape(shape), axis=1)
+        target_counts = np.count_nonzero(targets.reshape(shape), axis=1)
+
+        return true_positives, predicted_counts, target_counts
+
+    # Joint histogram of predicted and target labels of each slice
+    N_labels = int(max([max(labels)] + [
+        a.max() for a in [predictions, targets] if a.size > 0])) + 1
+    codes = (predictions.astype(np.int64) * N_labels + targets).reshape(
+        shape)
+    codes += np.arange(0, N_slices)[:, np.newaxis] * N_labels ** 2
+    histograms = np.bincount(
+        codes.ravel(), minlength=N_slices * N_labels ** 2).reshape(
+        N_slices, N_labels, N_labels)
+
+    labels = np.asarray(labels)
+    true_positives = histograms[:, labels, labels]
+    predicted_counts = histograms.sum(axis=2)[:, labels]
+    target_counts = histograms.sum(axis=1)[:, labels]
+
+    return true_positives, predicted_counts, target_counts
+
+
+def get_metrics(predictions, targets, labels=None, slice_axis=0):
+    """!
+    Compute overlap and volume metrics for each slice.
+
+    \details    Dice = 2 |P & T| / (|P| + |T|), Jaccard = |P & T| / |P | T|,
+                sensitivity = |P & T| / |T| and volume error =
+                (|P| - |T|) / |T| for predicted pixels P and target pixels T.
+                Metrics which are undefined due to empty sets are nan.
+
+    \param      predictions  stacked predictions as numpy array, e.g. of
+                             shape (N, H, W)
+    \param      targets      stacked targets as numpy array of same shape
+    \param      labels       optional list of non-negative integer labels to
+                             evaluate predictions and targets as label maps.
+                             If None, non-zero pixels are foreground.
+    \param      slice_axis   axis along which the slices are stacked
+
+    \return     dictionary of numpy arrays of shape (N,), or (N, len(labels))
+                for label maps, with keys "dice", "jaccard", "sensitivity"
+                and "volume_error"
+    """
+    true_positives, predicted_counts, target_counts = get_overlap_counts(
+        predictions, targets, labels=labels, slice_axis=slice_axis)
+
+    true_positives = true_positives.astype(np.float64)
+    sums = predicted_counts + target_counts
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "dice": 2 * true_positives / sums,
+            "jaccard": true_positives / (sums - true_positives),
+            "sensitivity": true_positives / target_counts,
+            "volume_error":
+                (predicted_counts - target_counts) /
+                target_counts.astype(np.float64),
+        }
+
+
+def get_dice_scores(predictions, targets, labels=None, slice_axis=0):
+    """!
+    Compute Dice scores for each slice.
+
+    \param      predictions  stacked predictions as numpy array, e.g. of
+                             shape (N, H, W)
+    \param      targets      stacked targets as numpy array of same shape
+    \param      labels       optional list of non-negative integer labels to
+                             evaluate predictions and targets as label maps.
+                             If None, non-zero pixels are foreground.
+    \param      slice_axis   axis along which the slices are stacked
+
+    \return     numpy array of Dice scores of shape (N,), or (N, len(labels))
+                for label maps
+    """
+    true_positives, predicted_counts, target_counts = get_overlap_counts(
+        predictions, targets, labels=labels, slice_axis=slice_axis)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 2 * true_positives / (
+            predicted_counts + target_counts).astype(np.float64)
+
+
+def get_packed_overlap_counts(packed_predictions, packed_targets):
+    """!
+    Count predicted, target and overlapping pixels of bit-packed masks.
+
+    \details    The pixels are counted directly on the packed bytes, i.e.
+                the masks are not unpacked.
+
+    \param      packed_predictions  stacked predictions as returned by
+                                    packing.pack_masks, e.g. of shape (N, B)
+    \param      packed_targets      stacked targets of same shape
+
+    \return     tuple of numpy arrays of overlapping, predicted and target
+                pixel counts of shape (N,)
+    """
+    if packed_predictions.shape != packed_targets.shape:
+        raise Exceptions.ShapeMismatch()
+
+    return packing.popcount(packed_predictions & packed_targets), \
+        packing.popcount(packed_predictions), \
+        packing.popcount(packed_targets)
+
+
+def get_packed_dice_scores(packed_predictions, packed_targets):
+    """!
+    Compute Dice scores of bit-packed masks.
+
+    \param      packed_predictions  stacked predictions as returned by
+                                    packing.pack_masks, e.g. of shape (N, B)
+    \param      packed_targets      stacked targets of same shape
+
+    \return     numpy array of Dice scores of shape (N,)
+    """
+    true_positives, predicted_counts, target_counts = \
+        get_packed_overlap_counts(packed_predictions, packed_targets)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 2 * true_positives / (
+            predicted_counts + target_counts).astype(np.float64)
+
+
+def get_polygon_overlap_areas(predictions, targets):
+    """!
+    Compute the areas of predicted and target polygons and of their
+    intersection for each slice.
+
+    \details    By Green's theorem, the area of a region equals the line
+                integral of x dy along its counter-clockwise boundary. The
+                boundary of the intersection consists of the parts of each
+                polygon boundary within the other polygon. Hence, all edges
+                are split at their intersections with the edges of the other
+                polygon of the slice and the pieces within the other polygon
+                are integrated. Boundary pieces shared by both polygons are
+                counted once if both interiors lie on the same side. All
+                slices are processed at once.
+
+    \param      predictions  list of predicted polygons, one per slice, each
+                             given as list of pairs of x, y coords, e.g. as
+                             returned by parsing.parse_contour_file, or numpy
+                             array of shape (K, 2). Polygons must be simple,
+                             i.e. without self-intersections.
+    \param      targets      list of target polygons of same length
+
+    \return     tuple of numpy arrays of intersection, predicted and target
+                areas of shape (N,)
+    """
+    if len(predictions) != len(targets):
+        raise Exceptions.ShapeMismatch()
+
+    N_slices = len(predictions)
+    edges_predictions = _get_polygons_edges(predictions)
+    edges_targets = _get_polygons_edges(targets)
+
+    areas_intersection = \
+        _get_boundary_integral_within(
+            edges_predictions, edges_targets, N_slices, True) + \
+        _get_boundary_integral_within(
+            edges_targets, edges_predictions, N_slices, False)
+
+    return areas_intersection, \
+        _get_boundary_integral(edges_predictions, N_slices), \
+        _get_boundary_integral(edges_targets, N_slices)
+
+
+def get_polygon_dice_scores(predictions, targets, shape=None):
+    """!
+    Compute Dice scores of predicted and target polygons for each slice.
+
+    \param      predictions  list of predicted polygons, one per slice, each
+                             given as list of pairs of x, y coords or numpy
+                             array of shape (K, 2)
+    \param      targets      list of target polygons of same length
+    \param      shape        optional shape (height, width) of the pixel
+                             grid. If given, the pixels covered by the
+                             polygons as rasterized by parsing.poly_to_mask
+                             are compared, i.e. the Dice scores equal the ones
+                             of the rasterized masks. Otherwise, the exact
+                             overlap areas of the polygons are compared.
+
+    \return     numpy array of Dice scores of shape (N,), nan if both
+                polygons of a slice are empty
+    """
+    if shape is None:
+        areas_intersection, areas_predictions, areas_targets = \
+            get_polygon_overlap_areas(predictions, targets)
+
+    else:
+        if len(predictions) != len(targets):
+            raise Exceptions.ShapeMismatch()
+
+        # Runs of all slices are stacked into one mask to intersect them at
+        # once. Runs do not cross slices.
+        height, width = shape
+        N_slices = len(predictions)
+        masks = []
+        for polygons in [predictions, targets]:
+            runs = parsing.polygons_to_runs(polygons, width, height)
+            offsets = [i * height * width for i in range(0, N_slices)]
+            masks.append(RunLengthMask.RunLengthMask(
+                np.concatenate([r[0] + o for (r, o) in zip(runs, offsets)]),
+                np.concatenate([r[1] + o for (r, o) in zip(runs, offsets)]),
+                (N_slices, height, width)))
+        masks.append(masks[0].intersection(masks[1]))
+
+        areas_predictions, areas_targets, areas_intersection = [
+            np.bincount(m.get_starts() // (height * width),
+                        weights=m.get_ends() - m.get_starts(),
+                        minlength=N_slices)
+            for m in masks]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 2 * areas_intersection / (
+            areas_predictions + areas_targets).astype(np.float64)
+
+
+def _get_polygons_edges(polygons):
+    """!
+    Gets the edges of the given polygons oriented counter-clockwise.
+
+    \param      polygons  list of polygons, one per slice
+
+    \return     tuple of edge start and end points of shape (E, 2) and slice
+                index of each edge, sorted by slice
+    """
+    polygons = [np.asarray(p, dtype=np.float64).reshape(-1, 2)
+                for p in polygons]
+    lengths = np.array([p.shape[0] for p in polygons], dtype=np.int64)
+
+    if lengths.sum() == 0:
+        points_start = np.zeros((0, 2))
+    else:
+        points_start = np.concatenate(polygons)
+    slice_indices = np.repeat(np.arange(len(polygons)), lengths)
+
+    # Subsequent vertex within the polygon closing the last edge
+    offsets = np.cumsum(lengths) - lengths
+    next_vertices = np.arange(points_start.shape[0]) + 1
+    is_last = next_vertices == np.repeat(offsets + lengths, lengths)
+    next_vertices[is_last] = np.repeat(offsets, lengths)[is_last]
+    points_end = points_start[next_vertices]
+
+    # Reverse clockwise polygons, i.e. ones with negative signed area
+    areas = np.bincount(
+        slice_indices,
+        weights=_get_cross_products(points_start, points_end),
+        minlength=len(polygons))
+    is_reversed = (areas < 0)[slice_indices]
+    points_start[is_reversed], points_end[is_reversed] = \
+        points_end[is_reversed], points_start[is_reversed].copy()
+
+    is_edge = np.any(points_start != points_end, axis=1)
+
+    return points_start[is_edge], points_end[is_edge], \
+        slice_indices[is_edge]
+
+
+def _get_boundary_integral(edges, N_slices):
+    """!
+    Integrate x dy along the given edges for each slice.
+
+    \param      edges     tuple of edge start and end points and slice
+                          indices as returned by \p _get_polygons_edges
+    \param      N_slices  number of slices
+
+    \return     numpy array of shape (N_slices,)
+    """
+    points_start, points_end, slice_indices = edges
+
+    return np.bincount(
+        slice_indices,
+        weights=_get_cross_products(points_start, points_end) / 2.,
+        minlength=N_slices)
+
+
+def _get_boundary_integral_within(edges, edges_other, N_slices,
+                                  include_shared):
+    """!
+    Integrate x dy along the parts of the given edges within the polygon of
+    the other edges of the same slice.
+
+    \param      edges           tuple of edge start and end points and slice
+                                indices as returned by \p _get_polygons_edges
+    \param      edges_other     edges of the other polygons
+    \param      N_slices        number of slices
+    \param      include_shared  boolean to include parts lying on an edge of
+                                the other polygon with same direction
+
+    \return     numpy array of shape (N_slices,)
+    """
+    points_start, points_end, slice_indices = edges
+    points_start_other, points_end_other, slice_indices_other = edges_other
+
+    # Parameters of intersections along the edges
+    i, j = _get_pairs_within_bands(
+        slice_indices, _get_y_ranges(points_start, points_end),
+        slice_indices_other,
+        _get_y_ranges(points_start_other, points_end_other))
+    r = points_end[i] - points_start[i]
+    s = points_end_other[j] - points_start_other[j]
+    q = points_start_other[j] - points_start[i]
+    denominators = _get_cross_products(r, s)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = _get_cross_products(q, s) / denominators
+        u = _get_cross_products(q, r) / denominators
+        is_intersection = (denominators != 0) & (u >= 0) & (u <= 1)
+
+    # Collinear edges overlap between the projected end points
+    is_collinear = (denominators == 0) & (_get_cross_products(q, r) == 0)
+    lengths_squared = np.sum(r ** 2, axis=1)
+    t_collinear = [np.sum(q * r, axis=1) / lengths_squared,
+                   np.sum((q + s) * r, axis=1) / lengths_squared]
+
+    # Split edges into pieces between subsequent parameters
+    edge_indices = np.concatenate([
+        np.arange(slice_indices.size), np.arange(slice_indices.size),
+        i[is_intersection], i[is_collinear], i[is_collinear]])
+    parameters = np.concatenate([
+        np.zeros(slice_indices.size), np.ones(slice_indices.size),
+        t[is_intersection],
+        t_collinear[0][is_collinear], t_collinear[1][is_collinear]])
+    is_inner = (parameters >= 0) & (parameters <= 1)
+    edge_indices, parameters = edge_indices[is_inner], parameters[is_inner]
+    order = np.lexsort((parameters, edge_indices))
+    edge_indices, parameters = edge_indices[order], parameters[order]
+    is_piece = (edge_indices[1:] == edge_indices[:-1]) & \
+        (parameters[1:] > parameters[:-1])
+    edge_indices = edge_indices[:-1][is_piece]
+    directions = points_end[edge_indices] - points_start[edge_indices]
+    pieces_start = points_start[edge_indices] + \
+        parameters[:-1][is_piece, np.newaxis] * directions
+    pieces_end = points_start[edge_indices] + \
+        parameters[1:][is_piece, np.newaxis] * directions
+    pieces_slice_indices = slice_indices[edge_indices]
+
+    # Classify midpoints of pieces by crossing number. Midpoints on the
+    # other boundary are resolved by the direction of the shared edge.
+    midpoints = (pieces_start + pieces_end) / 2.
+    i, j = _get_pairs_within_bands(
+        pieces_slice_indices, (midpoints[:, 1], midpoints[:, 1]),
+        slice_indices_other,
+        _get_y_ranges(points_start_other, points_end_other))
+    p = midpoints[i]
+    a = points_start_other[j]
+    b = points_end_other[j]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        is_crossing = ((a[:, 1] > p[:, 1]) != (b[:, 1] > p[:, 1])) & (
+            p[:, 0] < a[:, 0] + (p[:, 1] - a[:, 1]) *
+            (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1]))
+    is_inside = np.bincount(
+        i[is_crossing], minlength=midpoints.shape[0]) % 2 == 1
+
+    s = b - a
+    q = p - a
+    lengths_squared = np.sum(s ** 2, axis=1)
+    projections = np.clip(np.sum(q * s, axis=1) / lengths_squared, 0, 1)
+    distances_squared = np.sum(
+        (q - projections[:, np.newaxis] * s) ** 2, axis=1)
+    is_on_boundary = distances_squared <= 1e-18 * np.maximum(
+        lengths_squared, 1)
+    is_same_direction = np.sum(directions[i] * s, axis=1) > 0
+    is_on_boundary_pieces = np.bincount(
+        i[is_on_boundary], minlength=midpoints.shape[0]) > 0
+    is_shared_pieces = np.bincount(
+        i[is_on_boundary & is_same_direction],
+        minlength=midpoints.shape[0]) > 0
+
+    is_within = np.where(is_on_boundary_pieces,
+                         is_shared_pieces & include_shared, is_inside)
+
+    return _get_boundary_integral(
+        (pieces_start[is_within], pieces_end[is_within],
+         pieces_slice_indices[is_within]), N_slices)
+
+
+def _get_pairs_within_bands(slice_indices, y_ranges, slice_indices_other,
+                            y_ranges_other):
+    """!
+    Gets all pairs of elements of the same slice whose vertical extents
+    share a band of unit height.
+
+    \details    Contour edges are short. Hence, pairing only the elements of
+                the same bands avoids pairing all elements of a slice.
+
+    \param      slice_indices        slice index of each element
+    \param      y_ranges             pair of numpy arrays of minimum and
+                                     maximum y-coordinate of each element
+    \param      slice_indices_other  slice index of each other element
+    \param      y_ranges_other       pair of numpy arrays of minimum and
+                                     maximum y-coordinate of each other
+                                     element
+
+    \return     tuple of indices of elements and other elements, sorted and
+                without duplicates
+    """
+    if slice_indices.size == 0 or slice_indices_other.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    y_origin = np.floor(min(y_ranges[0].min(), y_ranges_other[0].min()))
+    N_bands = int(np.floor(max(y_ranges[1].max(), y_ranges_other[1].max())) -
+                  y_origin) + 1
+
+    # Expand elements to all bands they intersect
+    elements, keys = [], []
+    for (s, (y_min, y_max)) in [(slice_indices, y_ranges),
+                                (slice_indices_other, y_ranges_other)]:
+        bands_first = (np.floor(y_min) - y_origin).astype(np.int64)
+        counts = (np.floor(y_max) - y_origin).astype(np.int64) - \
+            bands_first + 1
+        offsets = np.cumsum(counts) - counts
+        e = np.repeat(np.arange(s.size), counts)
+        elements.append(e)
+        keys.append(s[e] * N_bands + np.arange(counts.sum()) -
+                    np.repeat(offsets - bands_first, counts))
+
+    # Pair elements with all other elements of the same key
+    order = np.argsort(keys[1], kind="mergesort")
+    keys_other = keys[1][order]
+    firsts = np.searchsorted(keys_other, keys[0], side="left")
+    counts = np.searchsorted(keys_other, keys[0], side="right") - firsts
+    offsets = np.cumsum(counts) - counts
+    indices = np.repeat(elements[0], counts)
+    indices_other = elements[1][order][
+        np.arange(counts.sum()) + np.repeat(firsts - offsets, counts)]
+
+    # Elements spanning several bands can be paired repeatedly
+    codes = np.unique(indices * slice_indices_other.size + indices_other)
+
+    return codes // slice_indices_other.size, \
+        codes % slice_indices_other.size
+
+
+def _get_y_ranges(points_start, points_end):
+    """!
+    Gets the vertical extents of edges.
+
+    \param      points_start  numpy array of edge start points of shape (E, 2)
+    \param      points_end    numpy array of edge end points of shape (E, 2)
+
+    \return     tuple of numpy arrays of minimum and maximum y-coordinates
+    """
+    return np.minimum(points_start[:, 1], points_end[:, 1]), \
+        np.maximum(points_start[:, 1], points_end[:, 1])
+
+
+def _get_cross_products(u, v):
+    """!
+    Compute the z-components of the cross products of 2D vectors.
+
+    \param      u     numpy array of shape (M, 2)
+    \param      v     numpy array of shape (M, 2)
+
+    \return     numpy array of shape (M,)
+    """
+    return u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+
+
+def get_boundaries(masks, slice_axis=0):
+    """!
+    Get the boundary pixels of each slice of stacked binary masks.
+
+    \details    Boundary pixels are foreground pixels with at least one
+                background pixel among their 4-neighbours within the slice.
+                Pixels at the image border are considered boundary pixels.
+
+    \param      masks       stacked binary masks as numpy array, e.g. of
+                            shape (N, H, W)
+    \param      slice_axis  axis along which the slices are stacked
+
+    \return     numpy boolean array of shape (N, H, W)
+    """
+    masks = np.moveaxis(masks != 0, slice_axis, 0)
+
+    # 4-neighbourhood within each slice
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = ndimage.generate_binary_structure(2, 1)
+
+    return masks & ~ndimage.binary_erosion(
+        masks, structure=structure, border_value=0)
+
+
+def get_distance_maps(masks, slice_axis=0, spacing=None):
+    """!
+    Get the Euclidean distance of each pixel to the nearest boundary pixel
+    of its slice.
+
+    \details    The distance maps of target masks do not change between
+                predictions. Hence, they can be computed once and passed to
+                \p get_surface_distances.
+
+    \param      masks       stacked binary masks as numpy array, e.g. of
+                            shape (N, H, W)
+    \param      slice_axis  axis along which the slices are stacked
+    \param      spacing     optional pixel spacing as pair (rows, columns).
+                            If None, distances are given in pixels.
+
+    \return     numpy array of shape (N, H, W). Slices without boundary
+                pixels have infinite distances.
+    """
+    boundaries = get_boundaries(masks, slice_axis=slice_axis)
+
+    distance_maps = np.empty(boundaries.shape)
+    for i in range(0, boundaries.shape[0]):
+        if boundaries[i].any():
+            distance_maps[i] = ndimage.distance_transform_edt(
+                ~boundaries[i], sampling=spacing)
+        else:
+            distance_maps[i] = np.inf
+
+    return distance_maps
+
+
+def get_surface_distances(predictions, targets, slice_axis=0, spacing=None,
+                          target_distance_maps=None, percentile=95):
+    """!
+    Compute the Hausdorff distance percentile and the average symmetric
+    surface distance for each slice.
+
+    \details    The distances of all boundary pixels of the prediction to the
+                boundary of the target and vice versa are looked up in the
+                distance maps of the slices. Their percentile (HD95 by
+                default) and mean (ASSD) are computed for all slices at once.
+                Slices where prediction or target is empty yield nan.
+
+    \param      predictions           stacked binary predictions as numpy
+                                      array, e.g. of shape (N, H, W)
+    \param      targets               stacked binary targets as numpy array
+                                      of same shape
+    \param      slice_axis            axis along which the slices are
+                                      stacked
+    \param      spacing               optional pixel spacing as pair (rows,
+                                      columns). If None, distances are given
+                                      in pixels.
+    \param      target_distance_maps  optional distance maps of the targets
+                                      as returned by \p get_distance_maps
+    \param      percentile            percentile of the distances reported
+                                      as Hausdorff distance
+
+    \return     dictionary of numpy arrays of shape (N,) with keys "hd%d"
+                (of percentile) and "assd"
+    """
+    if predictions.shape != targets.shape:
+        raise Exceptions.ShapeMismatch()
+
+    if target_distance_maps is None:
+        target_distance_maps = get_distance_maps(
+            targets, slice_axis=slice_axis, spacing=spacing)
+    prediction_distance_maps = get_distance_maps(
+        predictions, slice_axis=slice_axis, spacing=spacing)
+
+    # Distances of boundary pixels to the boundary of the other mask
+    distances = []
+    slice_indices = []
+    for boundaries, distance_maps in [
+            (get_boundaries(predictions, slice_axis), target_distance_maps),
+            (get_boundaries(targets, slice_axis), prediction_distance_maps)]:
+        distances.append(distance_maps[boundaries])
+        slice_indices.append(np.nonzero(boundaries)[0])
+    distances = np.concatenate(distances)
+    slice_indices = np.concatenate(slice_indices)
+
+    N_slices = target_distance_maps.shape[0]
+    is_empty = np.isinf(target_distance_maps[:, 0, 0]) | \
+        np.isinf(prediction_distance_maps[:, 0, 0])
+    is_valid = ~is_empty[slice_indices]
+    distances = distances[is_valid]
+    slice_indices = slice_indices[is_valid]
+
+    # Non-empty masks have boundary pixels. Hence, no distances remain only
+    # if all slices are empty.
+    if distances.size == 0:
+        return {
+            "hd%d" % (percentile): np.full(N_slices, np.nan),
+            "assd": np.full(N_slices, np.nan),
+        }
+
+    # Sort distances of each slice to interpolate percentiles linearly as
+    # np.percentile does
+    order = np.lexsort((distances, slice_indices))
+    distances = distances[order]
+    slice_indices = slice_indices[order]
+    counts = np.bincount(slice_indices, minlength=N_slices)
+    firsts = np.cumsum(counts) - counts
+
+    positions = percentile / 100. * np.maximum(counts - 1, 0)
+    lower = np.floor(positions).astype(int)
+    upper = np.ceil(positions).astype(int)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hausdorff_distances = np.where(
+            is_empty, np.nan,
+            distances[np.minimum(firsts + lower, len(distances) - 1)] * (
+                1 - positions + lower) +
+            distances[np.minimum(firsts + upper, len(distances) - 1)] * (
+                positions - lower))
+        average_distances = np.where(
+            is_empty, np.nan,
+            np.bincount(slice_indices, weights=distances,
+                        minlength=N_slices) / counts)
+
+    return {
+        "hd%d" % (percentile): hausdorff_distances,
+        "assd": average_distances,
+    }
@@ -0,0 +1,106 @@
+"""
+\file packing.py
+\brief      Collection of functions to store masks bit-packed, i.e. with one
+            bit per pixel, and to count pixels directly on the packed bytes
+
+\details    A mask of shape (H, W) is packed into ceil(H * W / 8) bytes via
+            np.packbits. Label maps are packed as bit planes, i.e. one packed
+            mask per bit of the labels.
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import numpy as np
+
+# Number of set bits of each byte value
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(0, 256)],
+                           dtype=np.uint8)
+
+
+def pack_masks(masks, ndim=2):
+    """!
+    Pack (stacked) binary masks with one bit per pixel.
+
+    \param      masks  numpy array of mask(s) whose last ndim axes span a
+                       mask. Non-zero pixels are foreground.
+    \param      ndim   number of axes spanning a single mask
+
+    \return     numpy uint8 array of shape masks.shape[:-ndim] +
+                (ceil(number of pixels / 8),)
+    """
+    shape = masks.shape[:masks.ndim - ndim] + (-1,)
+    return np.packbits((masks != 0).reshape(shape), axis=-1)
+
+
+def unpack_masks(packed_masks, shape):
+    """!
+    Unpack (stacked) bit-packed masks.
+
+    \param      packed_masks  numpy uint8 array of packed mask(s) as returned
+                              by \p pack_masks
+    \param      shape         shape of a single mask, e.g. (H, W)
+
+    \return     numpy boolean array of shape packed_masks.shape[:-1] + shape
+    """
+    N_pixels = int(np.prod(shape))
+    masks = np.unpackbits(packed_masks, axis=-1)[..., 0:N_pixels]
+
+    return masks.view(bool).reshape(packed_masks.shape[:-1] + tuple(shape))
+
+
+def pack_label_map(label_map):
+    """!
+    Pack a label map of non-negative integers as bit planes.
+
+    \param      label_map  numpy integer or boolean array of labels
+
+    \return     numpy uint8 array of shape (number of bits of largest label,
+                ceil(number of pixels / 8)), i.e. one packed mask per bit
+    """
+    if label_map.dtype == bool:
+        label_map = label_map.view(np.uint8)
+
+    N_bits = int(label_map.max()).bit_length() if label_map.size else 0
+
+    packed = np.zeros((N_bits, (label_map.size + 7) // 8), dtype=np.uint8)
+    for b in range(0, N_bits):
+        packed[b] = pack_masks((label_map >> b) & 1, ndim=label_map.ndim)
+
+    return packed
+
+
+def unpack_label_map(packed_label_map, shape, data_type=np.uint8):
+    """!
+    Unpack a label map packed as bit planes.
+
+    \param      packed_label_map  numpy uint8 array as returned by
+                                  \p pack_label_map
+    \param      shape             shape of the label map
+    \param      data_type         numpy data type of the label map
+
+    \return     numpy array of labels of given shape and data type
+    """
+    if np.dtype(data_type) == bool:
+        if packed_label_map.shape[0] == 0:
+            return np.zeros(shape, dtype=bool)
+        return unpack_masks(packed_label_map[0], shape)
+
+    label_map = np.zeros(shape, dtype=data_type)
+    for b in range(0, packed_label_map.shape[0]):
+        label_map |= unpack_masks(
+            packed_label_map[b], shape).astype(data_type) << b
+
+    return label_map
+
+
+def popcount(packed_masks, axis=-1):
+    """!
+    Count the set bits, i.e. foreground pixels, of bit-packed masks.
+
+    \param      packed_masks  numpy uint8 array of packed mask(s)
+    \param      axis          axis along which the bytes are summed
+
+    \return     numpy integer array of counts
+    """
+    return _POPCOUNT_TABLE[packed_masks].sum(axis=axis, dtype=np.int64)
@@ -3,6 +3,7 @@
 \brief      Parsing code for DICOMS and contour files
 """
 
+import re
 import dicom
 from dicom.errors import InvalidDicomError
 
@@ -30,6 +31,34 @@ def parse_contour_file(filename):
     return coords_lst
 
 
+# Lines of two whitespace separated columns, possibly blank
+_CONTOUR_FILE_PATTERN = re.compile(
+    r'(?:[ \t]*\S+[ \t]+\S+[ \t]*(?:\r?\n|\Z)|[ \t]*\r?\n)*\Z')
+
+
+def parse_contour_file_array(filename):
+    """Parse the given contour filename in one call
+
+    :param filename: filepath to the contourfile to parse
+    :return: numpy array of shape (K, 2) holding x, y coordinates of the
+     contour
+    :raises ValueError: if a line does not hold exactly two numbers
+    """
+
+    with open(filename, 'r') as infile:
+        text = infile.read()
+
+    # np.fromstring stops silently at the first value it cannot parse
+    coordinates = np.fromstring(text, dtype=np.float64, sep=' ')
+    if _CONTOUR_FILE_PATTERN.match(text) is None or \
+            coordinates.size != len(text.split()):
+        raise ValueError(
+            "Contour file '%s' does not consist of lines of x, y "
+            "coordinates" % (filename))
+
+    return coordinates.reshape(-1, 2)
+
+
 def parse_dicom_file(filename):
     """Parse the given DICOM filename
 
@@ -41,14 +70,7 @@ def parse_dicom_file(filename):
         dcm = dicom.read_file(filename)
         dcm_image = dcm.pixel_array
 
-        try:
-            intercept = dcm.RescaleIntercept
-        except AttributeError:
-            intercept = 0.0
-        try:
-            slope = dcm.RescaleSlope
-        except AttributeError:
-            slope = 0.0
+        slope, intercept = _get_rescale_parameters(dcm)
 
         if intercept != 0.0 and slope != 0.0:
             dcm_image = dcm_image*slope + intercept
@@ -58,18 +80,173 @@ def parse_dicom_file(filename):
         return None
 
 
+def parse_dicom_header(filename):
+    """Parse the header of the given DICOM filename without reading pixel data
+
+    :param filename: filepath to the DICOM file to parse
+    :return: dictionary with shape and data type of the pixel data array
+     returned by parse_dicom_file as well as the rescale parameters
+    """
+
+    try:
+        dcm = dicom.read_file(filename, stop_before_pixels=True)
+
+        # Same conventions as used by pydicom to create the pixel array
+        data_type = np.dtype('%sint%d' % (
+            ('u', '')[dcm.PixelRepresentation], dcm.BitsAllocated))
+
+        shape = (dcm.Rows, dcm.Columns)
+        if 'NumberOfFrames' in dcm and dcm.NumberOfFrames > 1:
+            shape = (dcm.NumberOfFrames,) + shape
+        if dcm.SamplesPerPixel > 1:
+            shape = (dcm.SamplesPerPixel,) + shape
+
+        slope, intercept = _get_rescale_parameters(dcm)
+
+        if intercept != 0.0 and slope != 0.0:
+            data_type = np.dtype(np.float64)
+
+        dcm_dict = {'shape': shape,
+                    'data_type': data_type,
+                    'slope': slope,
+                    'intercept': intercept}
+        return dcm_dict
+    except InvalidDicomError:
+        return None
+
+
+def _get_rescale_parameters(dcm):
+    """Get rescale slope and intercept of the given DICOM dataset
+
+    :param dcm: DICOM dataset
+    :return: tuple of slope and intercept
+    """
+
+    try:
+        intercept = dcm.RescaleIntercept
+    except AttributeError:
+        intercept = 0.0
+    try:
+        slope = dcm.RescaleSlope
+    except AttributeError:
+        slope = 0.0
+
+    return slope, intercept
+
+
 def poly_to_mask(polygon, width, height):
     """Convert polygon to mask
 
     :param polygon: list of pairs of x, y coords [(x1, y1), (x2, y2), ...]
-     in units of pixels
+     or numpy array of shape (K, 2) in units of pixels
     :param width: scalar image width
     :param height: scalar image height
     :return: Boolean mask of shape (height, width)
     """
 
+    if isinstance(polygon, np.ndarray):
+        polygon = polygon.ravel().tolist()
+
     # http://stackoverflow.com/a/3732128/1410871
     img = Image.new(mode='L', size=(width, height), color=0)
     ImageDraw.Draw(img).polygon(xy=polygon, outline=0, fill=1)
     mask = np.array(img).astype(bool)
     return mask
+
+
+def polygons_to_label_map(polygons, width, height, labels, out=None,
+                          additive=False):
+    """Convert many polygons into one label map
+
+    Each polygon writes its label into the label map. In overlapping regions
+    the label of the polygon coming later in the list is kept, or the labels
+    of all polygons are summed if additive. The masks are drawn as in
+    poly_to_mask into a single reused image and written directly into the
+    label map.
+
+    :param polygons: list of polygons, each given as list of pairs of x, y
+     coords or numpy array of shape (K, 2) in units of pixels
+    :param width: scalar image width
+    :param height: scalar image height
+    :param labels: list of labels, one for each polygon
+    :param out: optional preallocated array of shape (height, width) to
+     write the label map into
+    :param additive: sum the labels of overlapping polygons instead of
+     overwriting them
+    :return: Label map of shape (height, width)
+    """
+
+    if out is None:
+        out = np.zeros((height, width), dtype=np.asarray(labels).dtype)
+    else:
+        out[...] = 0
+
+    img = Image.new(mode='L', size=(width, height), color=0)
+    draw = ImageDraw.Draw(img)
+    for (polygon, label) in zip(polygons, labels):
+        if isinstance(polygon, np.ndarray):
+            polygon = polygon.ravel().tolist()
+
+        img.paste(0, (0, 0, width, height))
+        draw.polygon(xy=polygon, outline=0, fill=1)
+        mask = np.asarray(img).view(bool)
+
+        if additive:
+            np.add(out, label, out=out, where=mask)
+        else:
+            np.copyto(out, label, where=mask)
+
+    return out
+
+
+def polygons_to_runs(polygons, width, height):
+    """Convert many polygons to run-length encoded masks
+
+    The masks are drawn as in poly_to_mask into a single reused image. Hence,
+    the runs cover exactly the pixels of poly_to_mask for any installed
+    version of PIL.
+
+    :param polygons: list of polygons, each given as list of pairs of x, y
+     coords or numpy array of shape (K, 2) in units of pixels
+    :param width: scalar image width
+    :param height: scalar image height
+    :return: list of tuples of start and end (exclusive) flat indices of the
+     runs in an array of shape (height, width), one for each polygon. Runs
+     are sorted, disjoint and not adjacent.
+    """
+
+    img = Image.new(mode='L', size=(width, height), color=0)
+    draw = ImageDraw.Draw(img)
+    runs = []
+    for polygon in polygons:
+        polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+
+        # Only the rows covered by the polygon, plus a margin for rounding,
+        # are read and cleared again afterwards
+        row_first, row_end = 0, 0
+        if polygon.size:
+            y = polygon[:, 1]
+            row_first = min(max(int(y.min()) - 2, 0), height)
+            row_end = min(max(int(y.max()) + 2, row_first), height)
+        if row_first == row_end:
+            runs.append((np.zeros(0, dtype=np.int64),
+                         np.zeros(0, dtype=np.int64)))
+            continue
+        box = (0, row_first, width, row_end)
+
+        draw.polygon(xy=polygon.ravel().tolist(), outline=0, fill=1)
+        rows = np.asarray(img.crop(box)).view(bool).ravel()
+        img.paste(0, box)
+
+        # Flat indices at which the mask changes alternate between run
+        # starts and run ends, completed by runs touching the first or last
+        # pixel of the rows
+        changes = np.flatnonzero(rows[1:] != rows[:-1]) + 1
+        if rows[0]:
+            changes = np.append(0, changes)
+        if rows[-1]:
+            changes = np.append(changes, rows.size)
+        changes += row_first * width
+        runs.append((changes[0::2], changes[1::2]))
+
+    return runs
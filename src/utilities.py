@@ -14,6 +14,9 @@ import numpy as np
 import SimpleITK as sitk
 import matplotlib.pyplot as plt
 
+import src.metrics as metrics
+import src.Exceptions as Exceptions
+
 
 def file_exists(file_path):
     """!
@@ -112,10 +115,10 @@ def get_image_and_target_data_array_from_sample(sample):
     targets = sample.get_targets()
     N_slices = len(images)
 
-    image_data_array = images[0].get_data()
-    image_data_array_dtype = image_data_array.dtype
-    target_data_array_dtype = targets[0].get_data().dtype
-    shape = image_data_array.shape
+    # Read array information from headers only, i.e. without decoding
+    image_data_array_dtype = images[0].get_data_type()
+    target_data_array_dtype = targets[0].get_data_type()
+    shape = images[0].get_shape()
 
     images_data_array = np.zeros(
         (shape[0], shape[1], N_slices), dtype=image_data_array_dtype)
@@ -208,7 +211,24 @@ def dice_score(image_0, image_1):
     if image_0.shape != image_1.shape:
         raise Exceptions.ShapeMismatch()
 
-    numerator = 2 * np.sum(image_0 * image_1)
-    denominator = np.sum(image_0 > 0) + np.sum(image_1 > 0)
+    numerator = 2 * np.count_nonzero(np.logical_and(image_0 > 0, image_1 > 0))
+    denominator = np.count_nonzero(image_0 > 0) + np.count_nonzero(image_1 > 0)
+
+    return numerator / np.float64(denominator)
+
+
+def polygon_dice_score(polygon_0, polygon_1, shape=None):
+    """!
+    Compute Dice score given two polygons without rasterizing them
+
+    \param      polygon_0  Polygon as list of pairs of x, y coords or numpy
+                           array of shape (K, 2)
+    \param      polygon_1  Polygon as list of pairs of x, y coords or numpy
+                           array of shape (K, 2)
+    \param      shape      optional shape (height, width) of the pixel grid to
+                           obtain the Dice score of the rasterized polygons
 
-    return numerator / float(denominator)
+    \return     Dice score
+    """
+    return metrics.get_polygon_dice_scores(
+        [polygon_0], [polygon_1], shape=shape)[0]
@@ -0,0 +1,202 @@
+"""
+\file TestDataBase.py
+\brief Unit tests to check the retrieval of batches from the DataBase
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import gc
+import pickle
+import weakref
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.DataReader as DataReader
+import src.DataBase as DataBase
+import src.ManifestSample as ManifestSample
+
+
+class TestDataBase(unittest.TestCase):
+
+    def setUp(self):
+        data_reader = DataReader.DataReader(
+            directory_dicoms=os.path.join(dir_test_data_final_data, "dicoms"),
+            directory_contours=os.path.join(
+                dir_test_data_final_data, "contourfiles"),
+            csv_file=os.path.join(
+                dir_test_data_final_data, "link_reduced.csv"),
+            contours_type="i-contours o-contours")
+        data_reader.read_data()
+        self.samples = data_reader.get_samples()
+
+        self.database = DataBase.DataBase(self.samples)
+        self.database.build_training_database()
+        self.N_samples = self.database.get_number_of_all_training_samples()
+
+    def test_cache(self):
+        """
+        Batches read via the in-memory cache shall equal the ones read
+        from file. Counters shall reflect the cache usage.
+        """
+        images_array, targets_array = \
+            self.database.get_batch_for_all_samples()
+
+        # Byte budget sufficient for all images and targets
+        database = DataBase.DataBase(self.samples, cache_bytes=1e9)
+        database.build_training_database()
+
+        for i in range(0, 2):
+            images_array_cache, targets_array_cache = \
+                database.get_batch_for_all_samples()
+            self.assertTrue(np.array_equal(images_array, images_array_cache))
+            self.assertTrue(
+                np.array_equal(targets_array, targets_array_cache))
+
+        statistics = database.get_cache_statistics()
+        self.assertEqual(statistics["misses"], 2 * self.N_samples)
+        self.assertEqual(statistics["hits"], 2 * self.N_samples)
+        self.assertEqual(statistics["evictions"], 0)
+
+        # Byte budget sufficient for only a few arrays
+        max_bytes = 3 * images_array[:, :, 0].nbytes
+        database = DataBase.DataBase(self.samples, cache_bytes=max_bytes)
+        database.build_training_database()
+        database.get_batch_for_all_samples()
+
+        statistics = database.get_cache_statistics()
+        self.assertLessEqual(statistics["bytes"], max_bytes)
+        self.assertGreater(statistics["evictions"], 0)
+
+    def test_index_arrays(self):
+        """
+        Index arrays shall describe the images of all samples in order and
+        training samples created on demand shall refer to them
+        """
+        images = [image for sample in self.samples
+                  for image in sample.get_images()]
+        self.assertEqual(len(images), self.N_samples)
+
+        sample_indices = self.database.get_sample_indices()
+        slice_ids = self.database.get_slice_ids()
+        shapes = self.database.get_shapes()
+        shape_ids = self.database.get_shape_ids()
+        for i in range(0, self.N_samples):
+            image = self.samples[sample_indices[i]].get_images()[
+                np.sum(sample_indices[0:i] == sample_indices[i])]
+            self.assertTrue(image is images[i])
+            self.assertEqual(slice_ids[i], images[i].get_id())
+            self.assertEqual(shapes[shape_ids[i]], images[i].get_shape())
+
+        training_sample = self.database.get_training_sample(3)
+        self.assertTrue(np.array_equal(
+            training_sample.get_image_data(), images[3].get_data()))
+        self.assertEqual(
+            len(self.database.get_all_training_samples()), self.N_samples)
+
+        # Objects without dictionary can still be pickled, e.g. by
+        # multiprocessing
+        self.assertFalse(hasattr(training_sample, "__dict__"))
+        training_sample = pickle.loads(pickle.dumps(training_sample, 2))
+        self.assertTrue(np.array_equal(
+            training_sample.get_target_data(),
+            self.samples[sample_indices[3]].get_targets()[
+                np.sum(sample_indices[0:3] == sample_indices[3])].get_data()))
+
+    def test_samples_released(self):
+        """
+        Once built, the database shall not keep the samples and thus their
+        Image and Target objects, but still provide the same batches
+        """
+        samples = []
+        for sample in self.samples:
+            sample_manifest = ManifestSample.ManifestSample(
+                sample.get_manifest())
+            sample_manifest.create_sample()
+            samples.append(sample_manifest)
+        references = [weakref.ref(s) for s in samples]
+
+        database = DataBase.DataBase(samples)
+        database.build_training_database()
+        del samples, sample_manifest, s
+        gc.collect()
+        self.assertTrue(all(r() is None for r in references))
+
+        for array, array_ref in zip(
+                database.get_batch_for_all_samples(),
+                self.database.get_batch_for_all_samples()):
+            self.assertTrue(np.array_equal(array, array_ref))
+
+        self.assertTrue(np.array_equal(
+            database.get_training_sample(3).get_target_data(),
+            self.database.get_training_sample(3).get_target_data()))
+
+    def test_iter_batches(self):
+        """
+        Prefetched batches shall equal the ones obtained by get_next_batch
+        """
+        self.database.set_batch_size(7)
+
+        batches = list(self.database.iter_batches(prefetch=2, workers=3))
+
+        self.database.restart_cursor()
+        for images_array, targets_array in batches:
+            images_array_ref, targets_array_ref = \
+                self.database.get_next_batch()
+            self.assertTrue(np.array_equal(images_array, images_array_ref))
+            self.assertTrue(np.array_equal(targets_array, targets_array_ref))
+
+        self.assertEqual(self.database.get_next_batch(), (None, None))
+
+    def test_layout_and_preallocated_arrays(self):
+        """
+        Batches in layout "NHW" and batches written into preallocated arrays
+        shall equal the ones of the default layout
+        """
+        self.database.set_batch_size(7)
+        database = DataBase.DataBase(self.samples, batch_size=7, layout="NHW")
+        database.build_training_database()
+
+        images_array, targets_array = [
+            np.zeros_like(a) for a in self.database.get_next_batch()]
+        self.database.restart_cursor()
+
+        while True:
+            images_array_ref, targets_array_ref = \
+                self.database.get_next_batch()
+            images_array_nhw, targets_array_nhw = database.get_next_batch(
+                images_array.transpose(2, 0, 1),
+                targets_array.transpose(2, 0, 1))
+            if images_array_ref is None:
+                self.assertEqual(images_array_nhw, None)
+                break
+
+            self.assertTrue(np.array_equal(
+                images_array_ref, images_array_nhw.transpose(1, 2, 0)))
+            self.assertTrue(np.array_equal(
+                targets_array_ref, targets_array_nhw.transpose(1, 2, 0)))
+
+            # Data is written into the preallocated arrays
+            self.assertTrue(np.may_share_memory(images_array_nhw, images_array))
+
+        self.assertRaises(ValueError, DataBase.DataBase, self.samples,
+                          layout="WHN")
+
+    def test_iter_batches_reuse_arrays(self):
+        """
+        Batches written into a ring of preallocated arrays shall equal the
+        ones obtained by get_next_batch
+        """
+        self.database.set_batch_size(4)
+
+        for images_array, targets_array in self.database.iter_batches(
+                prefetch=2, workers=2, reuse_arrays=True):
+            images_array_ref, targets_array_ref = \
+                self.database.get_next_batch()
+            self.assertTrue(np.array_equal(images_array, images_array_ref))
+            self.assertTrue(np.array_equal(targets_array, targets_array_ref))
+
+        self.assertEqual(self.database.get_next_batch(), (None, None))
@@ -0,0 +1,98 @@
+"""
+\file TestDiskCache.py
+\brief Unit tests to check the persistent on-disk cache of data arrays
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.parsing as parsing
+import src.Image as Image
+import src.TargetSingleClass as TargetSingleClass
+import src.DiskCache as DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory_tmp = tempfile.mkdtemp()
+        self.cache = DiskCache.DiskCache(
+            os.path.join(self.directory_tmp, "cache"))
+
+        # Work on copies of the test data to be able to modify them
+        self.filename_dicom = os.path.join(self.directory_tmp, "48.dcm")
+        self.filename_contour = os.path.join(
+            self.directory_tmp, "IM-0001-0048-icontour-manual.txt")
+        shutil.copy(os.path.join(
+            dir_test_data_final_data, "dicoms", "SCD0000101", "48.dcm"),
+            self.filename_dicom)
+        shutil.copy(os.path.join(
+            dir_test_data_final_data, "contourfiles", "SC-HF-I-1",
+            "i-contours", "IM-0001-0048-icontour-manual.txt"),
+            self.filename_contour)
+
+        self.parse_dicom_file = parsing.parse_dicom_file
+        self.parse_contour_file_array = parsing.parse_contour_file_array
+
+    def tearDown(self):
+        parsing.parse_dicom_file = self.parse_dicom_file
+        parsing.parse_contour_file_array = self.parse_contour_file_array
+        shutil.rmtree(self.directory_tmp)
+
+    def _disable_parsing(self):
+        def fail(filename):
+            raise AssertionError("Source file '%s' is parsed" % (filename))
+        parsing.parse_dicom_file = fail
+        parsing.parse_contour_file_array = fail
+
+    def test_cached_data_is_used(self):
+        """
+        Cached image and mask shall equal the original ones and shall be
+        obtained without parsing the source files again
+        """
+        image = Image.Image(1, self.filename_dicom, cache=self.cache)
+        target = TargetSingleClass.TargetSingleClass(
+            1, self.filename_contour, shape=image.get_shape(),
+            cache=self.cache)
+        image_data = image.get_data()
+        target_data = target.get_data()
+
+        self._disable_parsing()
+        image = Image.Image(1, self.filename_dicom, cache=self.cache)
+        target = TargetSingleClass.TargetSingleClass(
+            1, self.filename_contour, shape=image.get_shape(),
+            cache=self.cache)
+
+        self.assertEqual(image.get_data_type(), image_data.dtype)
+        self.assertTrue(np.array_equal(image.get_data(), image_data))
+        self.assertTrue(np.array_equal(target.get_data(), target_data))
+
+    def test_modified_source_invalidates_entry(self):
+        """
+        Modifying the source file shall invalidate the cache entry
+        """
+        target = TargetSingleClass.TargetSingleClass(
+            1, self.filename_contour, shape=(256, 256), cache=self.cache)
+        target_data = target.get_data()
+
+        # Shift contour by one pixel
+        coordinates = parsing.parse_contour_file(self.filename_contour)
+        with open(self.filename_contour, "w") as f:
+            for (x, y) in coordinates:
+                f.write("%.2f %.2f\n" % (x + 1, y))
+
+        self.assertFalse(np.array_equal(target.get_data(), target_data))
+        self.assertTrue(np.array_equal(
+            target.get_data()[:, 1:], target_data[:, :-1]))
+
+        # Invalidated entry is removed
+        self.assertEqual(len([f for f in os.listdir(
+            self.cache.get_directory()) if f.endswith(".npy")]), 1)
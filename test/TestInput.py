@@ -99,6 +99,35 @@ class TestInput(unittest.TestCase):
             contours_type="i-contours")
         data_reader.read_data()
 
+    def test_data_reader_parallel_read(self):
+        """
+        Reading data with several worker processes shall give the same
+        samples in the same order as reading them sequentially
+        """
+        directory_contours = os.path.join(
+            dir_test_data_final_data, "contourfiles")
+        directory_dicoms = os.path.join(
+            dir_test_data_final_data, "dicoms")
+        csv_file = os.path.join(dir_test_data_final_data, "link.csv")
+
+        samples_list = []
+        for workers in [1, 3]:
+            data_reader = DataReader.DataReader(
+                directory_dicoms=directory_dicoms,
+                directory_contours=directory_contours,
+                csv_file=csv_file,
+                contours_type="i-contours o-contours",
+                workers=workers)
+            data_reader.read_data()
+            samples_list.append(data_reader.get_samples())
+
+        filenames_list = [
+            [[image.get_filename() for image in sample.get_images()]
+             for sample in samples]
+            for samples in samples_list]
+
+        self.assertEqual(filenames_list[0], filenames_list[1])
+
     def test_flawed_csv_file(self):
         """
         patient_id does not equal original_id in csv file
@@ -163,6 +192,27 @@ class TestInput(unittest.TestCase):
         self.assertRaises(Exceptions.SampleNotValid,
             lambda: data_reader.read_data())
 
+    def test_sample_input_2_parallel(self):
+        """
+        Errors raised while creating samples in worker processes shall be
+        passed on.
+        """
+        directory_contours = os.path.join(
+            dir_test_data, "flawed_data", "contourfiles")
+        directory_dicoms = os.path.join(
+            dir_test_data, "flawed_data", "dicoms")
+        csv_file = os.path.join(dir_test_data, "flawed_data", "link2.csv")
+
+        data_reader = DataReader.DataReader(
+            directory_dicoms=directory_dicoms,
+            directory_contours=directory_contours,
+            csv_file=csv_file,
+            contours_type="i-contours",
+            workers=2)
+
+        self.assertRaises(Exceptions.SampleNotValid,
+            lambda: data_reader.read_data())
+
     def test_sample_input_3(self):
         """
         Contours input must be a list
@@ -0,0 +1,164 @@
+"""
+\file TestManifest.py
+\brief Unit tests to check reading samples from a dataset manifest
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import json
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.parsing as parsing
+import src.DataReader as DataReader
+import src.DataBase as DataBase
+import src.Exceptions as Exceptions
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory_tmp = tempfile.mkdtemp()
+        self.filename_manifest = os.path.join(
+            self.directory_tmp, "manifest.json")
+
+        self.data_reader = DataReader.DataReader(
+            directory_dicoms=os.path.join(dir_test_data_final_data, "dicoms"),
+            directory_contours=os.path.join(
+                dir_test_data_final_data, "contourfiles"),
+            csv_file=os.path.join(dir_test_data_final_data, "link.csv"),
+            contours_type="i-contours o-contours")
+        self.data_reader.read_data()
+
+        self.parse_dicom_header = parsing.parse_dicom_header
+
+    def tearDown(self):
+        parsing.parse_dicom_header = self.parse_dicom_header
+        shutil.rmtree(self.directory_tmp)
+
+    def test_manifest_equals_original_data(self):
+        """
+        Samples read from the manifest shall equal the ones obtained by
+        walking the directories without reading any DICOM header
+        """
+        self.data_reader.write_manifest(self.filename_manifest)
+        samples = self.data_reader.get_samples()
+
+        def parse_dicom_header(filename):
+            raise AssertionError("DICOM header read for %s" % (filename))
+        parsing.parse_dicom_header = parse_dicom_header
+
+        data_reader = DataReader.DataReader(
+            directory_dicoms=None,
+            directory_contours=None,
+            csv_file=None,
+            contours_type=None)
+        data_reader.read_manifest(self.filename_manifest)
+        samples_manifest = data_reader.get_samples()
+
+        self.assertEqual(len(samples), len(samples_manifest))
+        for sample, sample_manifest in zip(samples, samples_manifest):
+            self.assertEqual(sample.get_manifest(),
+                             sample_manifest.get_manifest())
+
+        arrays = []
+        for s in [samples, samples_manifest]:
+            database = DataBase.DataBase(s)
+            database.build_training_database()
+            arrays.append(database.get_batch_for_all_samples())
+
+        for i in range(0, 2):
+            self.assertEqual(arrays[0][i].dtype, arrays[1][i].dtype)
+            self.assertTrue(np.array_equal(arrays[0][i], arrays[1][i]))
+
+    def test_manifest_contours_type(self):
+        """
+        Reading a manifest shall fail if its contours type differs from the
+        given one or does not match the contour files of its slices
+        """
+        self.data_reader.write_manifest(self.filename_manifest)
+
+        data_reader = DataReader.DataReader(
+            directory_dicoms=None,
+            directory_contours=None,
+            csv_file=None,
+            contours_type="i-contours")
+        self.assertRaises(Exceptions.ManifestFlawed, lambda:
+                          data_reader.read_manifest(self.filename_manifest))
+
+        with open(self.filename_manifest, "r") as f:
+            manifest = json.load(f)
+        manifest["samples"][0]["slices"][0]["contours"].pop()
+        with open(self.filename_manifest, "w") as f:
+            json.dump(manifest, f)
+
+        data_reader = DataReader.DataReader(
+            directory_dicoms=None,
+            directory_contours=None,
+            csv_file=None,
+            contours_type=None)
+        self.assertRaises(Exceptions.ManifestFlawed, lambda:
+                          data_reader.read_manifest(self.filename_manifest))
+
+    def test_encoding(self):
+        """
+        Targets labelled by class IDs shall be created by the DataReader,
+        kept by the DataBase and restored from the manifest
+        """
+        data_reader = DataReader.DataReader(
+            directory_dicoms=os.path.join(dir_test_data_final_data, "dicoms"),
+            directory_contours=os.path.join(
+                dir_test_data_final_data, "contourfiles"),
+            csv_file=os.path.join(dir_test_data_final_data, "link.csv"),
+            contours_type="i-contours o-contours",
+            encoding="class_ids")
+        data_reader.read_data()
+        data_reader.write_manifest(self.filename_manifest)
+
+        targets = [t for sample in data_reader.get_samples()
+                   for t in sample.get_targets()]
+        for target in targets[0:5]:
+            masks = [t.get_data() for t in target.get_single_class_targets()]
+            self.assertEqual(target.get_encoding(), "class_ids")
+            self.assertTrue(np.array_equal(
+                target.get_data(), np.where(masks[0], 1, 2 * masks[1])))
+
+        database = DataBase.DataBase(data_reader.get_samples())
+        database.build_training_database()
+        targets_array = database.get_batch_for_all_samples()[1]
+        self.assertTrue(np.array_equal(
+            targets_array[:, :, 3], targets[3].get_data()))
+        self.assertFalse(np.array_equal(
+            targets_array,
+            self._get_targets_array(self.data_reader.get_samples())))
+
+        data_reader_manifest = DataReader.DataReader(
+            directory_dicoms=None,
+            directory_contours=None,
+            csv_file=None,
+            contours_type=None)
+        data_reader_manifest.read_manifest(self.filename_manifest)
+        self.assertTrue(np.array_equal(
+            targets_array,
+            self._get_targets_array(data_reader_manifest.get_samples())))
+
+        data_reader_manifest = DataReader.DataReader(
+            directory_dicoms=None,
+            directory_contours=None,
+            csv_file=None,
+            contours_type=None,
+            encoding="additive")
+        self.assertRaises(Exceptions.ManifestFlawed, lambda:
+                          data_reader_manifest.read_manifest(
+                              self.filename_manifest))
+
+    def _get_targets_array(self, samples):
+        database = DataBase.DataBase(samples)
+        database.build_training_database()
+        return database.get_batch_for_all_samples()[1]
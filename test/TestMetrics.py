@@ -0,0 +1,208 @@
+"""
+\file TestMetrics.py
+\brief Unit tests to check the segmentation metrics of stacked slices
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import glob
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.parsing as parsing
+import src.utilities as utils
+import src.metrics as metrics
+import src.Exceptions as Exceptions
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.predictions = np.random.randint(0, 3, (6, 20, 15)).astype(np.uint8)
+        self.targets = np.random.randint(0, 3, (6, 20, 15)).astype(np.uint8)
+
+        # Slice without any target and prediction
+        self.predictions[4] = 0
+        self.targets[4] = 0
+
+    def test_binary_masks(self):
+        """
+        Metrics of binary masks shall equal their definitions evaluated
+        slice by slice
+        """
+        results = metrics.get_metrics(self.predictions > 1, self.targets > 1)
+
+        for i in range(0, self.predictions.shape[0]):
+            p = self.predictions[i] > 1
+            t = self.targets[i] > 1
+            overlap = np.sum(p & t)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                np.testing.assert_equal(
+                    results["dice"][i], utils.dice_score(p, t))
+                np.testing.assert_equal(
+                    results["jaccard"][i], overlap / float(np.sum(p | t)))
+                np.testing.assert_equal(
+                    results["sensitivity"][i], overlap / float(np.sum(t)))
+                np.testing.assert_equal(
+                    results["volume_error"][i],
+                    (np.sum(p) - np.sum(t)) / float(np.sum(t)))
+
+        self.assertTrue(np.isnan(results["dice"][4]))
+
+    def test_label_maps_and_slice_axis(self):
+        """
+        Metrics of label maps shall equal the ones of the binary masks of
+        each label, independent of the axis the slices are stacked along
+        """
+        labels = [2, 1, 5]
+        results = metrics.get_metrics(
+            self.predictions.transpose(1, 2, 0),
+            self.targets.transpose(1, 2, 0),
+            labels=labels,
+            slice_axis=2)
+
+        for j, label in enumerate(labels):
+            results_label = metrics.get_metrics(
+                self.predictions == label, self.targets == label)
+            for key in results_label.keys():
+                np.testing.assert_equal(results[key][:, j], results_label[key])
+
+        np.testing.assert_equal(
+            metrics.get_dice_scores(self.predictions, self.targets, labels),
+            results["dice"])
+
+    def test_shape_mismatch(self):
+        """
+        Arrays of different shape shall throw an error
+        """
+        self.assertRaises(Exceptions.ShapeMismatch, lambda:
+                          metrics.get_metrics(self.predictions,
+                                              self.targets[0:2]))
+        self.assertRaises(Exceptions.ShapeMismatch, lambda:
+                          utils.dice_score(self.predictions[0],
+                                           self.targets[0:2]))
+
+    def test_surface_distances(self):
+        """
+        Surface distances shall equal the ones computed from all pairs of
+        boundary pixels
+        """
+        np.random.seed(1)
+        predictions = np.zeros((4, 30, 25), dtype=bool)
+        targets = np.zeros((4, 30, 25), dtype=bool)
+        for i in range(0, 3):
+            r, c = np.random.randint(5, 20, 2)
+            predictions[i, r - 4:r + 5, c - 3:c + 4] = True
+            r, c = np.random.randint(5, 20, 2)
+            targets[i, r - 5:r + 3, c - 4:c + 6] = True
+        targets[0, 0:3, 0:4] = True
+
+        # Slice without prediction
+        targets[3, 4:10, 5:9] = True
+
+        spacing = (1.5, 0.7)
+        results = metrics.get_surface_distances(
+            predictions.transpose(1, 2, 0), targets.transpose(1, 2, 0),
+            slice_axis=2, spacing=spacing)
+
+        for i in range(0, 3):
+            points = [np.array(np.nonzero(b)).transpose() * spacing
+                      for b in [metrics.get_boundaries(predictions)[i],
+                                metrics.get_boundaries(targets)[i]]]
+            distances = np.sqrt(((points[0][:, np.newaxis] -
+                                  points[1][np.newaxis]) ** 2).sum(axis=2))
+            distances = np.concatenate(
+                [distances.min(axis=1), distances.min(axis=0)])
+
+            self.assertAlmostEqual(results["hd95"][i],
+                                   np.percentile(distances, 95))
+            self.assertAlmostEqual(results["assd"][i], distances.mean())
+
+        self.assertTrue(np.isnan(results["hd95"][3]))
+        self.assertTrue(np.isnan(results["assd"][3]))
+
+        # Identical masks have zero distance
+        results = metrics.get_surface_distances(targets[0:3], targets[0:3])
+        self.assertTrue(np.all(results["hd95"] == 0))
+
+        # All predictions empty
+        results = metrics.get_surface_distances(
+            np.zeros_like(predictions), targets)
+        for key in ["hd95", "assd"]:
+            self.assertEqual(results[key].shape, (4,))
+            self.assertTrue(np.all(np.isnan(results[key])))
+
+    def test_polygon_dice_scores(self):
+        """
+        Geometric overlaps of polygons shall equal the ones obtained by
+        clipping with convex polygons. Dice scores on the pixel grid shall
+        equal the ones of the rasterized polygons.
+        """
+        def clip(polygon, polygon_convex):
+            # Sutherland-Hodgman clipping by a counter-clockwise polygon
+            for a, b in zip(polygon_convex, np.roll(polygon_convex, -1, 0)):
+                side = lambda p: (b[0] - a[0]) * (p[1] - a[1]) - \
+                    (b[1] - a[1]) * (p[0] - a[0])
+                clipped = []
+                for p, q in zip(polygon, np.roll(polygon, -1, 0)):
+                    if side(p) >= 0:
+                        clipped.append(p)
+                    if (side(p) >= 0) != (side(q) >= 0):
+                        clipped.append(p + (q - p) * side(p) /
+                                       (side(p) - side(q)))
+                polygon = np.array(clipped).reshape(-1, 2)
+            return polygon
+
+        def area(polygon):
+            return abs(np.sum(polygon[:, 0] * np.roll(polygon[:, 1], -1) -
+                              np.roll(polygon[:, 0], -1) * polygon[:, 1])) / 2.
+
+        # Star-shaped and convex polygons, partly clockwise
+        random_state = np.random.RandomState(0)
+        polygons_star, polygons_convex = [], []
+        for i in range(0, 20):
+            angles = np.sort(random_state.uniform(0, 2 * np.pi, 15))
+            radii = random_state.uniform(2, 10, 15)
+            polygons_star.append(np.array(
+                [20 + radii * np.cos(angles), 20 + radii * np.sin(angles)]).T)
+            center = random_state.uniform(15, 25, 2)
+            angles = np.sort(random_state.uniform(0, 2 * np.pi, 8))
+            polygons_convex.append(center + np.array(
+                [8 * np.cos(angles), 5 * np.sin(angles)]).T)
+        polygons_clockwise = [p[::-1] for p in polygons_star[0:10]] + \
+            polygons_star[10:20]
+
+        areas = metrics.get_polygon_overlap_areas(
+            polygons_clockwise, polygons_convex)
+        for i in range(0, 20):
+            self.assertAlmostEqual(
+                areas[0][i], area(clip(polygons_star[i], polygons_convex[i])))
+            self.assertAlmostEqual(areas[1][i], area(polygons_star[i]))
+            self.assertAlmostEqual(areas[2][i], area(polygons_convex[i]))
+
+        # Shared edges of identical and adjacent polygons
+        square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+        np.testing.assert_almost_equal(
+            metrics.get_polygon_dice_scores(
+                [square, square, square, []],
+                [square, [(10, 0), (20, 0), (20, 10), (10, 10)],
+                 [(5, 0), (15, 0), (15, 10), (5, 10)][::-1], []]),
+            [1, 0, 0.5, np.nan])
+
+        contours = [parsing.parse_contour_file(f) for f in sorted(glob.glob(
+            os.path.join(dir_test_data_final_data, "contourfiles", "*", "*",
+                         "*.txt")))]
+        dice_scores = metrics.get_polygon_dice_scores(
+            contours[:-1], contours[1:], shape=(256, 256))
+        for i in range(0, len(contours) - 1):
+            self.assertEqual(dice_scores[i], utils.dice_score(
+                parsing.poly_to_mask(contours[i], 256, 256),
+                parsing.poly_to_mask(contours[i + 1], 256, 256)))
+        self.assertEqual(
+            utils.polygon_dice_score(contours[0], contours[1]),
+            metrics.get_polygon_dice_scores(contours[0:1], contours[1:2])[0])
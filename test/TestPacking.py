@@ -0,0 +1,136 @@
+"""
+\file TestPacking.py
+\brief Unit tests to check the bit-packed storage of masks and the overlap
+       counts computed on it
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.packing as packing
+import src.metrics as metrics
+import src.DataReader as DataReader
+import src.DataBase as DataBase
+import src.DiskCache as DiskCache
+import src.TargetSingleClass as TargetSingleClass
+
+
+class TestPacking(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+
+        # Number of pixels not divisible by 8
+        self.predictions = np.random.randint(0, 3, (6, 20, 15)).astype(np.uint8)
+        self.targets = np.random.randint(0, 3, (6, 20, 15)).astype(np.uint8)
+        self.predictions[4] = 0
+        self.targets[4] = 0
+
+    def test_round_trips(self):
+        """
+        Unpacking packed masks and label maps shall restore the originals
+        """
+        packed_masks = packing.pack_masks(self.predictions)
+        self.assertEqual(packed_masks.shape, (6, (20 * 15 + 7) // 8))
+        self.assertTrue(np.array_equal(
+            packing.unpack_masks(packed_masks, (20, 15)),
+            self.predictions != 0))
+
+        for label_map in [self.predictions[0],
+                          self.predictions[0] * 50,
+                          self.predictions[0] > 1,
+                          self.predictions[4]]:
+            label_map_unpacked = packing.unpack_label_map(
+                packing.pack_label_map(label_map), label_map.shape,
+                label_map.dtype)
+            self.assertEqual(label_map_unpacked.dtype, label_map.dtype)
+            self.assertTrue(np.array_equal(label_map_unpacked, label_map))
+
+    def test_packed_dice_scores(self):
+        """
+        Counts and Dice scores computed on packed masks shall equal the ones
+        computed on the unpacked masks
+        """
+        packed_predictions = packing.pack_masks(self.predictions > 1)
+        packed_targets = packing.pack_masks(self.targets > 1)
+
+        self.assertTrue(np.array_equal(
+            packing.popcount(packed_predictions),
+            np.count_nonzero((self.predictions > 1).reshape(6, -1), axis=1)))
+
+        counts = metrics.get_overlap_counts(
+            self.predictions > 1, self.targets > 1)
+        counts_packed = metrics.get_packed_overlap_counts(
+            packed_predictions, packed_targets)
+        for i in range(0, 3):
+            self.assertTrue(np.array_equal(counts[i], counts_packed[i]))
+
+        np.testing.assert_equal(
+            metrics.get_packed_dice_scores(packed_predictions, packed_targets),
+            metrics.get_dice_scores(self.predictions > 1, self.targets > 1))
+
+    def test_target_single_class_cache(self):
+        """
+        Masks stored packed in the disk cache shall equal the rasterized ones
+        """
+        directory_tmp = tempfile.mkdtemp()
+        try:
+            cache = DiskCache.DiskCache(os.path.join(directory_tmp, "cache"))
+            filename = os.path.join(
+                dir_test_data_final_data, "contourfiles", "SC-HF-I-1",
+                "i-contours", "IM-0001-0048-icontour-manual.txt")
+
+            mask = TargetSingleClass.TargetSingleClass(
+                1, filename, shape=(256, 256)).get_data()
+            for i in range(0, 2):
+                target = TargetSingleClass.TargetSingleClass(
+                    1, filename, shape=(256, 256), cache=cache)
+                self.assertTrue(np.array_equal(target.get_data(), mask))
+                self.assertTrue(np.array_equal(
+                    target.get_packed_data(), packing.pack_masks(mask)))
+        finally:
+            shutil.rmtree(directory_tmp)
+
+    def test_database_packed_targets(self):
+        """
+        Batches of a DataBase keeping its targets packed in the cache shall
+        equal the unpacked ones
+        """
+        data_reader = DataReader.DataReader(
+            directory_dicoms=os.path.join(dir_test_data_final_data, "dicoms"),
+            directory_contours=os.path.join(
+                dir_test_data_final_data, "contourfiles"),
+            csv_file=os.path.join(
+                dir_test_data_final_data, "link_reduced.csv"),
+            contours_type="i-contours o-contours")
+        data_reader.read_data()
+        samples = data_reader.get_samples()
+
+        database = DataBase.DataBase(samples)
+        database.build_training_database()
+        targets_array = database.get_batch_for_all_samples()[1]
+
+        database = DataBase.DataBase(
+            samples, cache_bytes=1e9, pack_targets=True)
+        database.build_training_database()
+        for i in range(0, 2):
+            self.assertTrue(np.array_equal(
+                database.get_batch_for_all_samples()[1], targets_array))
+
+        N_samples = database.get_number_of_all_training_samples()
+        packed_masks = database.get_packed_target_masks(
+            range(0, N_samples), label=2)
+        self.assertTrue(np.array_equal(
+            packed_masks,
+            packing.pack_masks(targets_array.transpose(2, 0, 1) == 2)))
+
+        self.assertRaises(ValueError, lambda:
+                          DataBase.DataBase(samples, pack_targets=True))
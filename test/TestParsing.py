@@ -0,0 +1,152 @@
+"""
+\file TestParsing.py
+\brief Unit tests to check parsing of DICOM and contour files
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import glob
+import shutil
+import tempfile
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.parsing as parsing
+import src.ContourStore as ContourStore
+
+
+class TestParsing(unittest.TestCase):
+
+    def setUp(self):
+        self.directory_dicoms = os.path.join(
+            dir_test_data_final_data, "dicoms", "SCD0000101")
+        self.contour_files = sorted(glob.glob(os.path.join(
+            dir_test_data_final_data, "contourfiles", "*", "*", "*.txt")))
+
+    def test_dicom_header_matches_pixel_data(self):
+        """
+        Shape and data type read from the DICOM header only must coincide
+        with the ones of the decoded pixel data
+        """
+        for f in ["1.dcm", "48.dcm", "219.dcm"]:
+            filename = os.path.join(self.directory_dicoms, f)
+
+            header = parsing.parse_dicom_header(filename)
+            pixel_data = parsing.parse_dicom_file(filename)['pixel_data']
+
+            self.assertEqual(header['shape'], pixel_data.shape)
+            self.assertEqual(header['data_type'], pixel_data.dtype)
+
+    def test_contour_file_array(self):
+        """
+        Bulk parsing of contour files shall give the same coordinates and
+        masks as parsing line by line
+        """
+        for f in self.contour_files:
+            coordinates = parsing.parse_contour_file(f)
+            coordinates_array = parsing.parse_contour_file_array(f)
+
+            self.assertEqual(coordinates_array.shape, (len(coordinates), 2))
+            self.assertTrue(np.array_equal(
+                coordinates_array, np.array(coordinates)))
+            self.assertTrue(np.array_equal(
+                parsing.poly_to_mask(coordinates_array, 256, 256),
+                parsing.poly_to_mask(coordinates, 256, 256)))
+
+        # Malformed contour files shall throw an error
+        directory_tmp = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory_tmp, "contour.txt")
+            for text in ["1.0 2.0\n3.0\n", "1.0 2.0 3.0\n4.0 5.0 6.0\n",
+                         "1.0 2.0\n3.0 x\n", "1.0 2.0\n3.0 4.0 5.0\n6.0\n"]:
+                with open(filename, "w") as f:
+                    f.write(text)
+                self.assertRaises(
+                    ValueError, parsing.parse_contour_file_array, filename)
+
+            with open(filename, "w") as f:
+                f.write("1.0 2.0\n\n3.5\t4.0  \n5 6")
+            self.assertTrue(np.array_equal(
+                parsing.parse_contour_file_array(filename),
+                [[1, 2], [3.5, 4], [5, 6]]))
+        finally:
+            shutil.rmtree(directory_tmp)
+
+    def test_contour_store(self):
+        """
+        Coordinates read from contour store shall equal the parsed ones.
+        Modified or unknown contour files are not served from the store.
+        """
+        directory_tmp = tempfile.mkdtemp()
+        try:
+            filename_contour = os.path.join(directory_tmp, "contour.txt")
+            shutil.copy(self.contour_files[0], filename_contour)
+            filenames = self.contour_files[1:] + [filename_contour]
+
+            contour_store = ContourStore.ContourStore(
+                os.path.join(directory_tmp, "contours.npz"))
+            contour_store.build(filenames)
+
+            for f in filenames:
+                self.assertTrue(np.array_equal(
+                    contour_store.get_coordinates(f),
+                    parsing.parse_contour_file_array(f)))
+
+            self.assertIsNone(
+                contour_store.get_coordinates(self.contour_files[0]))
+
+            with open(filename_contour, "a") as f:
+                f.write("1.0 1.0\n")
+            self.assertIsNone(contour_store.get_coordinates(filename_contour))
+        finally:
+            shutil.rmtree(directory_tmp)
+
+    def test_polygons_to_runs_parity(self):
+        """
+        Runs of many polygons shall be pixel-exact with respect to the PIL
+        based poly_to_mask
+        """
+        polygons = [parsing.parse_contour_file_array(f)
+                    for f in self.contour_files]
+
+        # Random polygons partially outside the image including repeated
+        # vertices, half-pixel coordinates and self-intersections
+        random_state = np.random.RandomState(0)
+        width, height = 40, 30
+        polygons_random = []
+        for i in range(0, 500):
+            K = random_state.randint(2, 12)
+            polygon = random_state.uniform(-10, 50, size=(K, 2))
+            if i % 2:
+                polygon = np.round(2 * polygon) / 2.
+            polygons_random.append(np.repeat(
+                polygon, random_state.randint(1, 3, size=K), axis=0))
+
+        # Polygons outside the image and covering its first and last pixel
+        polygons_random.extend([
+            np.array([[-5., -5.], [-1., -8.], [-3., -2.]]),
+            np.array([[10., 35.], [20., 40.], [15., 45.]]),
+            np.array([[-2., -2.], [45., -2.], [45., 35.], [-2., 35.]]),
+        ])
+
+        for (p, w, h) in [(polygons, 256, 256),
+                          (polygons_random, width, height)]:
+            runs = parsing.polygons_to_runs(p, w, h)
+            for i in range(0, len(p)):
+                mask = np.zeros(h * w, dtype=bool)
+                for (start, end) in zip(*runs[i]):
+                    mask[start:end] = True
+                self.assertTrue(np.array_equal(
+                    mask.reshape(h, w), parsing.poly_to_mask(p[i], w, h)))
+
+        labels = np.arange(1, 21)
+        label_map = parsing.polygons_to_label_map(
+            polygons_random[0:20], width, height, labels)
+        label_map_ref = np.zeros_like(label_map)
+        for (p, label) in zip(polygons_random[0:20], labels):
+            label_map_ref[parsing.poly_to_mask(p, width, height)] = label
+        self.assertTrue(np.array_equal(label_map, label_map_ref))
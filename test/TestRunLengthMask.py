@@ -0,0 +1,108 @@
+"""
+\file TestRunLengthMask.py
+\brief Unit tests to check masks represented by runs of foreground pixels
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import glob
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.parsing as parsing
+import src.RunLengthMask as RunLengthMask
+import src.TargetSingleClass as TargetSingleClass
+import src.Exceptions as Exceptions
+
+
+class TestRunLengthMask(unittest.TestCase):
+
+    def setUp(self):
+        self.contour_files = sorted(glob.glob(os.path.join(
+            dir_test_data_final_data, "contourfiles", "*", "*", "*.txt")))
+
+        # Random polygons partially outside the image including repeated
+        # vertices and self-intersections
+        random_state = np.random.RandomState(0)
+        self.width, self.height = 40, 30
+        self.polygons = []
+        for i in range(0, 200):
+            K = random_state.randint(2, 12)
+            polygon = random_state.uniform(-10, 50, size=(K, 2))
+            self.polygons.append(np.repeat(
+                polygon, random_state.randint(1, 3, size=K), axis=0))
+
+        self.masks = [
+            RunLengthMask.RunLengthMask(
+                starts, ends, (self.height, self.width))
+            for (starts, ends) in parsing.polygons_to_runs(
+                self.polygons, self.width, self.height)]
+
+    def test_polygons_to_runs_parity(self):
+        """
+        Runs of polygons shall cover exactly the pixels of poly_to_mask and
+        be sorted, disjoint and non-adjacent
+        """
+        for i in range(0, len(self.polygons)):
+            mask = parsing.poly_to_mask(
+                self.polygons[i], self.width, self.height)
+            starts = self.masks[i].get_starts()
+            ends = self.masks[i].get_ends()
+
+            self.assertTrue(np.array_equal(self.masks[i].to_dense(), mask))
+            self.assertEqual(self.masks[i].get_area(), np.sum(mask))
+            self.assertTrue(np.all(starts < ends))
+            self.assertTrue(np.all(starts[1:] > ends[:-1]))
+
+    def test_set_operations(self):
+        """
+        Union, intersection and Dice score shall equal the ones of the dense
+        masks
+        """
+        out = np.ones((self.height, self.width), dtype=bool)
+        out_transposed = np.ones((self.width, self.height), dtype=bool)
+        for i in range(0, len(self.masks) - 1):
+            mask_a = self.masks[i]
+            mask_b = self.masks[i + 1]
+            dense_a = mask_a.to_dense()
+            dense_b = mask_b.to_dense()
+
+            union = mask_a.union(mask_b)
+            self.assertTrue(np.array_equal(union.to_dense(), dense_a | dense_b))
+            self.assertTrue(np.all(union.get_starts()[1:] >
+                                   union.get_ends()[:-1]))
+
+            intersection = mask_a.intersection(mask_b)
+            intersection.to_dense(out=out)
+            self.assertTrue(np.array_equal(out, dense_a & dense_b))
+            intersection.to_dense(out=out_transposed.T)
+            self.assertTrue(np.array_equal(out_transposed.T, dense_a & dense_b))
+            self.assertEqual(intersection.get_area(), np.sum(dense_a & dense_b))
+
+            if dense_a.any() or dense_b.any():
+                self.assertAlmostEqual(
+                    mask_a.get_dice_score(mask_b),
+                    2 * np.sum(dense_a & dense_b) /
+                    float(np.sum(dense_a) + np.sum(dense_b)))
+
+        self.assertRaises(
+            Exceptions.ShapeMismatch, self.masks[0].union,
+            RunLengthMask.RunLengthMask([], [], (self.width, self.height)))
+
+    def test_target_single_class(self):
+        """
+        Runs of a target shall equal its dense mask, also for non-square
+        shapes
+        """
+        for shape in [(256, 256), (240, 180)]:
+            for filename in self.contour_files[0:5]:
+                target = TargetSingleClass.TargetSingleClass(
+                    1, filename, shape=shape)
+                mask = target.get_data()
+                self.assertEqual(mask.shape, (shape[1], shape[0]))
+                self.assertTrue(np.array_equal(
+                    target.get_run_length_data().to_dense(), mask))
@@ -0,0 +1,82 @@
+"""
+\file TestTarget.py
+\brief Unit tests to check the label maps of targets combining several
+       contours
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.TargetSingleClass as TargetSingleClass
+import src.Target as Target
+import src.DiskCache as DiskCache
+import src.Exceptions as Exceptions
+
+
+class TestTarget(unittest.TestCase):
+
+    def setUp(self):
+        directory = os.path.join(
+            dir_test_data_final_data, "contourfiles", "SC-HF-I-1")
+        self.filenames = [
+            os.path.join(directory, "i-contours",
+                         "IM-0001-0059-icontour-manual.txt"),
+            os.path.join(directory, "o-contours",
+                         "IM-0001-0059-ocontour-manual.txt")]
+
+    def _get_target(self, cache=None, encoding="additive"):
+        return Target.Target(
+            [TargetSingleClass.TargetSingleClass(
+                59, f, shape=(256, 256), cache=cache)
+             for f in self.filenames], encoding=encoding)
+
+    def test_encodings(self):
+        """
+        Label maps drawn into one buffer shall equal the ones combining the
+        single class masks, with and without cache and for non-contiguous
+        output arrays
+        """
+        masks = [t.get_data()
+                 for t in self._get_target().get_single_class_targets()]
+        data_additive = masks[0].astype(np.uint8) + masks[1]
+        data_class_ids = np.where(masks[0], 1, 2 * masks[1]).astype(np.uint8)
+
+        directory_tmp = tempfile.mkdtemp()
+        try:
+            cache = DiskCache.DiskCache(os.path.join(directory_tmp, "cache"))
+            out = np.ones((256, 256), dtype=np.uint8)
+            for c in [None, cache, cache]:
+                target = self._get_target(cache=c)
+                self.assertTrue(np.array_equal(
+                    target.get_data(), data_additive))
+                self.assertTrue(target.get_data(out=out) is out)
+                self.assertTrue(np.array_equal(out, data_additive))
+
+                target = self._get_target(cache=c, encoding="class_ids")
+                self.assertTrue(np.array_equal(
+                    target.get_data(out=out), data_class_ids))
+
+                # Non-contiguous views, e.g. a slice of an (H, W, N) batch
+                batch = np.ones((256, 256, 3), dtype=np.uint8)
+                target.get_data(out=batch[:, :, 1])
+                self.assertTrue(np.array_equal(
+                    batch[:, :, 1], data_class_ids))
+                self.assertTrue(np.all(batch[:, :, 0::2] == 1))
+                target.get_data(out=out.T)
+                self.assertTrue(np.array_equal(out.T, data_class_ids))
+        finally:
+            shutil.rmtree(directory_tmp)
+
+        self.assertRaises(Exceptions.ShapeMismatch, lambda:
+                          self._get_target().get_data(
+                              out=np.zeros((256, 255), dtype=np.uint8)))
+        self.assertRaises(ValueError, lambda:
+                          self._get_target(encoding="x"))
@@ -0,0 +1,320 @@
+"""
+\file TestThresholdMaskingScheme.py
+\brief Unit tests to check the evaluation of thresholds by the
+       ThresholdMaskingScheme
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import threading
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.DataReader as DataReader
+import src.DataBase as DataBase
+import src.utilities as utils
+import src.metrics as metrics
+import src.ThresholdMaskingScheme as ThresholdMaskingScheme
+import src.IntervalThresholdMaskingScheme as IntervalThresholdMaskingScheme
+
+
+class TestThresholdMaskingScheme(unittest.TestCase):
+
+    def setUp(self):
+        data_reader = DataReader.DataReader(
+            directory_dicoms=os.path.join(dir_test_data_final_data, "dicoms"),
+            directory_contours=os.path.join(
+                dir_test_data_final_data, "contourfiles"),
+            csv_file=os.path.join(
+                dir_test_data_final_data, "link_reduced.csv"),
+            contours_type="i-contours o-contours")
+        data_reader.read_data()
+
+        database = DataBase.DataBase(data_reader.get_samples())
+        database.build_training_database()
+        self.images_array, self.targets_array = \
+            database.get_batch_for_all_samples()
+
+    def _get_dice_scores_reference(self, masking_scheme, targets_array,
+                                   threshold, label=2):
+        """
+        Compute per-slice dice scores by thresholding the entire arrays
+        """
+        images_array = masking_scheme._images_array
+        targets_array_estimate = images_array * (targets_array > 0) > threshold
+        self.assertTrue(np.array_equal(
+            targets_array_estimate,
+            masking_scheme.get_target_array_estimate(threshold)))
+
+        return np.array([utils.dice_score(
+            (targets_array[:, :, j] == label).astype(np.uint8),
+            targets_array_estimate[:, :, j])
+            for j in range(0, targets_array.shape[2])])
+
+    def test_threshold_sweep(self):
+        """
+        Mean dice scores of the threshold sweep shall equal the ones obtained
+        by thresholding the arrays for each threshold separately
+        """
+        thresholds_list = range(0, 500, 25)
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            images_array=self.images_array,
+            targets_array=self.targets_array,
+            thresholds_list=thresholds_list)
+
+        dice_scores_mean = \
+            masking_scheme.evaluate_masking_scheme_by_threshold_sweeping()
+
+        self.assertEqual(len(dice_scores_mean), len(thresholds_list))
+        for threshold, dice_score_mean in zip(
+                thresholds_list, dice_scores_mean):
+            self.assertAlmostEqual(
+                dice_score_mean,
+                self._get_dice_scores_reference(
+                    masking_scheme, self.targets_array, threshold).mean())
+
+    def test_threshold_sweep_special_cases(self):
+        """
+        Negative, non-integer, repeated and unsorted thresholds as well as
+        slices without ground-truth shall be treated as by thresholding the
+        arrays
+        """
+        np.random.seed(0)
+        images_array = np.random.randint(-20, 50, (16, 12, 5)).astype(np.int16)
+        targets_array = np.random.randint(0, 3, (16, 12, 5)).astype(np.uint8)
+        targets_array[:, :, 1] = 0
+        targets_array[:, :, 3][targets_array[:, :, 3] == 2] = 1
+
+        thresholds_list = [60, -30, 12.5, -5, 0, 12.5, 49, 3]
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            images_array=images_array,
+            targets_array=targets_array,
+            thresholds_list=thresholds_list)
+
+        dice_scores_mean = \
+            masking_scheme.evaluate_masking_scheme_by_threshold_sweeping()
+
+        for threshold, dice_score_mean in zip(
+                thresholds_list, dice_scores_mean):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                dice_scores = self._get_dice_scores_reference(
+                    masking_scheme, targets_array, threshold)
+            if np.isnan(dice_scores.mean()):
+                self.assertTrue(np.isnan(dice_score_mean))
+            else:
+                self.assertAlmostEqual(dice_score_mean, dice_scores.mean())
+            np.testing.assert_equal(
+                masking_scheme.get_mean_dice_score(threshold),
+                dice_score_mean)
+
+    def test_intensity_sweep(self):
+        """
+        Mean dice scores obtained by sweeping through all distinct
+        intensities shall equal the ones of the threshold sweep
+        """
+        np.random.seed(1)
+        images_array = np.random.randn(16, 12, 5) * 20
+        images_array[0:4] = np.round(images_array[0:4])
+        targets_array = np.random.randint(0, 3, (16, 12, 5)).astype(np.uint8)
+        targets_array[:, :, 3][targets_array[:, :, 3] == 2] = 1
+
+        for images, targets in [(self.images_array, self.targets_array),
+                                (images_array, targets_array)]:
+            masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+                images_array=images,
+                targets_array=targets,
+                sweep="intensities")
+
+            thresholds, dice_scores_mean = \
+                masking_scheme.evaluate_masking_scheme_by_intensity_sweeping()
+
+            intensities = np.unique(
+                np.concatenate([images[targets > 0], [0]]))
+            self.assertTrue(np.array_equal(thresholds, np.concatenate(
+                [[intensities[0] - 1], intensities])))
+
+            masking_scheme.set_thresholds(list(thresholds))
+            dice_scores_mean_ref = \
+                masking_scheme.evaluate_masking_scheme_by_threshold_sweeping()
+            np.testing.assert_allclose(dice_scores_mean, dice_scores_mean_ref)
+
+            self.assertEqual(masking_scheme.estimate_optimal_parameter(),
+                             thresholds[np.argmax(dice_scores_mean_ref)])
+
+        # Selecting all pixels is optimal if all of them are ground-truth
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            images_array=images_array,
+            targets_array=2 * np.ones_like(targets_array),
+            sweep="intensities")
+        threshold = masking_scheme.estimate_optimal_parameter()
+        self.assertLess(threshold, images_array.min())
+        self.assertEqual(masking_scheme.get_mean_dice_score(threshold), 1)
+
+    def test_dice_matrix(self):
+        """
+        Each row of the dice matrix shall hold the dice scores of all slices
+        for one threshold
+        """
+        thresholds_list = [300, 0, 110.5]
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            images_array=self.images_array,
+            targets_array=self.targets_array,
+            thresholds_list=thresholds_list)
+
+        dice_matrix = masking_scheme.get_dice_matrix()
+
+        self.assertEqual(dice_matrix.shape,
+                         (len(thresholds_list), self.images_array.shape[2]))
+        for i in range(0, len(thresholds_list)):
+            np.testing.assert_allclose(
+                dice_matrix[i],
+                self._get_dice_scores_reference(
+                    masking_scheme, self.targets_array, thresholds_list[i]))
+
+    def test_reassigned_arrays(self):
+        """
+        Dice scores shall be updated once images or targets arrays are
+        reassigned
+        """
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            images_array=self.images_array,
+            targets_array=self.targets_array)
+        dice_score_mean = masking_scheme.get_mean_dice_score(100)
+
+        masking_scheme.set_images_array(self.images_array[:, :, 0:5])
+        masking_scheme.set_targets_array(self.targets_array[:, :, 0:5])
+        self.assertAlmostEqual(
+            masking_scheme.get_mean_dice_score(100),
+            self._get_dice_scores_reference(
+                masking_scheme, self.targets_array[:, :, 0:5], 100).mean())
+
+        masking_scheme.set_images_array(self.images_array)
+        masking_scheme.set_targets_array(self.targets_array)
+        self.assertEqual(masking_scheme.get_mean_dice_score(100),
+                         dice_score_mean)
+
+    def test_parallel_threshold_sweep(self):
+        """
+        Dice scores evaluated on chunks of slices in parallel shall equal
+        the ones evaluated at once
+        """
+        thresholds_list = range(-10, 500, 3)
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            images_array=self.images_array,
+            targets_array=self.targets_array,
+            thresholds_list=thresholds_list)
+        dice_matrix = masking_scheme.get_dice_matrix()
+
+        for n_jobs in [2, 3, 100]:
+            masking_scheme.set_n_jobs(n_jobs)
+            np.testing.assert_array_equal(
+                masking_scheme.get_dice_matrix(), dice_matrix)
+
+        # Thread pools are closed explicitly, on changing the number of jobs
+        # and on exit
+        masking_scheme.close()
+        N_threads = threading.active_count()
+        with ThresholdMaskingScheme.ThresholdMaskingScheme(
+                images_array=self.images_array,
+                targets_array=self.targets_array,
+                thresholds_list=thresholds_list,
+                n_jobs=2) as masking_scheme:
+            masking_scheme.get_dice_matrix()
+            self.assertGreater(threading.active_count(), N_threads)
+            masking_scheme.set_n_jobs(1)
+            self.assertEqual(threading.active_count(), N_threads)
+            masking_scheme.set_n_jobs(3)
+            masking_scheme.get_dice_matrix()
+            self.assertGreater(threading.active_count(), N_threads)
+        self.assertEqual(threading.active_count(), N_threads)
+
+    def test_interval_sweep(self):
+        """
+        Dice scores of all intervals shall equal the ones obtained by
+        thresholding the arrays for each interval separately
+        """
+        np.random.seed(2)
+        images_array = np.random.randint(-20, 50, (16, 12, 5)).astype(np.int16)
+        targets_array = np.random.randint(0, 3, (16, 12, 5)).astype(np.uint8)
+
+        thresholds_list = [-30, -5, 0, 3, 12.5, 30, 49, 60]
+        masking_scheme = \
+            IntervalThresholdMaskingScheme.IntervalThresholdMaskingScheme(
+                images_array=images_array,
+                targets_array=targets_array,
+                thresholds_list=thresholds_list,
+                n_jobs=2)
+
+        intervals = masking_scheme.get_candidate_parameters()
+        self.assertEqual(len(intervals), 28)
+
+        dice_matrix = masking_scheme.get_dice_matrix()
+        for interval, dice_scores in zip(intervals, dice_matrix):
+            intensities = images_array * (targets_array > 0)
+            targets_array_estimate = (intensities > interval[0]) & \
+                (intensities <= interval[1])
+            self.assertTrue(np.array_equal(
+                targets_array_estimate,
+                masking_scheme.get_target_array_estimate(interval)))
+
+            dice_scores_ref = [utils.dice_score(
+                (targets_array[:, :, j] == 2).astype(np.uint8),
+                targets_array_estimate[:, :, j])
+                for j in range(0, targets_array.shape[2])]
+            np.testing.assert_allclose(dice_scores, dice_scores_ref)
+
+        # Unbounded intervals are equivalent to thresholds
+        masking_scheme.set_images_array(self.images_array)
+        masking_scheme.set_targets_array(self.targets_array)
+        masking_scheme_threshold = \
+            ThresholdMaskingScheme.ThresholdMaskingScheme(
+                images_array=self.images_array,
+                targets_array=self.targets_array)
+        thresholds = range(0, 500, 10)
+        np.testing.assert_array_equal(
+            masking_scheme.get_dice_matrix([(t, np.inf) for t in thresholds]),
+            masking_scheme_threshold.get_dice_matrix(thresholds))
+
+        masking_scheme.set_thresholds(thresholds + [np.inf])
+        interval = masking_scheme.estimate_optimal_parameter()
+        self.assertTrue(masking_scheme.get_mean_dice_score(interval) >=
+                        np.nanmax(masking_scheme_threshold.get_dice_matrix(
+                            thresholds).mean(axis=1)))
+
+        # Intensity sweeps are not supported for intervals
+        self.assertRaises(
+            ValueError,
+            masking_scheme.evaluate_masking_scheme_by_intensity_sweeping)
+
+    def test_surface_distances(self):
+        """
+        Surface distances based on the cached distance maps of the
+        ground-truth shall equal the ones computed from scratch, also after
+        setting other targets arrays
+        """
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            images_array=self.images_array,
+            targets_array=self.targets_array)
+
+        # Distance maps are kept for reordered and partly new slices
+        N_slices = self.targets_array.shape[2]
+        for (threshold, indices, spacing) in [
+                (80, range(0, N_slices), None),
+                (120, range(0, N_slices), None),
+                (120, range(N_slices - 1, N_slices // 2 - 1, -1), None),
+                (100, range(0, N_slices, 2), (1.5, 0.5))]:
+            masking_scheme.set_images_array(self.images_array[:, :, indices])
+            masking_scheme.set_targets_array(self.targets_array[:, :, indices])
+            results = masking_scheme.get_surface_distances(
+                threshold, spacing=spacing)
+            results_ref = metrics.get_surface_distances(
+                masking_scheme.get_target_array_estimate(threshold),
+                self.targets_array[:, :, indices] == 2,
+                slice_axis=2,
+                spacing=spacing)
+            for key in ["hd95", "assd"]:
+                np.testing.assert_array_equal(results[key], results_ref[key])
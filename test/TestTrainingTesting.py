@@ -0,0 +1,311 @@
+"""
+\file TestTrainingTesting.py
+\brief Unit tests to check training and testing of masking schemes
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import warnings
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.DataReader as DataReader
+import src.DataBase as DataBase
+import src.ManifestSample as ManifestSample
+import src.metrics as metrics
+import src.ThresholdMaskingScheme as ThresholdMaskingScheme
+import src.IntervalThresholdMaskingScheme as IntervalThresholdMaskingScheme
+import src.TrainingTesting as TrainingTesting
+
+
+class TestTrainingTesting(unittest.TestCase):
+
+    def setUp(self):
+        data_reader = DataReader.DataReader(
+            directory_dicoms=os.path.join(dir_test_data_final_data, "dicoms"),
+            directory_contours=os.path.join(
+                dir_test_data_final_data, "contourfiles"),
+            csv_file=os.path.join(
+                dir_test_data_final_data, "link_reduced.csv"),
+            contours_type="i-contours o-contours")
+        data_reader.read_data()
+        self.samples = data_reader.get_samples()
+
+        self.thresholds_list = range(0, 500, 5)
+
+    def _get_training_testing(self, masking_scheme=None,
+                              fraction_training=0.7, **kwargs):
+        database = DataBase.DataBase(self.samples, seed=1)
+        database.build_training_database()
+
+        if masking_scheme is None:
+            masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+                thresholds_list=self.thresholds_list)
+
+        return TrainingTesting.TrainingTesting(
+            masking_scheme=masking_scheme,
+            database=database,
+            fraction_training=fraction_training,
+            **kwargs)
+
+    def test_streaming(self):
+        """
+        Training and testing on streamed batches shall give the same results
+        as on the data held in memory
+        """
+        results = []
+        for kwargs in [{}, {"batch_size_streaming": 3}]:
+
+            # Seeds random split of database
+            training_testing = self._get_training_testing(**kwargs)
+
+            for i in range(0, 3):
+                training_testing.randomly_split_into_training_and_testing_data()
+                parameter, dice_score_training = training_testing.run_training()
+                _, dice_score_testing = training_testing.run_testing(parameter)
+                results.append(
+                    (parameter, dice_score_training, dice_score_testing))
+
+        for i in range(0, 3):
+            self.assertEqual(results[i][0], results[3 + i][0])
+            self.assertAlmostEqual(results[i][1], results[3 + i][1])
+            self.assertAlmostEqual(results[i][2], results[3 + i][2])
+
+    def test_n_jobs(self):
+        """
+        The number of jobs of the masking scheme shall only be overridden if
+        given
+        """
+        database = DataBase.DataBase(self.samples, seed=1)
+        database.build_training_database()
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            n_jobs=3)
+
+        TrainingTesting.TrainingTesting(masking_scheme, database)
+        self.assertEqual(masking_scheme.get_n_jobs(), 3)
+
+        TrainingTesting.TrainingTesting(masking_scheme, database, n_jobs=2)
+        self.assertEqual(masking_scheme.get_n_jobs(), 2)
+
+    def test_layout(self):
+        """
+        Databases providing batches with the slices on the first axis shall be
+        rejected
+        """
+        database = DataBase.DataBase(self.samples, layout="NHW")
+        database.build_training_database()
+        masking_scheme = ThresholdMaskingScheme.ThresholdMaskingScheme(
+            thresholds_list=self.thresholds_list)
+
+        self.assertRaises(ValueError, lambda:
+                          TrainingTesting.TrainingTesting(
+                              masking_scheme, database))
+
+    def test_database_batch_size(self):
+        """
+        Training and testing shall leave the batch size of the database
+        unchanged and the thresholds of an intensity sweep cannot be
+        streamed
+        """
+        database = DataBase.DataBase(self.samples, batch_size=5, seed=1)
+        database.build_training_database()
+
+        for batch_size_streaming in [None, 3]:
+            training_testing = TrainingTesting.TrainingTesting(
+                masking_scheme=ThresholdMaskingScheme.ThresholdMaskingScheme(
+                    thresholds_list=self.thresholds_list),
+                database=database,
+                batch_size_streaming=batch_size_streaming)
+            training_testing.randomly_split_into_training_and_testing_data()
+            parameter, _ = training_testing.run_training()
+            training_testing.run_testing(parameter)
+            training_testing.run_testing_metrics(parameter)
+            training_testing.run_repeated_splits(2)
+            self.assertEqual(database.get_batch_size(), 5)
+
+        training_testing = TrainingTesting.TrainingTesting(
+            masking_scheme=ThresholdMaskingScheme.ThresholdMaskingScheme(
+                sweep="intensities"),
+            database=database,
+            batch_size_streaming=3)
+        training_testing.randomly_split_into_training_and_testing_data()
+        self.assertRaises(ValueError, training_testing.run_training)
+
+        # Batch size is restored if a repeated split fails
+        class DataBaseFailing(DataBase.DataBase):
+
+            def get_random_indices_and_indices_complement(self):
+                raise RuntimeError("Split failed")
+
+        database = DataBaseFailing(self.samples, batch_size=5, seed=1)
+        database.build_training_database()
+        training_testing = TrainingTesting.TrainingTesting(
+            masking_scheme=ThresholdMaskingScheme.ThresholdMaskingScheme(
+                thresholds_list=self.thresholds_list),
+            database=database)
+        self.assertRaises(RuntimeError, lambda:
+                          training_testing.run_repeated_splits(2))
+        self.assertEqual(database.get_batch_size(), 5)
+
+    def test_repeated_splits(self):
+        """
+        Repeated splits shall give the same results as running training and
+        testing for each random split separately
+        """
+        N_repetitions = 4
+
+        training_testing = self._get_training_testing()
+        parameters = []
+        dice_scores = np.zeros((N_repetitions, 2))
+        for i in range(0, N_repetitions):
+            training_testing.randomly_split_into_training_and_testing_data()
+            parameter, dice_scores[i, 0] = training_testing.run_training()
+            dice_scores[i, 1] = training_testing.run_testing(parameter)[1]
+            parameters.append(parameter)
+
+        for kwargs in [{}, {"batch_size_streaming": 4, "n_jobs": 2}]:
+            training_testing = self._get_training_testing(**kwargs)
+            results = training_testing.run_repeated_splits(N_repetitions)
+            self.assertEqual(results[0], parameters)
+            np.testing.assert_allclose(results[1], dice_scores)
+
+        parameters_bootstrap, dice_scores_bootstrap = \
+            training_testing.run_repeated_splits(
+                N_repetitions, bootstrap=True)
+        self.assertEqual(len(parameters_bootstrap), N_repetitions)
+        self.assertEqual(dice_scores_bootstrap.shape, (N_repetitions, 2))
+        self.assertTrue(np.all(dice_scores_bootstrap > 0))
+
+        # A single slice is always drawn, i.e. no slice is left for testing
+        manifest = self.samples[0].get_manifest()[0:1]
+        sample = ManifestSample.ManifestSample(manifest)
+        sample.create_sample()
+        database = DataBase.DataBase([sample], seed=1)
+        database.build_training_database()
+        training_testing = TrainingTesting.TrainingTesting(
+            masking_scheme=ThresholdMaskingScheme.ThresholdMaskingScheme(
+                thresholds_list=self.thresholds_list),
+            database=database)
+        _, dice_scores_bootstrap = training_testing.run_repeated_splits(
+            N_repetitions, bootstrap=True)
+        self.assertTrue(np.all(dice_scores_bootstrap[:, 0] > 0))
+        self.assertTrue(np.all(np.isnan(dice_scores_bootstrap[:, 1])))
+
+    def test_repeated_splits_intervals(self):
+        """
+        Repeated splits shall support interval parameters and give the same
+        results as running training and testing for each random split
+        separately
+        """
+        N_repetitions = 3
+
+        def get_masking_scheme():
+            return IntervalThresholdMaskingScheme.\
+                IntervalThresholdMaskingScheme(
+                    thresholds_list=range(0, 500, 25))
+
+        training_testing = self._get_training_testing(
+            masking_scheme=get_masking_scheme())
+        parameters = []
+        dice_scores = np.zeros((N_repetitions, 2))
+        for i in range(0, N_repetitions):
+            training_testing.randomly_split_into_training_and_testing_data()
+            parameter, dice_scores[i, 0] = training_testing.run_training()
+            dice_scores[i, 1] = training_testing.run_testing(parameter)[1]
+            parameters.append(parameter)
+
+        training_testing = self._get_training_testing(
+            masking_scheme=get_masking_scheme())
+        results = training_testing.run_repeated_splits(N_repetitions)
+        self.assertEqual(results[0], parameters)
+        self.assertTrue(all(len(p) == 2 for p in results[0]))
+        np.testing.assert_allclose(results[1], dice_scores)
+
+        self.assertRaises(ValueError, lambda:
+                          IntervalThresholdMaskingScheme.
+                          IntervalThresholdMaskingScheme(sweep="intensities"))
+
+    def test_testing_metrics(self):
+        """
+        Dice scores of the testing metrics shall agree with the mean dice
+        score of testing, also in streaming mode
+        """
+        for kwargs in [{}, {"batch_size_streaming": 4}]:
+            training_testing = self._get_training_testing(**kwargs)
+            training_testing.randomly_split_into_training_and_testing_data()
+            _, dice_score_mean = training_testing.run_testing(100)
+
+            results = training_testing.run_testing_metrics(100)
+            self.assertAlmostEqual(results["dice"].mean(), dice_score_mean)
+            self.assertTrue(np.all(results["jaccard"] <= results["dice"]))
+
+    def test_testing_surface_distances(self):
+        """
+        Surface distances of the testing slices shall be added on request
+        and the distance maps of ground-truth slices be computed only once
+        across random splits, also in streaming mode
+        """
+        get_distance_maps = metrics.get_distance_maps
+        N_distance_maps = []
+
+        def get_distance_maps_counted(masks, slice_axis=0, spacing=None):
+            N_distance_maps.append(masks.shape[slice_axis])
+            return get_distance_maps(
+                masks, slice_axis=slice_axis, spacing=spacing)
+
+        metrics.get_distance_maps = get_distance_maps_counted
+        try:
+            for kwargs in [{}, {"batch_size_streaming": 4}]:
+                training_testing = self._get_training_testing(**kwargs)
+                del N_distance_maps[:]
+
+                # Distance maps of the predictions are computed for each
+                # testing slice, the ones of the ground-truth only once
+                N_testing = 0
+                for i in range(0, 2):
+                    training_testing.randomly_split_into_training_and_testing_data()
+                    results = training_testing.run_testing_metrics(
+                        100, surface_distances=True)
+                    N_testing += len(results["dice"])
+                    for key in ["hd95", "assd"]:
+                        self.assertEqual(results[key].shape,
+                                         results["dice"].shape)
+                N_ground_truth = sum(N_distance_maps) - N_testing
+                self.assertLess(N_ground_truth, N_testing)
+
+                # Same split again does not need any new distance map of the
+                # ground-truth
+                results = training_testing.run_testing_metrics(
+                    100, surface_distances=True)
+                N_testing += len(results["dice"])
+                self.assertEqual(sum(N_distance_maps) - N_testing,
+                                 N_ground_truth)
+        finally:
+            metrics.get_distance_maps = get_distance_maps
+
+    def test_no_testing_slices(self):
+        """
+        Without testing slices, the testing metrics shall be empty and the
+        mean dice score of testing nan, also in streaming mode
+        """
+        for kwargs in [{}, {"batch_size_streaming": 4}]:
+            training_testing = self._get_training_testing(
+                fraction_training=1.0, **kwargs)
+            training_testing.randomly_split_into_training_and_testing_data()
+
+            results = training_testing.run_testing_metrics(
+                100, surface_distances=True)
+            self.assertEqual(sorted(results.keys()), [
+                "assd", "dice", "hd95", "jaccard", "sensitivity",
+                "volume_error"])
+            for key in results.keys():
+                self.assertEqual(results[key].shape, (0,))
+
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                self.assertTrue(np.isnan(
+                    training_testing.run_testing(100)[1]))
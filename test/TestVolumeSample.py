@@ -0,0 +1,107 @@
+"""
+\file TestVolumeSample.py
+\brief Unit tests to check the memory-mapped volume store of samples
+
+\author     Michael Ebner (michael.ebner.14@ucl.ac.uk)
+\date       June 2017
+"""
+
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+
+from definitions import dir_test_data_final_data
+
+import src.DataReader as DataReader
+import src.DataBase as DataBase
+import src.VolumeSample as VolumeSample
+import src.Exceptions as Exceptions
+
+
+class TestVolumeSample(unittest.TestCase):
+
+    def setUp(self):
+        self.directory_tmp = tempfile.mkdtemp()
+
+        self.data_reader = DataReader.DataReader(
+            directory_dicoms=os.path.join(dir_test_data_final_data, "dicoms"),
+            directory_contours=os.path.join(
+                dir_test_data_final_data, "contourfiles"),
+            csv_file=os.path.join(dir_test_data_final_data, "link.csv"),
+            contours_type="i-contours o-contours")
+        self.data_reader.read_data()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_tmp)
+
+    def test_volumes_equal_original_data(self):
+        """
+        Batches built from the volume stores shall equal the ones built from
+        the original DICOM and contour files
+        """
+        self.data_reader.export_volumes(self.directory_tmp)
+        samples = self.data_reader.get_samples()
+
+        data_reader = DataReader.DataReader(
+            directory_dicoms=None,
+            directory_contours=None,
+            csv_file=os.path.join(dir_test_data_final_data, "link.csv"),
+            contours_type="i-contours o-contours")
+        data_reader.read_volumes(self.directory_tmp)
+        samples_volume = data_reader.get_samples()
+
+        self.assertEqual(
+            [image.get_id() for image in samples[1].get_images()],
+            [image.get_id() for image in samples_volume[1].get_images()])
+        self.assertIsNone(samples_volume[1].get_manifest())
+        self.assertRaises(ValueError, lambda:
+                          data_reader.write_manifest(os.path.join(
+                              self.directory_tmp, "manifest.json")))
+
+        arrays = []
+        for s in [samples, samples_volume]:
+            database = DataBase.DataBase(s)
+            database.build_training_database()
+            arrays.append(database.get_batch_for_all_samples())
+
+        for i in range(0, 2):
+            self.assertEqual(arrays[0][i].dtype, arrays[1][i].dtype)
+            self.assertTrue(np.array_equal(arrays[0][i], arrays[1][i]))
+
+        # Volume replaced within the same process is read anew once the
+        # volume stores are read again
+        slice_volume = samples_volume[1].get_images()[0]
+        self.assertTrue(np.any(slice_volume.get_data()))
+        filename = slice_volume.get_filename()
+        np.save(filename + ".tmp.npy", np.zeros_like(np.load(filename)))
+        os.rename(filename + ".tmp.npy", filename)
+        data_reader.read_volumes(self.directory_tmp)
+        self.assertFalse(np.any(
+            data_reader.get_samples()[1].get_images()[0].get_data()))
+        self.assertFalse(np.any(slice_volume.get_data()))
+
+    def test_export_empty_volume(self):
+        """
+        A sample without slices cannot be exported into a volume store
+        """
+        filename_index = os.path.join(self.directory_tmp, "empty.json")
+        for key in ["images", "targets"]:
+            np.save(os.path.join(self.directory_tmp, "empty_%s.npy" % (key)),
+                    np.zeros((0, 4, 4), dtype=np.uint8))
+        with open(filename_index, "w") as f:
+            json.dump({
+                "slice_ids": [],
+                "shape": [4, 4],
+                "images": {"filename": "empty_images.npy", "data_type": "|u1"},
+                "targets": {"filename": "empty_targets.npy",
+                            "data_type": "|u1"},
+            }, f)
+
+        sample = VolumeSample.VolumeSample(filename_index)
+        sample.create_sample()
+        self.assertEqual(len(sample.get_images()), 0)
+        self.assertRaises(Exceptions.SampleNotValid, lambda:
+                          sample.export_volume(self.directory_tmp, "copy"))
@@ -10,6 +10,17 @@ import unittest
 
 from TestInput import *
 from TestUserBehaviour import *
+from TestParsing import *
+from TestDiskCache import *
+from TestVolumeSample import *
+from TestManifest import *
+from TestDataBase import *
+from TestThresholdMaskingScheme import *
+from TestTrainingTesting import *
+from TestMetrics import *
+from TestPacking import *
+from TestRunLengthMask import *
+from TestTarget import *
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file